@@ -35,6 +35,18 @@ class UserAdmin(BaseUserAdmin):
 admin.site.register(User, UserAdmin)
 
 
+class SkillAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key']
+    search_fields = ['name']
+admin.site.register(Skill, SkillAdmin)
+
+
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key']
+    search_fields = ['name']
+admin.site.register(Category, CategoryAdmin)
+
+
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ['user']
 admin.site.register(Profile, ProfileAdmin)
@@ -79,6 +91,11 @@ class MessageAdmin(admin.ModelAdmin):
 admin.site.register(Message, MessageAdmin)
 
 
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ['user_low', 'user_high', 'last_message', 'created']
+admin.site.register(Conversation, ConversationAdmin)
+
+
 class PlanAdmin(admin.ModelAdmin):
     list_display = ['name', 'description', 'price', 'duration']
 admin.site.register(Plan, PlanAdmin)
@@ -12,13 +12,20 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from .serializers import * 
+from .caching import USER_VALIDATOR_FIELDS, ConditionalGetMixin
 from .permissions import CustomPermission
+from .paginations import KeysetPaginationMixin
+from .metrics import SerializerTimingMixin
 from core.models import User
+from core.taxonomy import users_with_terms
 from workmania.settings import *
 from datetime import datetime
 
 
 class UserViewSet(
+    SerializerTimingMixin,
+    ConditionalGetMixin,
+    KeysetPaginationMixin,
     mixins.UpdateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
@@ -27,6 +34,7 @@ class UserViewSet(
     serializer_class = UserSerializer
     filterset_fields = ('is_active',)
     ordering_fields = ('first_name')
+    conditional_modified_fields = USER_VALIDATOR_FIELDS
 
     def get_queryset(self):
         if self.action == 'list':
@@ -96,17 +104,11 @@ class UserViewSet(
 
             skills = self.request.GET.get('skills')
             if skills:
-                skill_q = Q()
-                for skill in skills.split(','):
-                    skill_q |= Q(profile__skills__icontains=skill)
-                filters &= skill_q
+                filters &= Q(id__in=users_with_terms('skill_tags', skills))
 
             categories = self.request.GET.get('categories')
             if categories:
-                category_q = Q()
-                for skill in categories.split(','):
-                    category_q |= Q(profile__categories__icontains=skill)
-                filters &= category_q
+                filters &= Q(id__in=users_with_terms('category_tags', categories))
             
             english_level = self.request.GET.get('english_level')
             if english_level and english_level != "any":
@@ -149,8 +151,10 @@ class UserViewSet(
 
     @action(methods=['get'], detail=False, permission_classes=[IsAuthenticated])
     def me(self, request, *args, **kwargs):
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        return self.conditional_response(
+            self.get_conditional_validators([request.user]),
+            lambda: Response(UserSerializer(request.user).data),
+        )
 
     @action(methods=["post", "delete"], detail=True, permission_classes=[IsAuthenticated])
     def save(self, request, pk=None):
@@ -165,7 +169,7 @@ class UserViewSet(
     @action(methods=['delete'], detail=False, permission_classes=[IsAuthenticated])
     def delete(self, request, *args, **kwargs):
         request.user.is_active = False
-        request.user.save()
+        request.user.save(update_fields=['is_active', 'modified'])
         # request.user.delete()
 
         return Response(status=200)
@@ -1,8 +1,97 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class LocalTokenCache:
+    """
+    Per-process LRU of resolved tokens in front of the shared cache. Entries
+    live ``AUTH_TOKEN_LOCAL_CACHE_TIMEOUT`` seconds: a revocation clears the
+    shared cache and this process at once, other processes within that time.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        timeout = getattr(settings, 'AUTH_TOKEN_LOCAL_CACHE_TIMEOUT', 5)
+        max_entries = getattr(settings, 'AUTH_TOKEN_LOCAL_CACHE_SIZE', 1000)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_tokens = LocalTokenCache()
+
+# The only user columns kept in the token caches. Everything else,
+# including the password hash, is deferred and read from the database on
+# first use (see User.refresh_from_db), and a full save of the cached user
+# writes only these columns (``modified`` so it still moves on every save).
+CACHED_USER_FIELDS = ('id', 'role', 'is_active', 'is_staff', 'is_superuser', 'modified')
+
+
+def cached_user_fields():
+    # Model.from_db expects the values in the model's field order.
+    return [field.attname for field in get_user_model()._meta.concrete_fields if field.attname in CACHED_USER_FIELDS]
+
+
+def _cache_key(key):
+    # Keys are credentials; keep them out of cache key listings.
+    return 'auth_token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def revoke_tokens(*keys):
+    """Drops the cached credentials of the given token keys."""
+    cache_keys = [_cache_key(key) for key in keys]
+    local_tokens.delete(*cache_keys)
+    cache.delete_many(cache_keys)
+
+
+def revoke_user_tokens(user_id):
+    revoke_tokens(*Token.objects.filter(user_id=user_id).values_list('key', flat=True))
 
 
 class QueryParamAuthentication(TokenAuthentication):
+    """
+    Token authentication from the ``Authorization`` header or the ``token``
+    query parameter. The ``CACHED_USER_FIELDS`` of a resolved token's user
+    are cached in the process (see LocalTokenCache) and in the shared cache
+    for ``AUTH_TOKEN_CACHE_TIMEOUT`` seconds; core.signals revokes them when
+    the token is deleted (logout) or its user is saved (password reset,
+    deactivation).
+    """
     query_param_name = 'token'
 
     def authenticate(self, request):
@@ -11,6 +100,21 @@ class QueryParamAuthentication(TokenAuthentication):
             return self.authenticate_credentials(token)
         return super().authenticate(request)
 
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        values = local_tokens.get(cache_key)
+        if values is None:
+            values = cache.get(cache_key)
+            if values is None:
+                user, _ = super().authenticate_credentials(key)
+                values = tuple(getattr(user, name) for name in cached_user_fields())
+                cache.set(cache_key, values, getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60))
+            local_tokens.set(cache_key, values)
+        # A new instance per request: requests cache relations and permissions
+        # on request.user.
+        user = get_user_model().from_db('default', cached_user_fields(), values)
+        return user, Token.from_db('default', ('key', 'user_id'), (key, user.pk))
+
 
 class NoCSRFSessionAuthentication(SessionAuthentication):
     def enforce_csrf(self, request):
@@ -0,0 +1,239 @@
+import hashlib
+from calendar import timegm
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.caching import get_version, query_fingerprint
+
+
+# Columns of a rendered user (UserSerializer embeds the profile and its
+# avatar) for conditional GET validators; the profile counters move without
+# touching ``modified``.
+USER_VALIDATOR_FIELDS = (
+    'modified', 'profile__modified', 'profile__posted_jobs_count', 'profile__completion_percentage',
+    'profile__avatar__modified',
+)
+
+
+def related_validator_fields(relation, fields):
+    return tuple(f'{relation}__{field}' for field in fields)
+
+
+def viewer_namespace(user_id):
+    """Bumped when a user's own state shown on shared objects (saved jobs and freelancers) changes."""
+    return f'viewer:{user_id}'
+
+
+class ResponseCacheMixin:
+    """
+    Caches the rendered data of ``list`` and ``retrieve`` GETs under the
+    view's versioned ``response_cache_namespace``. Entries are rendered
+    without per-viewer fields (serializer context ``viewer_fields=False``)
+    so they can be shared by every viewer with the same role;
+    ``add_viewer_fields`` layers those fields back on for each request.
+    """
+    response_cache_namespace = None
+    response_cache_timeout_setting = 'API_RESPONSE_CACHE_TIMEOUT'
+    # Query parameters that never change the response body. They are kept
+    # out of the cached pagination links, which echo the request URL, and
+    # put back per request: ``token`` is one viewer's credential.
+    response_cache_ignored_params = ('token',)
+    pagination_link_fields = ('next', 'previous')
+
+    def is_response_cacheable(self):
+        return self.request.method == 'GET'
+
+    def add_viewer_fields(self, items, viewer):
+        return items
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['viewer_fields'] = not getattr(self, 'rendering_cached_response', False)
+        return context
+
+    def rewrite_pagination_links(self, data, rewrite):
+        if not isinstance(data, dict) or not any(data.get(name) for name in self.pagination_link_fields):
+            return data
+        data = data.copy()
+        for name in self.pagination_link_fields:
+            if data.get(name):
+                data[name] = rewrite(data[name])
+        return data
+
+    def strip_link_params(self, url):
+        for name in self.response_cache_ignored_params:
+            url = remove_query_param(url, name)
+        return url
+
+    def restore_link_params(self, url):
+        for name in self.response_cache_ignored_params:
+            value = self.request.query_params.get(name)
+            if value is not None:
+                url = replace_query_param(url, name, value)
+        return url
+
+    def get_response_cache_key(self):
+        user = self.request.user
+        role = user.role if user.is_authenticated else 'anonymous'
+        params = query_fingerprint(self.request.query_params, ignore=self.response_cache_ignored_params)
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')
+        version = get_version(self.response_cache_namespace)
+        return f'response:{self.response_cache_namespace}:{version}:{self.action}:{lookup}:{role}:{params}'
+
+    def cached_response(self, render, request, *args, **kwargs):
+        if not self.is_response_cacheable():
+            return render(request, *args, **kwargs)
+
+        key = self.get_response_cache_key()
+        entry = cache.get(key)
+        if entry is None:
+            self.rendering_cached_response = True
+            try:
+                response = render(request, *args, **kwargs)
+            finally:
+                self.rendering_cached_response = False
+            if response.status_code != 200:
+                return response
+            # Kept with the data so hits can still answer conditional requests.
+            data = self.rewrite_pagination_links(response.data, self.strip_link_params)
+            entry = (data, getattr(response, 'conditional_validators', None))
+            cache.set(key, entry, getattr(settings, self.response_cache_timeout_setting))
+        data, validators = entry
+        data = self.rewrite_pagination_links(data, self.restore_link_params)
+
+        def respond():
+            if request.user.is_authenticated:
+                items = data['results'] if self.action == 'list' and isinstance(data, dict) else data
+                self.add_viewer_fields(items if isinstance(items, list) else [items], request.user)
+            return Response(data)
+
+        if validators is None:
+            return respond()
+        return self.conditional_response(validators, respond)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+
+def _related_aggregate(model, relation, aggregate):
+    """``aggregate`` over the rows of a reverse foreign key ``relation``, as a correlated subquery."""
+    remote = model._meta.get_field(relation)
+    foreign_key = remote.field.name
+    rows = remote.related_model.objects.filter(**{foreign_key: OuterRef('pk')}).order_by().values(foreign_key)
+    return Subquery(rows.annotate(value=aggregate).values('value'))
+
+
+class ConditionalGetMixin:
+    """
+    Gives ``list`` and ``retrieve`` responses an ETag and Last-Modified, and
+    answers a GET whose ``If-None-Match`` (or ``If-Modified-Since``) still
+    holds with an empty 304 once the rows are loaded, before anything is
+    serialized.
+
+    The ETag is built only from the rows the response renders: each row's
+    pk and ``conditional_modified_fields`` (its own and embedded columns,
+    including counters that move without touching ``modified``), and for
+    each reverse relation in ``conditional_related_fields`` the number of
+    related rows and the newest value of each listed field. It also covers
+    the page envelope (count and links), the query, the response format and
+    the viewer with their ``viewer_namespace`` version. Writes elsewhere
+    leave it alone. Last-Modified is the newest of those timestamps; it
+    cannot see a removed related row, which only the ETag catches.
+    Responses are marked ``private, no-cache`` so clients revalidate rather
+    than reuse them.
+    """
+    conditional_modified_fields = ('modified',)
+    conditional_related_fields = {}
+    conditional_ignored_params = ('token',)
+
+    def get_row_validators(self, objects):
+        fields = self.conditional_modified_fields
+        related = self.conditional_related_fields
+        if not related and not any('__' in field for field in fields):
+            return [(obj.pk, *(getattr(obj, field) for field in fields)) for obj in objects]
+        # Related values come from one query rather than one per row.
+        if not objects:
+            return []
+        model = objects[0]._meta.model
+        aggregates = []
+        for relation, related_fields in related.items():
+            aggregates.append(_related_aggregate(model, relation, Count('pk')))
+            aggregates += [_related_aggregate(model, relation, Max(field)) for field in related_fields]
+        annotations = {f'validator_{index}': aggregate for index, aggregate in enumerate(aggregates)}
+        pks = [obj.pk for obj in objects]
+        queryset = model.objects.filter(pk__in=pks).annotate(**annotations).values_list('pk', *fields, *annotations)
+        rows = {row[0]: row for row in queryset}
+        return [rows.get(pk) for pk in pks]
+
+    def get_conditional_validators(self, objects, envelope=None):
+        """
+        Returns the viewer independent part of the ETag and the Last-Modified
+        timestamp of a response rendering ``objects``.
+        """
+        rows = self.get_row_validators(objects)
+        timestamps = [value for row in rows if row for value in row[1:] if isinstance(value, datetime)]
+        state = (
+            self.action,
+            self.request.accepted_renderer.format,
+            query_fingerprint(self.request.query_params, ignore=self.conditional_ignored_params),
+            envelope,
+            rows,
+        )
+        last_modified = timegm(max(timestamps).utctimetuple()) if timestamps else None
+        return hashlib.sha1(repr(state).encode()).hexdigest(), last_modified
+
+    def get_etag(self, digest):
+        user = self.request.user
+        viewer = (user.pk, get_version(viewer_namespace(user.pk))) if user.is_authenticated else None
+        return 'W/"%s"' % hashlib.sha1(repr((digest, viewer)).encode()).hexdigest()
+
+    def conditional_response(self, validators, render):
+        digest, last_modified = validators
+        etag = self.get_etag(digest)
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+            response.conditional_validators = validators
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            objects = list(queryset)
+            envelope = None
+        else:
+            objects = page
+            envelope = {
+                name: value for name, value in self.get_paginated_response([]).data.items() if name != 'results'
+            }
+
+        def render():
+            serializer = self.get_serializer(objects, many=True)
+            if page is None:
+                return Response(serializer.data)
+            return self.get_paginated_response(serializer.data)
+
+        return self.conditional_response(self.get_conditional_validators(objects, envelope), render)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.conditional_response(
+            self.get_conditional_validators([instance]),
+            lambda: Response(self.get_serializer(instance).data),
+        )
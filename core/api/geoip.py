@@ -0,0 +1,222 @@
+"""
+GeoIP resolution backed by a local IP range database.
+
+Lookups go through the shared Django cache first, then a sorted interval
+index loaded from ``settings.GEOIP_RANGES_FILE`` (binary search per IP),
+and only then, if ``GEOIP_REMOTE_FALLBACK`` is enabled, ipapi.co through a
+pooled HTTP session. The ranges file is a CSV with a header row and the
+columns ``ip_start, ip_end, country_code, country, state_code, state,
+city, postal, timezone, lat, lon``; IPv4 and IPv6 ranges may be mixed.
+"""
+import csv
+import ipaddress
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+CACHE_KEY_PREFIX = 'geoip:'
+# Cached in place of None so misses are not retried on every request.
+MISS = 'miss'
+# Returned by the remote lookup when it failed rather than found nothing.
+UNAVAILABLE = object()
+
+
+def parse_public_ip(ip):
+    """Returns the ``ip_address`` for a routable IP literal, otherwise None."""
+    if not ip:
+        return None
+    try:
+        ip_obj = ipaddress.ip_address(str(ip).strip())
+    except ValueError:
+        # Not a valid IP literal (could be hostname). Don't guess here.
+        return None
+    # Skip internal/non-routable IPs
+    if (
+        ip_obj.is_private
+        or ip_obj.is_loopback
+        or ip_obj.is_reserved
+        or ip_obj.is_multicast
+        or ip_obj.is_link_local
+    ):
+        return None
+    return ip_obj
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class IPRangeIndex:
+    """Sorted, non-overlapping IP ranges searched with ``bisect``."""
+
+    def __init__(self, rows=()):
+        ranges = {4: [], 6: []}
+        for row in rows:
+            start = ipaddress.ip_address(row['ip_start'].strip())
+            end = ipaddress.ip_address(row['ip_end'].strip())
+            ranges[start.version].append((int(start), int(end), {
+                "country": row.get('country') or None,
+                "country_code": row.get('country_code') or None,
+                "state": row.get('state') or None,
+                "state_code": row.get('state_code') or None,
+                "city": row.get('city') or None,
+                "postal": row.get('postal') or None,
+                "timezone": row.get('timezone') or None,
+                "lat": _float_or_none(row.get('lat')),
+                "lon": _float_or_none(row.get('lon')),
+            }))
+
+        self._starts, self._ends, self._locations = {}, {}, {}
+        for version, items in ranges.items():
+            items.sort(key=lambda item: item[0])
+            self._starts[version] = [item[0] for item in items]
+            self._ends[version] = [item[1] for item in items]
+            self._locations[version] = [item[2] for item in items]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, newline='', encoding='utf-8') as ranges_file:
+            return cls(csv.DictReader(ranges_file))
+
+    def __len__(self):
+        return sum(len(starts) for starts in self._starts.values())
+
+    def lookup(self, ip_obj):
+        starts = self._starts[ip_obj.version]
+        value = int(ip_obj)
+        position = bisect_right(starts, value) - 1
+        if position < 0 or value > self._ends[ip_obj.version][position]:
+            return None
+        return self._locations[ip_obj.version][position]
+
+
+_index = None
+_index_lock = threading.Lock()
+_session = None
+
+
+def get_range_index():
+    """Loads the ranges file once per process; an empty index when none is configured."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = getattr(settings, 'GEOIP_RANGES_FILE', None)
+                _index = IPRangeIndex.from_file(path) if path else IPRangeIndex()
+    return _index
+
+
+def get_session():
+    global _session
+    if _session is None:
+        pool_size = getattr(settings, 'GEOIP_REMOTE_POOL_SIZE', 10)
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+        _session = session
+    return _session
+
+
+def _local_location(ip_obj):
+    location = get_range_index().lookup(ip_obj)
+    if location is None:
+        return None
+    return {"ip": str(ip_obj), "source": "local", **location}
+
+
+def _remote_location(ip):
+    """
+    The ipapi.co location of ``ip``, None when it has none, or UNAVAILABLE
+    when the lookup failed (timeouts, server errors, rate limiting).
+    """
+    # Use a free HTTPS endpoint (rate-limited but fine for light usage).
+    # Docs: https://ipapi.co/api/#complete-location
+    url = f"https://ipapi.co/{ip}/json/"
+    try:
+        resp = get_session().get(url, timeout=getattr(settings, 'GEOIP_REMOTE_TIMEOUT', 3))
+        if resp.status_code == 429 or resp.status_code >= 500:
+            return UNAVAILABLE
+        if resp.status_code != 200:
+            return None
+        payload = resp.json()
+    except Exception:
+        return UNAVAILABLE
+
+    # ipapi returns {"error": true, "reason": "..."} on failure
+    if not isinstance(payload, dict):
+        return UNAVAILABLE
+    if payload.get("error"):
+        return UNAVAILABLE if payload.get("reason") == "RateLimited" else None
+
+    return {
+        "ip": ip,
+        "source": "ipapi.co",
+        "country": payload.get("country_name"),
+        "country_code": payload.get("country_code"),
+        "state": payload.get("region"),
+        "state_code": payload.get("region_code"),
+        "city": payload.get("city"),
+        "postal": payload.get("postal"),
+        "timezone": payload.get("timezone"),
+        "lat": payload.get("latitude"),
+        "lon": payload.get("longitude"),
+    }
+
+
+def resolve_ip_locations(ips):
+    """
+    Resolves many IPs at once: one cache round trip for all of them, the
+    local index for the misses and, optionally, concurrent remote lookups
+    for whatever is left. Returns ``{ip: location or None}`` keyed by the
+    IPs as given.
+    """
+    parsed = {ip: parse_public_ip(ip) for ip in ips}
+    results = {ip: None for ip in ips}
+    keys = {str(ip_obj): f'{CACHE_KEY_PREFIX}{ip_obj}' for ip_obj in parsed.values() if ip_obj}
+
+    cached = cache.get_many(keys.values())
+    locations = {}
+    unresolved = []
+    for normalized, key in keys.items():
+        if key in cached:
+            locations[normalized] = None if cached[key] == MISS else cached[key]
+            continue
+        location = _local_location(ipaddress.ip_address(normalized))
+        if location is None:
+            unresolved.append(normalized)
+        locations[normalized] = location
+
+    failed = set()
+    if unresolved and getattr(settings, 'GEOIP_REMOTE_FALLBACK', True):
+        workers = min(len(unresolved), getattr(settings, 'GEOIP_REMOTE_CONCURRENCY', 4))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for normalized, location in zip(unresolved, executor.map(_remote_location, unresolved)):
+                if location is UNAVAILABLE:
+                    failed.add(normalized)
+                    location = None
+                locations[normalized] = location
+
+    fresh = {ip: location for ip, location in locations.items() if keys[ip] not in cached}
+    hits = {keys[ip]: location for ip, location in fresh.items() if location}
+    misses = {keys[ip]: MISS for ip, location in fresh.items() if not location and ip not in failed}
+    # Failed lookups are retried soon, not held as misses for an hour; the
+    # short entry only keeps an outage from costing a timeout per request.
+    errors = {keys[ip]: MISS for ip in failed}
+    if hits:
+        cache.set_many(hits, timeout=getattr(settings, 'GEOIP_CACHE_TIMEOUT', 60 * 60 * 24))
+    if misses:
+        cache.set_many(misses, timeout=getattr(settings, 'GEOIP_MISS_CACHE_TIMEOUT', 60 * 60))
+    if errors:
+        cache.set_many(errors, timeout=getattr(settings, 'GEOIP_ERROR_CACHE_TIMEOUT', 60))
+
+    for ip, ip_obj in parsed.items():
+        if ip_obj:
+            results[ip] = locations[str(ip_obj)]
+    return results
@@ -0,0 +1,24 @@
+import time
+
+
+class SerializerTimingMixin:
+    """
+    Adds the time from the view's first ``get_serializer`` call to
+    ``finalize_response`` (validation, saving and building the response
+    data) to the request's metrics sample, when MetricsMiddleware sampled
+    it. Rendering the data to JSON happens after ``finalize_response`` and
+    only counts towards the request's total latency.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if getattr(self, '_serializer_started', None) is None:
+            self._serializer_started = time.perf_counter()
+        return super().get_serializer(*args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        started = getattr(self, '_serializer_started', None)
+        sample = getattr(request, 'metrics_sample', None)
+        if started is not None and sample is not None:
+            sample.serializer_seconds = (sample.serializer_seconds or 0.0) + time.perf_counter() - started
+        return response
@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class StandardPagination(PageNumberPagination):
@@ -8,3 +16,141 @@ class StandardPagination(PageNumberPagination):
 
 class AllPagination(PageNumberPagination):
     page_size = 1000
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on a ``(timestamp, id)`` pair, so every page is
+    an index range scan no matter how deep the client scrolls. Totals are
+    only counted when the client passes ``count=true``. A queryset the view
+    ordered some other way (a search rank, a relevance score, ``?ordering=``)
+    cannot be walked by those keys and is refused with a 400.
+    """
+    page_size = 200
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # Both keys must sort in the same direction; the last one must be unique.
+    ordering = ('-created', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+    unsupported_ordering_message = 'Cursor pagination only follows the {ordering} order; use page numbers for this list.'
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return params.get('pagination') == 'cursor' or cls.cursor_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    @property
+    def descending(self):
+        return self.ordering[0].startswith('-')
+
+    @property
+    def key_fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, item, reverse):
+        position = [str(getattr(item, name)) for name in self.key_fields]
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            position = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.key_fields, payload['p'])
+            ]
+            return position, bool(payload['r'])
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def check_ordering(self, queryset):
+        ordering = list(queryset.query.order_by)
+        if ordering != list(self.ordering[:len(ordering)]):
+            message = self.unsupported_ordering_message.format(ordering=', '.join(self.ordering))
+            raise ValidationError({self.cursor_query_param: [message]})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.check_ordering(queryset)
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true', 'True'):
+            self.count = queryset.count()
+
+        # Walking backwards flips the sort so the page is still a LIMIT scan.
+        descending = self.descending != reverse
+        first, second = self.key_fields
+        queryset = queryset.order_by(*[f'-{name}' if descending else name for name in self.key_fields])
+        if position:
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{first}__{lookup}': position[0]})
+                | Q(**{first: position[0], f'{second}__{lookup}': position[1]})
+            )
+
+        items = list(queryset[:self.page_size + 1])
+        has_more = len(items) > self.page_size
+        items = items[:self.page_size]
+        if reverse:
+            items.reverse()
+
+        has_next = True if reverse else has_more
+        has_previous = has_more if reverse else position is not None
+        self.next_cursor = self.previous_cursor = None
+        if items:
+            if has_next:
+                self.next_cursor = self.encode_cursor(items[-1], reverse=False)
+            if has_previous:
+                self.previous_cursor = self.encode_cursor(items[0], reverse=True)
+        return items
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        fields = [
+            ('next', self.get_link(self.next_cursor)),
+            ('previous', self.get_link(self.previous_cursor)),
+        ]
+        if self.count is not None:
+            fields.append(('count', self.count))
+        fields.append(('results', data))
+        return Response(OrderedDict(fields))
+
+
+class InboxPagination(KeysetPagination):
+    """Keyset pages of ConversationMember rows, most recently active first."""
+    ordering = ('-last_message_at', '-id')
+
+
+class KeysetPaginationMixin:
+    """
+    Switches a view to ``keyset_pagination_class`` when the request opts in
+    with ``pagination=cursor`` or carries a ``cursor`` parameter, keeping the
+    default page-number pagination for everyone else.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.keyset_pagination_class.is_requested(self.request):
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
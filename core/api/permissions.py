@@ -1,7 +1,40 @@
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework import permissions
 
+from core.caching import get_version, version_key
 from core.constants import ORGANIZATION_ADMIN_ROLE_NAME
 
+PERMISSIONS_NAMESPACE = 'permissions'
+
+
+def get_permission_codenames(user):
+    """
+    Returns the codenames of every permission ``user`` has, directly or
+    through a group, as a frozenset.
+
+    ``get_all_permissions()`` joins the group and permission tables on each
+    call, so the result is cached per user together with the permission
+    version it was resolved under. core.signals bumps that version whenever
+    a group membership, user permission or group permission changes, which
+    makes a check one ``get_many`` round trip when nothing has changed.
+    """
+    if not user.is_active or user.is_anonymous:
+        return frozenset()
+
+    # Superusers implicitly have every permission; keep them apart so a
+    # promotion or demotion never reads the other state's entry.
+    key = f'permissions:{user.pk}:{int(user.is_superuser)}'
+    cached = cache.get_many([version_key(PERMISSIONS_NAMESPACE), key])
+    version = cached.get(version_key(PERMISSIONS_NAMESPACE)) or get_version(PERMISSIONS_NAMESPACE)
+    entry = cached.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    codenames = frozenset(perm.split('.', 1)[1] for perm in user.get_all_permissions())
+    cache.set(key, (version, codenames), getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 60 * 60))
+    return codenames
+
 
 class CustomPermission(permissions.BasePermission):
 
@@ -17,7 +50,4 @@ class CustomPermission(permissions.BasePermission):
             return True
 
         permissions = self.permission_map.get(request.method, [])
-        user_permissions = request.user.get_all_permissions()
-        user_permissions = [perm.split('.')[1] for perm in user_permissions]
-
-        return set(permissions).intersection(set(user_permissions))
+        return not get_permission_codenames(request.user).isdisjoint(permissions)
@@ -1,12 +1,142 @@
+from django.conf import settings
 from django.contrib.auth.models import Group, Permission
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from rest_framework.exceptions import ValidationError
 from rest_framework import serializers
-from django.db.models import Count, Window, Avg, Value
+from django.db import models
+from django.db.models import Count, Window, Avg, Value, Prefetch, prefetch_related_objects
 from core.models import *
+from core.bulk import APPLICATION_STATUSES, MAX_BULK_ITEMS
 from .utilities import *
 
 
+def get_viewer(context):
+    """
+    The authenticated user whose per-viewer fields (``is_saved``, ``my_*``)
+    are rendered, or None. Cached responses are rendered with
+    ``viewer_fields=False`` and get those fields layered on afterwards.
+    """
+    request = context.get('request')
+    if context.get('viewer_fields', True) and request and request.user.is_authenticated:
+        return request.user
+    return None
+
+
+SPARSE_FIELDSET_KEY = 'sparse_fieldset'
+
+
+def parse_field_paths(value):
+    """Turns ``"id,user.username,user.profile"`` into a nested dict of field names."""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldset:
+    """
+    The ``fields`` and ``expand`` selections that apply to one serializer.
+    ``fields`` is None when every field is wanted.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand or {}
+
+    @classmethod
+    def from_request(cls, request):
+        # Writes always see every field, so input is never silently dropped.
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        params = request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+        fields = parse_field_paths(params['fields']) if 'fields' in params else None
+        return cls(fields or None, parse_field_paths(params.get('expand')))
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        return name in self.expand or (self.fields is not None and name in self.fields)
+
+    def child(self, name):
+        fields = self.fields.get(name) if self.fields is not None else None
+        return SparseFieldset(fields or None, self.expand.get(name))
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients trim the representation with ``?fields=`` and ``?expand=``
+    (comma separated; dotted paths reach nested serializers, e.g.
+    ``fields=id,title,user.username``). Without either parameter the full
+    representation is rendered. With one of them, only the requested fields
+    are kept (the primary key always is), and ``Meta.expandable_fields`` are
+    only rendered when named in ``expand`` or ``fields``: a nested object
+    collapses to its primary key, a computed relation is left out. Fields
+    that are dropped are never evaluated, so they cost no queries.
+    """
+
+    @property
+    def sparse_fieldset(self):
+        if not hasattr(self, '_sparse_fieldset'):
+            path = []
+            node = self
+            while node.parent is not None:
+                if not isinstance(node, serializers.ListSerializer) and node.field_name:
+                    path.insert(0, node.field_name)
+                node = node.parent
+            context = node.context
+            if SPARSE_FIELDSET_KEY not in context:
+                context[SPARSE_FIELDSET_KEY] = SparseFieldset.from_request(context.get('request'))
+            fieldset = context[SPARSE_FIELDSET_KEY]
+            for name in path:
+                if fieldset is None:
+                    break
+                fieldset = fieldset.child(name)
+            self._sparse_fieldset = fieldset
+        return self._sparse_fieldset
+
+    def nested_context(self, field_name):
+        """Context for a serializer created by a method field, carrying its part of the fieldset."""
+        fieldset = self.sparse_fieldset
+        return {SPARSE_FIELDSET_KEY: fieldset.child(field_name) if fieldset else None}
+
+    def nested_relations(self, field_name, serializer_class):
+        """
+        The ``select_related`` paths a method field rendering
+        ``serializer_class`` needs for its user, given the fieldset.
+        """
+        fields = serializer_class(context=self.nested_context(field_name)).fields
+        user = fields.get('user')
+        if not isinstance(user, UserSerializer):
+            return ()
+        return ('user__profile__avatar',) if 'profile' in user.fields else ('user',)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.sparse_fieldset
+        if fieldset is None:
+            return fields
+
+        pk_name = self.Meta.model._meta.pk.name
+        expandable = getattr(self.Meta, 'expandable_fields', ())
+        for name, field in list(fields.items()):
+            if name == pk_name:
+                continue
+            if not fieldset.includes(name):
+                del fields[name]
+            elif name in expandable and not fieldset.expands(name):
+                if isinstance(field, serializers.BaseSerializer) and not isinstance(field, serializers.ListSerializer):
+                    fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, source=field.source)
+                else:
+                    del fields[name]
+        return fields
+
+
 class OrganizationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Organization
@@ -18,16 +148,35 @@ class ResourceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Resource
         fields = "__all__"
+        read_only_fields = ("user", "content_hash", "byte_size", "derivatives")
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    resource = ResourceSerializer(read_only=True)
 
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'name', 'category', 'byte_size', 'received_bytes', 'resource', 'created')
+        read_only_fields = ('received_bytes',)
+
+    def validate_byte_size(self, value):
+        if not 0 < value <= settings.RESOURCE_RESUMABLE_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Must be between 1 and {settings.RESOURCE_RESUMABLE_MAX_SIZE} bytes."
+            )
+        return value
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     profile = serializers.SerializerMethodField()
     is_saved = serializers.SerializerMethodField()
 
     def get_is_saved(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return SavedFreelancer.objects.filter(user=request.user, freelancer=obj).exists()
+        viewer = get_viewer(self.context)
+        if viewer:
+            if hasattr(obj, 'viewer_saved'):
+                return bool(obj.viewer_saved)
+            return SavedFreelancer.objects.filter(user=viewer, freelancer=obj).exists()
         return False
 
     def __init__(self, *args, **kwargs):
@@ -40,10 +189,11 @@ class UserSerializer(serializers.ModelSerializer):
         return user
     
     def get_profile(self, obj):
-        profile = Profile.objects.filter(user=obj).first()
-        if profile:
-            return ProfileSerializer(profile).data
-        return None
+        try:
+            profile = obj.profile
+        except Profile.DoesNotExist:
+            return None
+        return ProfileSerializer(profile, context=self.nested_context('profile')).data
 
     class Meta:
         model = User
@@ -59,6 +209,7 @@ class UserSerializer(serializers.ModelSerializer):
             "profile",
             "is_saved",
         )
+        expandable_fields = ("profile",)
 
 
 class CustomRegisterSerializer(RegisterSerializer):
@@ -97,7 +248,7 @@ class UpdateUserSerializer(serializers.ModelSerializer):
         fields = ("username", "first_name", "groups", "is_active")
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     avatar = ResourceSerializer()
     completion_percentage = serializers.ReadOnlyField()
     posted_jobs_count = serializers.ReadOnlyField()
@@ -105,29 +256,105 @@ class ProfileSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Profile
-        fields = "__all__"
+        exclude = ("skill_tags", "category_tags")
+        expandable_fields = ("avatar",)
 
 
-class JobApplicationDetailSerializer(serializers.ModelSerializer):
+class JobApplicationDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     class Meta:
         model = JobApplication
         fields = "__all__"
+        expandable_fields = ("user",)
 
-class JobInvitationDetailSerializer(serializers.ModelSerializer):
+class JobInvitationDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     class Meta:
         model = JobInvitation
         fields = "__all__"
+        expandable_fields = ("user",)
 
 
-class JobOfferDetailSerializer(serializers.ModelSerializer):
+class JobOfferDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = JobOffer
         fields = "__all__"
 
 
-class JobPostingSerializer(serializers.ModelSerializer):
+def first_prefetched(obj, attr):
+    items = getattr(obj, attr)
+    return items[0] if items else None
+
+
+class JobPostingListSerializer(serializers.ListSerializer):
+    """
+    Collects the whole page of job postings first and loads every relation
+    the child serializer reads with one query per relation, instead of
+    running those queries once per posting.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        job_postings = list(iterable)
+        prefetch_related_objects(job_postings, *self.get_prefetches())
+        return [self.child.to_representation(item) for item in job_postings]
+
+    def get_prefetches(self):
+        # Only relations of fields that survive ``?fields=``/``?expand=`` are loaded.
+        fields = self.child.fields
+        user_fields = fields['user'].fields if isinstance(fields.get('user'), UserSerializer) else {}
+        applications = JobApplication.objects.select_related(
+            *self.child.nested_relations('job_applications', JobApplicationDetailSerializer)
+        )
+        prefetches = []
+        if user_fields:
+            prefetches.append('user__profile__avatar' if 'profile' in user_fields else 'user')
+        if 'job_applications' in fields:
+            prefetches.append(Prefetch('job_applications', queryset=applications))
+        if 'job_invitations' in fields:
+            prefetches.append('job_invitations')
+        if 'job_offers' in fields:
+            prefetches.append('job_offers')
+
+        user = get_viewer(self.context)
+        if user:
+            if 'is_saved' in fields:
+                prefetches.append(
+                    Prefetch('savedjob_set', queryset=SavedJob.objects.filter(user=user), to_attr='viewer_saved')
+                )
+            if 'is_saved' in user_fields:
+                prefetches.append(Prefetch(
+                    'user__savedfreelancer_set',
+                    queryset=SavedFreelancer.objects.filter(user=user),
+                    to_attr='viewer_saved'
+                ))
+            # Ordered by pk to pick the same row as ``.first()`` does per posting.
+            if 'my_application' in fields:
+                prefetches.append(Prefetch(
+                    'job_applications',
+                    queryset=JobApplication.objects.select_related(
+                        *self.child.nested_relations('my_application', JobApplicationDetailSerializer)
+                    ).filter(user=user).order_by('pk'),
+                    to_attr='viewer_applications'
+                ))
+            if 'my_invitation' in fields:
+                prefetches.append(Prefetch(
+                    'job_invitations',
+                    queryset=JobInvitation.objects.select_related(
+                        *self.child.nested_relations('my_invitation', JobInvitationDetailSerializer)
+                    ).filter(user=user, status='pending').order_by('pk'),
+                    to_attr='viewer_invitations'
+                ))
+            if 'my_offer' in fields:
+                prefetches.append(Prefetch(
+                    'job_offers',
+                    queryset=JobOffer.objects.filter(user=user).order_by('pk'),
+                    to_attr='viewer_offers'
+                ))
+        return prefetches
+
+
+class JobPostingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     proposal_count = serializers.ReadOnlyField()
     interview_count = serializers.ReadOnlyField()
@@ -142,62 +369,215 @@ class JobPostingSerializer(serializers.ModelSerializer):
     is_saved = serializers.SerializerMethodField()
 
     def get_is_saved(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return SavedJob.objects.filter(user=request.user, job_posting=obj).exists()
+        viewer = get_viewer(self.context)
+        if viewer:
+            if hasattr(obj, 'viewer_saved'):
+                return bool(obj.viewer_saved)
+            return SavedJob.objects.filter(user=viewer, job_posting=obj).exists()
         return False
 
     def get_my_application(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            job_application = JobApplication.objects.filter(user=request.user, job_posting=obj).first()
+        viewer = get_viewer(self.context)
+        if viewer:
+            if hasattr(obj, 'viewer_applications'):
+                job_application = first_prefetched(obj, 'viewer_applications')
+            else:
+                job_application = JobApplication.objects.filter(user=viewer, job_posting=obj).first()
             if job_application:
-                return JobApplicationDetailSerializer(job_application).data
+                return JobApplicationDetailSerializer(job_application, context=self.nested_context('my_application')).data
         return None
 
     def get_my_invitation(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            job_invitation = JobInvitation.objects.filter(user=request.user, job_posting=obj, status='pending').first()
+        viewer = get_viewer(self.context)
+        if viewer:
+            if hasattr(obj, 'viewer_invitations'):
+                job_invitation = first_prefetched(obj, 'viewer_invitations')
+            else:
+                job_invitation = JobInvitation.objects.filter(user=viewer, job_posting=obj, status='pending').first()
             if job_invitation:
-                return JobInvitationDetailSerializer(job_invitation).data
+                return JobInvitationDetailSerializer(job_invitation, context=self.nested_context('my_invitation')).data
         return None
 
     def get_my_offer(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            job_offer = JobOffer.objects.filter(user=request.user, job_posting=obj).first()
+        viewer = get_viewer(self.context)
+        if viewer:
+            if hasattr(obj, 'viewer_offers'):
+                job_offer = first_prefetched(obj, 'viewer_offers')
+            else:
+                job_offer = JobOffer.objects.filter(user=viewer, job_posting=obj).first()
             if job_offer:
-                return JobOfferDetailSerializer(job_offer).data
+                return JobOfferDetailSerializer(job_offer, context=self.nested_context('my_offer')).data
         return None
-    
+
     def get_job_applications(self, obj):
-        applications = JobApplication.objects.filter(job_posting=obj)
-        return JobApplicationDetailSerializer(applications, many=True).data
+        # ``all()`` reads the prefetch cache when the list serializer filled it.
+        applications = obj.job_applications.all()
+        return JobApplicationDetailSerializer(
+            applications, many=True, context=self.nested_context('job_applications')
+        ).data
 
     def get_job_invitations(self, obj):
-        invitations = JobInvitation.objects.filter(job_posting=obj)
-        return JobInvitationSerializer(invitations, many=True).data
-    
+        invitations = obj.job_invitations.all()
+        return JobInvitationSerializer(invitations, many=True, context=self.nested_context('job_invitations')).data
+
     def get_job_offers(self, obj):
-        offers = JobOffer.objects.filter(job_posting=obj)
-        return JobOfferDetailSerializer(offers, many=True).data
-    
+        offers = obj.job_offers.all()
+        return JobOfferDetailSerializer(offers, many=True, context=self.nested_context('job_offers')).data
+
     class Meta:
         model = JobPosting
-        fields = "__all__"
+        exclude = ("skill_tags", "category_tags")
+        expandable_fields = (
+            "user",
+            "my_application",
+            "my_invitation",
+            "my_offer",
+            "job_applications",
+            "job_invitations",
+            "job_offers",
+        )
+        list_serializer_class = JobPostingListSerializer
+
+
+def _first_per_posting(queryset):
+    rows = {}
+    for row in queryset.order_by('pk'):
+        rows.setdefault(str(row.job_posting_id), row)
+    return rows
+
+
+def add_viewer_fields(items, viewer, fieldset=None):
+    """
+    Fills in the per-viewer fields of already serialized job postings, in
+    place, with one query per relation for the whole list. Produces the
+    same values JobPostingSerializer renders for ``viewer`` and ``fieldset``.
+    """
+    if not items:
+        return items
+    # Every item comes from the same serializer, so the first shows which fields were rendered.
+    rendered = items[0]
+    owner_rendered = rendered['user'] if isinstance(rendered.get('user'), dict) else {}
+    posting_ids = [item['id'] for item in items]
+
+    saved_postings = set()
+    if 'is_saved' in rendered:
+        saved_postings = {
+            str(pk) for pk in SavedJob.objects.filter(user=viewer, job_posting_id__in=posting_ids).values_list(
+                'job_posting_id', flat=True
+            )
+        }
+    saved_owners = set()
+    if 'is_saved' in owner_rendered:
+        owner_ids = [item['user']['id'] for item in items]
+        saved_owners = {
+            str(pk) for pk in SavedFreelancer.objects.filter(user=viewer, freelancer_id__in=owner_ids).values_list(
+                'freelancer_id', flat=True
+            )
+        }
+
+    relations = []
+    for field, queryset, serializer_class in (
+        ('my_application', JobApplication.objects.select_related('user__profile__avatar'), JobApplicationDetailSerializer),
+        (
+            'my_invitation',
+            JobInvitation.objects.select_related('user__profile__avatar').filter(status='pending'),
+            JobInvitationDetailSerializer
+        ),
+        ('my_offer', JobOffer.objects.all(), JobOfferDetailSerializer),
+    ):
+        if field in rendered:
+            rows = _first_per_posting(queryset.filter(user=viewer, job_posting_id__in=posting_ids))
+            context = {SPARSE_FIELDSET_KEY: fieldset.child(field) if fieldset else None}
+            relations.append((field, rows, serializer_class, context))
+
+    for item in items:
+        posting_id = item['id']
+        if 'is_saved' in item:
+            item['is_saved'] = posting_id in saved_postings
+        if 'is_saved' in owner_rendered:
+            item['user']['is_saved'] = item['user']['id'] in saved_owners
+        for field, rows, serializer_class, context in relations:
+            row = rows.get(posting_id)
+            item[field] = serializer_class(row, context=context).data if row else None
+    return items
+
+
+class JobPostingSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """A posting's own columns and counters, without any nested relation."""
+    proposal_count = serializers.ReadOnlyField()
+    interview_count = serializers.ReadOnlyField()
+    invite_count = serializers.ReadOnlyField()
+    coin_count = serializers.ReadOnlyField()
 
+    class Meta:
+        model = JobPosting
+        exclude = ("skill_tags", "category_tags")
+
+
+class SharedJobPostingListSerializer(serializers.ListSerializer):
+    """
+    Lists rows that point at a job posting and a user (applications,
+    offers), loading both relations for the whole page at once. When the
+    context sets ``shared_objects``, every posting is rendered a single
+    time into ``included`` and the rows reference it by id.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        items = list(iterable)
+        fields = self.child.fields
+        nests_posting = isinstance(fields.get('job_posting'), serializers.BaseSerializer)
+        shared = nests_posting and self.context.get('shared_objects', False)
+        if shared:
+            fields['job_posting'] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+        prefetches = []
+        user_fields = fields['user'].fields if isinstance(fields.get('user'), UserSerializer) else {}
+        if user_fields:
+            prefetches.append('user__profile__avatar' if 'profile' in user_fields else 'user')
+        viewer = get_viewer(self.context)
+        if viewer and 'is_saved' in user_fields:
+            prefetches.append(Prefetch(
+                'user__savedfreelancer_set',
+                queryset=SavedFreelancer.objects.filter(user=viewer),
+                to_attr='viewer_saved'
+            ))
+        if nests_posting:
+            prefetches.append('job_posting')
+        prefetch_related_objects(items, *prefetches)
+
+        rows = [self.child.to_representation(item) for item in items]
+        if shared:
+            postings = {item.job_posting_id: item.job_posting for item in items}
+            included = JobPostingSummarySerializer(
+                list(postings.values()), many=True, context=self.child.nested_context('job_posting')
+            ).data
+            self.included = {'job_postings': {posting['id']: posting for posting in included}}
+        return rows
+
+
+class JobApplicationSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """An application with its applicant and a summary of its posting."""
+    user = UserSerializer(read_only=True)
+    job_posting = JobPostingSummarySerializer(read_only=True)
+
+    class Meta:
+        model = JobApplication
+        fields = "__all__"
+        expandable_fields = ("user", "job_posting")
+        list_serializer_class = SharedJobPostingListSerializer
 
 
-class JobApplicationSerializer(serializers.ModelSerializer):
+class JobApplicationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     job_posting = JobPostingSerializer(read_only=True)
     class Meta:
         model = JobApplication
         fields = "__all__"
+        expandable_fields = ("user", "job_posting")
 
 
-class JobInvitationSerializer(serializers.ModelSerializer):
+class JobInvitationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # user = UserSerializer(read_only=True)
     # job_posting = JobPostingSerializer(read_only=True)
 
@@ -206,6 +586,16 @@ class JobInvitationSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class BulkInvitationSerializer(serializers.Serializer):
+    users = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=MAX_BULK_ITEMS)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class BulkApplicationStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=MAX_BULK_ITEMS)
+    status = serializers.ChoiceField(choices=APPLICATION_STATUSES)
+
+
 class JobOfferSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     job_posting = JobPostingSerializer(read_only=True)
@@ -233,6 +623,11 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class NotificationMarkReadSerializer(serializers.Serializer):
+    # Without ids every unread notification of the user is marked read.
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+
+
 class PlanSerializer(serializers.ModelSerializer):
     class Meta:
         model = Plan
@@ -249,3 +644,44 @@ class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = "__all__"
+
+
+class ConversationMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Message
+        fields = ('id', 'conversation', 'sender', 'recipient', 'description', 'created')
+        read_only_fields = ('conversation', 'sender', 'recipient')
+
+
+class ConversationParticipantSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'first_name', 'last_name', 'role')
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """
+    A user's inbox entry. Reads the conversation and both participants from
+    ``select_related``; the member row supplies the summary fields.
+    """
+    id = serializers.UUIDField(source='conversation_id', read_only=True)
+    participant = serializers.SerializerMethodField()
+    last_message = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ConversationMember
+        fields = ('id', 'participant', 'last_message', 'last_message_at', 'unread_count')
+
+    def get_participant(self, obj):
+        conversation = obj.conversation
+        other = conversation.user_high if conversation.user_low_id == obj.user_id else conversation.user_low
+        return ConversationParticipantSerializer(other).data
+
+    def get_last_message(self, obj):
+        message = obj.conversation.last_message
+        return ConversationMessageSerializer(message).data if message else None
+
+
+class ConversationCreateSerializer(serializers.Serializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.filter(is_active=True))
+    description = serializers.CharField(required=False, allow_blank=False)
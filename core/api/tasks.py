@@ -0,0 +1,95 @@
+import logging
+
+from celery import shared_task
+from django.db import transaction
+
+from core import images, notifications
+from core.models import JobApplication, JobInvitation, JobOffer, JobPosting, Resource, User
+from core.taxonomy import users_with_terms
+
+logger = logging.getLogger(__name__)
+
+
+def dispatch(task, *args):
+    # Queued only once the rows are committed, so the worker can read them. A
+    # broker outage loses the task, not the write that caused it, and fails
+    # fast: no publish retries, and no result subscription, which would
+    # retry the result backend on its own.
+    def send():
+        try:
+            task.apply_async(args, retry=False, ignore_result=True)
+        except Exception:
+            logger.exception("Could not queue %s for %s", task.name, args)
+
+    transaction.on_commit(send)
+
+
+@shared_task
+def notify_job_posting_published(job_posting_id):
+    """Tells every active freelancer sharing a skill with the posting about it."""
+    job_posting = JobPosting.objects.filter(pk=job_posting_id).only('user_id', 'title', 'skills').first()
+    if job_posting is None or not job_posting.skills:
+        return 0
+    freelancer_ids = User.objects.filter(
+        id__in=users_with_terms('skill_tags', job_posting.skills), role='freelancer', is_active=True
+    ).exclude(pk=job_posting.user_id).values_list('pk', flat=True)
+    return notifications.notify(
+        freelancer_ids.iterator(), notifications.JOB_POSTING_PUBLISHED,
+        'New job matching your skills', job_posting.title,
+    )
+
+
+@shared_task
+def notify_application_received(job_application_id):
+    application = JobApplication.objects.select_related('job_posting', 'user').filter(pk=job_application_id).first()
+    if application is None:
+        return 0
+    return notifications.notify(
+        [application.job_posting.user_id], notifications.APPLICATION_RECEIVED,
+        f'New proposal for {application.job_posting.title}', application.user.get_full_name(),
+    )
+
+
+@shared_task
+def notify_invitation_sent(job_invitation_id):
+    invitation = JobInvitation.objects.select_related('job_posting').filter(pk=job_invitation_id).first()
+    if invitation is None:
+        return 0
+    return notifications.notify(
+        [invitation.user_id], notifications.INVITATION_SENT,
+        f'You were invited to {invitation.job_posting.title}', invitation.description,
+    )
+
+
+@shared_task
+def notify_invitations_sent(job_invitation_ids):
+    """One notification per invitation of a bulk invite, all to the same posting."""
+    invitations = list(
+        JobInvitation.objects.select_related('job_posting').filter(pk__in=job_invitation_ids).order_by('user_id')
+    )
+    if not invitations:
+        return 0
+    job_posting = invitations[0].job_posting
+    return notifications.notify(
+        [invitation.user_id for invitation in invitations], notifications.INVITATION_SENT,
+        f'You were invited to {job_posting.title}', invitations[0].description,
+    )
+
+
+@shared_task
+def notify_offer_made(job_offer_id):
+    offer = JobOffer.objects.select_related('job_posting').filter(pk=job_offer_id).first()
+    if offer is None:
+        return 0
+    return notifications.notify(
+        [offer.user_id], notifications.OFFER_MADE,
+        f'You received an offer for {offer.job_posting.title}', None,
+    )
+
+
+@shared_task
+def generate_image_derivatives(resource_id):
+    resource = Resource.objects.filter(pk=resource_id).first()
+    if resource is None or not images.is_image(resource):
+        return {}
+    return images.generate_derivatives(resource)
@@ -8,6 +8,7 @@ import random
 import string
 import ipaddress
 from datetime import datetime
+from .geoip import resolve_ip_locations
 
 
 def get_ip_location(ip: str):
@@ -17,69 +18,15 @@ def get_ip_location(ip: str):
     """
     if not ip:
         return None
+    return resolve_ip_locations([ip])[ip]
 
-    ip = str(ip).strip()
-    try:
-        ip_obj = ipaddress.ip_address(ip)
-        # Skip internal/non-routable IPs
-        if (
-            ip_obj.is_private
-            or ip_obj.is_loopback
-            or ip_obj.is_reserved
-            or ip_obj.is_multicast
-            or ip_obj.is_link_local
-        ):
-            return None
-    except Exception:
-        # Not a valid IP literal (could be hostname). Don't guess here.
-        return None
-
-    # Use a free HTTPS endpoint (rate-limited but fine for light usage).
-    # Docs: https://ipapi.co/api/#complete-location
-    url = f"https://ipapi.co/{ip}/json/"
-    try:
-        resp = requests.get(url, timeout=3)
-        if resp.status_code != 200:
-            return None
-        payload = resp.json()
-    except Exception:
-        return None
 
-    # ipapi returns {"error": true, "reason": "..."} on failure
-    if isinstance(payload, dict) and payload.get("error"):
-        return None
-
-    if not isinstance(payload, dict):
-        return None
-
-    payload.pop("readme", None)
-
-    # Normalize important fields (ipapi.co keys)
-    country = payload.get("country_name")
-    country_code = payload.get("country_code")
-    state = payload.get("region")
-    state_code = payload.get("region_code")
-    city = payload.get("city")
-    postal = payload.get("postal")
-    timezone = payload.get("timezone")
-    latitude = payload.get("latitude")
-    longitude = payload.get("longitude")
-    org = payload.get("org")
-    asn = payload.get("asn")
-
-    return {
-        "ip": ip,
-        "source": "ipapi.co",
-        "country": country,
-        "country_code": country_code,
-        "state": state,
-        "state_code": state_code,
-        "city": city,
-        "postal": postal,
-        "timezone": timezone,
-        "lat": latitude,
-        "lon": longitude,
-    }
+def get_ip_locations(ips):
+    """
+    Batch variant of ``get_ip_location``.
+    Returns ``{ip: dict or None}`` for every IP given.
+    """
+    return resolve_ip_locations(list(ips))
 
 @shared_task
 def start_scraping_by_platform(platform_id):
@@ -1,59 +1,54 @@
 from warnings import filters
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Case, FloatField, Q, Value, When
 from rest_framework import viewsets, mixins
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework_extensions.mixins import NestedViewSetMixin
 from datetime import datetime
 from core.models import *
 from .serializers import *
 from .utilities import get_ip_location
-
-
-class ResourceViewSet(viewsets.ModelViewSet):
+from .paginations import InboxPagination, KeysetPagination, KeysetPaginationMixin
+from .caching import USER_VALIDATOR_FIELDS, ConditionalGetMixin, ResponseCacheMixin, related_validator_fields
+from .metrics import SerializerTimingMixin
+from core.search import get_search_backend
+from core.taxonomy import job_postings_with_terms, term_keys
+from core.recommendations import get_relevant_jobs_index
+from core import notifications
+from core import bulk
+from core import conversations
+from core.facets import job_posting_facets
+from core import uploads
+
+
+class ResourceViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = ResourceSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        queryset = self.request.user.files.all()
+        queryset = self.request.user.files.order_by("-created", "-id")
         return queryset
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Uploads stream to a temporary file and are hashed as they arrive.
+        request.upload_handlers = [uploads.HashingFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         try:
             file_obj = request.FILES.get('file')
             category = request.POST['category']
+            if file_obj is None:
+                return Response("No file was submitted.", status=400)
+            if category not in dict(Resource.CATEGORIES):
+                return Response(f"Unknown category {category!r}.", status=400)
 
-            # # S3 upload
-            # s3 = boto3.client(
-            #     's3',
-            #     aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            #     aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            #     region_name=getattr(settings, 'AWS_S3_REGION_NAME', None)
-            # )
-            # # Generate a unique filename
-            # filename = f"{category}/{uuid.uuid4().hex}_{file_obj.name}"
-            # s3.upload_fileobj(
-            #     file_obj,
-            #     settings.AWS_STORAGE_BUCKET_NAME,
-            #     filename,
-            #     ExtraArgs={'ACL': 'public-read'}
-            # )
-            # s3_url = f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{filename}"
-
-            # resource = Resource.objects.create(
-            #     name=file_obj.name,
-            #     category=category,
-            #     file=s3_url,  # Save the S3 URL
-            #     size=file_obj.size  # Save the file size
-            # )
-
-            resource = Resource.objects.create(
-                name=file_obj.name,
-                category=category,
-                file="temporary_url",  # Save the S3 URL
-                size="100 KB"  # Save the file size
+            resource = uploads.create_resource(
+                request.user, file_obj, file_obj.name, category, file_obj.content_hash, file_obj.size
             )
 
             serializer = ResourceSerializer(resource, context={'request': request})
@@ -64,14 +59,78 @@ class ResourceViewSet(viewsets.ModelViewSet):
             return Response(str(ex), status=400)
 
 
-class JobPostingViewSet(viewsets.ModelViewSet):
+class ResourceUploadViewSet(
+    SerializerTimingMixin,
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet
+):
+    """
+    Resumable uploads for files too large for ResourceViewSet. POST declares
+    name, category and byte_size; each PUT sends raw bytes starting at the
+    ``Upload-Offset`` header, which must equal ``received_bytes`` (GET tells
+    a reconnecting client where to resume). The response to the final chunk
+    carries the created resource.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user).select_related('resource')
+
+    def perform_create(self, serializer):
+        serializer.instance = uploads.start_upload(self.request.user, **serializer.validated_data)
+
+    def update(self, request, *args, **kwargs):
+        session = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError({'Upload-Offset': ["A numeric Upload-Offset header is required."]})
+        try:
+            # The body is read straight off the request, never parsed.
+            uploads.append_chunk(session, request.stream, offset, length)
+        except uploads.UploadOffsetMismatch as e:
+            return Response({'detail': str(e), 'received_bytes': e.received_bytes}, status=409)
+        return Response(self.get_serializer(session).data)
+
+    def perform_destroy(self, instance):
+        uploads.abort_upload(instance)
+
+
+class JobPostingViewSet(
+    SerializerTimingMixin,
+    ResponseCacheMixin,
+    ConditionalGetMixin,
+    KeysetPaginationMixin,
+    viewsets.ModelViewSet
+):
     serializer_class = JobPostingSerializer
     permission_classes = (AllowAny,)
     ordering = ['-created']
+    response_cache_namespace = 'job_postings'
+    conditional_modified_fields = (
+        'modified', *JobPosting.COUNTER_FIELDS, *related_validator_fields('user', USER_VALIDATOR_FIELDS),
+    )
+    conditional_related_fields = {
+        'job_applications': ('modified', *related_validator_fields('user', USER_VALIDATOR_FIELDS)),
+        'job_invitations': ('modified', *related_validator_fields('user', USER_VALIDATOR_FIELDS)),
+        'job_offers': ('modified',),
+    }
+
+    def is_response_cacheable(self):
+        # Groups select rows per user, so only the public listing is shared.
+        return super().is_response_cacheable() and not self.request.GET.get('group')
+
+    def add_viewer_fields(self, items, viewer):
+        return add_viewer_fields(items, viewer, SparseFieldset.from_request(self.request))
 
     def get_queryset(self):
-        if self.action == 'list':
+        if self.action in ('list', 'facets'):
             filters = ~Q(status__in=['draft'])
+            relevance = None
 
             group = self.request.GET.get('group')
             if self.request.user and self.request.user.is_authenticated:
@@ -81,13 +140,15 @@ class JobPostingViewSet(viewsets.ModelViewSet):
                         job_posting_ids = saved_jobs.values_list('job_posting__id', flat=True)
                         filters &= Q(id__in=job_posting_ids)
 
-                    if group == 'relevant':
-                        user_profile = self.request.user.profile
-                        skills = user_profile.skills.split(',') if user_profile.skills else []
-                        relevant_q = Q()
-                        for skill in skills:
-                            relevant_q |= Q(skills__icontains=skill)
-                        filters &= relevant_q
+                    user_profile = self.get_viewer_profile() if group == 'relevant' else None
+                    if user_profile and (term_keys(user_profile.skills) or term_keys(user_profile.categories)):
+                        ranked = get_relevant_jobs_index().recommend(user_profile, k=settings.RELEVANT_JOBS_LIMIT)
+                        filters &= Q(id__in=[job_posting_id for job_posting_id, _ in ranked])
+                        relevance = Case(
+                            *[When(pk=job_posting_id, then=Value(score)) for job_posting_id, score in ranked],
+                            default=Value(0.0),
+                            output_field=FloatField()
+                        )
                     
                     if group == 'applied':
                         applied_jobs = JobApplication.objects.filter(user=self.request.user, status__in=['pending'])
@@ -139,13 +200,6 @@ class JobPostingViewSet(viewsets.ModelViewSet):
                         job_posting_ids = finished_jobs.values_list('job_posting__id', flat=True)
                         filters &= Q(id__in=job_posting_ids)
 
-            search = self.request.GET.get('search')
-            if search:
-                for word in search.split():
-                    if word.strip() == "":
-                        continue
-                    filters &= Q(title__icontains=word) | Q(description__icontains=word)
-            
             country = self.request.GET.get('country')
             if country:
                 country_q = Q()
@@ -162,17 +216,11 @@ class JobPostingViewSet(viewsets.ModelViewSet):
 
             skills = self.request.GET.get('skills')
             if skills:
-                skill_q = Q()
-                for skill in skills.split(','):
-                    skill_q |= Q(skills__icontains=skill)
-                filters &= skill_q
+                filters &= Q(id__in=job_postings_with_terms('skill_tags', skills))
 
             categories = self.request.GET.get('categories')
             if categories:
-                category_q = Q()
-                for category in categories.split(','):
-                    category_q |= Q(categories__icontains=category)
-                filters &= category_q
+                filters &= Q(id__in=job_postings_with_terms('category_tags', categories))
 
             compensation_type = self.request.GET.get('compensation_type')
             if compensation_type:
@@ -237,10 +285,27 @@ class JobPostingViewSet(viewsets.ModelViewSet):
                 filters &= Q(user__profile__hire_rate__lte=rate_max)
 
             queryset = JobPosting.objects.filter(filters)
+
+            # Ranked lists default to best-first; an explicit ``ordering`` still wins.
+            if relevance is not None:
+                queryset = queryset.annotate(relevance=relevance)
+                self.ordering = ['-relevance', '-created']
+
+            search = self.request.GET.get('search')
+            if search:
+                queryset = get_search_backend().search(queryset, search)
+                self.ordering = ['search_rank', '-created']
         else:
             queryset = JobPosting.objects.filter(pk=self.kwargs['pk'])
         return queryset
 
+    def get_viewer_profile(self):
+        # A freelancer without a profile has no terms to rank jobs by.
+        try:
+            return self.request.user.profile
+        except Profile.DoesNotExist:
+            return None
+
     @action(methods=["post", "delete"], detail=True, permission_classes=[IsAuthenticated])
     def save(self, request, pk=None):
         job_posting = self.get_object()
@@ -251,14 +316,46 @@ class JobPostingViewSet(viewsets.ModelViewSet):
             SavedJob.objects.get_or_create(user=request.user, job_posting=job_posting)
             return Response({"status": "job saved"})
 
+    @action(methods=['get'], detail=False)
+    def facets(self, request, *args, **kwargs):
+        """Counts per facet value of the list the same query parameters select."""
+        return Response(job_posting_facets(
+            lambda: self.filter_queryset(self.get_queryset()), request.query_params, request.user
+        ))
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class JobApplicationViewSet(viewsets.ModelViewSet):
+class JobApplicationViewSet(SerializerTimingMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     serializer_class = JobApplicationSerializer
     permission_classes = (IsAuthenticated,)
 
+    def get_serializer_class(self):
+        # ``?view=summary`` lists embed a bounded summary of the posting
+        # (its columns and counters) instead of the full posting per row.
+        if self.action == 'list' and self.request.query_params.get('view') == 'summary':
+            return JobApplicationSummarySerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['shared_objects'] = self.request.query_params.get('shared') in ('1', 'true', 'True')
+        return context
+
+    def list(self, request, *args, **kwargs):
+        # With ``shared``, summary postings are rendered once into ``included``;
+        # an unpaginated list is wrapped in ``results`` to carry it too.
+        response = super().list(request, *args, **kwargs)
+        paginated = isinstance(response.data, dict)
+        rows = response.data['results'] if paginated else response.data
+        included = getattr(getattr(rows, 'serializer', None), 'included', None)
+        if included is not None:
+            if not paginated:
+                response.data = {'results': rows}
+            response.data['included'] = included
+        return response
+
     def get_queryset(self):
         if self.action == 'list':
             filters = Q(job_posting_id=self.kwargs["parent_lookup_job_posting__id"])
@@ -299,11 +396,142 @@ class JobApplicationViewSet(viewsets.ModelViewSet):
             status=job_application_status
         )
 
-class JobInvitationViewSet(viewsets.ModelViewSet):
+    @action(methods=['post'], detail=False)
+    def bulk_status(self, request, *args, **kwargs):
+        """Moves up to MAX_BULK_ITEMS applications of the caller's posting to one status."""
+        job_posting = get_object_or_404(
+            JobPosting, pk=self.kwargs["parent_lookup_job_posting__id"], user=request.user
+        )
+        serializer = BulkApplicationStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk.set_application_statuses(
+            job_posting, serializer.validated_data['ids'], serializer.validated_data['status']
+        )
+        return Response({'results': results})
+
+
+class JobInvitationViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     serializer_class = JobInvitationSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         return JobInvitation.objects.filter(job_posting_id=self.kwargs["parent_lookup_job_posting__id"])
 
+    @action(methods=['post'], detail=False)
+    def bulk_invite(self, request, *args, **kwargs):
+        """Invites up to MAX_BULK_ITEMS freelancers to the caller's posting."""
+        job_posting = get_object_or_404(
+            JobPosting, pk=self.kwargs["parent_lookup_job_posting__id"], user=request.user
+        )
+        serializer = BulkInvitationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk.invite_freelancers(
+            job_posting, serializer.validated_data['users'], serializer.validated_data.get('description')
+        )
+        return Response({'results': results})
+
+
+class NotificationViewSet(
+    SerializerTimingMixin,
+    KeysetPaginationMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet
+):
+    serializer_class = NotificationSerializer
+    permission_classes = (IsAuthenticated,)
+    ordering = ['-created', '-id']
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(user=self.request.user).order_by('-created', '-id')
+        status = self.request.GET.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset
+
+    @action(methods=['post'], detail=False)
+    def mark_read(self, request, *args, **kwargs):
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = notifications.mark_read(request.user, serializer.validated_data.get('ids'))
+        return Response({
+            'updated': updated,
+            'unread_count': notifications.get_unread_count(request.user),
+        })
+
+    @action(methods=['get'], detail=False)
+    def unread_count(self, request, *args, **kwargs):
+        return Response({'unread_count': notifications.get_unread_count(request.user)})
+
+
+class ConversationViewSet(
+    SerializerTimingMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet
+):
+    """
+    The user's inbox: one entry per conversation, most recent first, keyset
+    paginated over the user's ConversationMember rows. Addressed by
+    conversation id.
+    """
+    serializer_class = ConversationSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = InboxPagination
+    lookup_field = 'conversation'
+    lookup_url_kwarg = 'pk'
+
+    def get_queryset(self):
+        return ConversationMember.objects.filter(user=self.request.user).select_related(
+            'conversation__last_message', 'conversation__user_low', 'conversation__user_high'
+        )
+
+    def create(self, request, *args, **kwargs):
+        serializer = ConversationCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            conversation = conversations.get_or_create_conversation(
+                request.user.pk, serializer.validated_data['user'].pk
+            )
+        except ValueError as e:
+            raise ValidationError({'user': [str(e)]})
+        if serializer.validated_data.get('description'):
+            conversations.send_message(conversation, request.user.pk, serializer.validated_data['description'])
+        member = self.get_queryset().get(conversation=conversation)
+        return Response(self.get_serializer(member).data, status=201)
+
+    @action(methods=['post'], detail=True)
+    def read(self, request, pk=None):
+        member = self.get_object()
+        conversations.mark_conversation_read(member.conversation, request.user.pk)
+        return Response({'unread_count': 0})
+
+
+class ConversationMessageViewSet(
+    SerializerTimingMixin,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
+    viewsets.GenericViewSet
+):
+    """A conversation's messages, newest first, keyset paginated on ``(created, id)``."""
+    serializer_class = ConversationMessageSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+
+    def get_conversation(self):
+        if not hasattr(self, '_conversation'):
+            user = self.request.user
+            self._conversation = get_object_or_404(
+                Conversation.objects.filter(Q(user_low=user) | Q(user_high=user)),
+                pk=self.kwargs['parent_lookup_conversation__id'],
+            )
+        return self._conversation
+
+    def get_queryset(self):
+        return Message.objects.filter(conversation=self.get_conversation())
 
+    def perform_create(self, serializer):
+        serializer.instance = conversations.send_message(
+            self.get_conversation(), self.request.user.pk, serializer.validated_data.get('description')
+        )
@@ -0,0 +1,111 @@
+"""
+Set-based invitations and application status changes for one job posting.
+
+Each call validates its whole batch in a couple of queries and writes it
+with one ``bulk_create`` or ``bulk_update`` inside a transaction. Bulk
+writes send no model signals, so these functions do the signals' work
+themselves: one counter UPDATE per batch, the ``job_postings`` cache
+version, and, for invitations, one queued notification task. Every call
+returns one ``{"id": ..., "result": ...}`` entry per requested id, in
+request order.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from core.api.tasks import dispatch, notify_invitations_sent
+from core.caching import bump_version
+from core.counters import application_counters, apply_counter_deltas
+from core.models import JobApplication, JobInvitation, User
+
+MAX_BULK_ITEMS = 500
+# Statuses a posting owner can move applications between; ``cancelled`` is
+# the freelancer withdrawing and is left alone.
+APPLICATION_STATUSES = ('pending', 'accepted', 'rejected')
+# Invitations in these statuses do not block a new one.
+CLOSED_INVITATION_STATUSES = ('declined', 'cancelled')
+
+INVITED = 'invited'
+ALREADY_INVITED = 'already_invited'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+NOT_ALLOWED = 'not_allowed'
+NOT_FOUND = 'not_found'
+
+
+def _unique(ids):
+    return list(dict.fromkeys(ids))
+
+
+def invite_freelancers(job_posting, user_ids, description=None):
+    """
+    Invites each active freelancer in ``user_ids`` to ``job_posting`` unless
+    they hold an open invitation to it already.
+    """
+    user_ids = _unique(user_ids)
+    freelancers = set(
+        User.objects.filter(pk__in=user_ids, role='freelancer', is_active=True).values_list('pk', flat=True)
+    )
+    invited = set(
+        JobInvitation.objects.filter(job_posting=job_posting, user_id__in=freelancers)
+        .exclude(status__in=CLOSED_INVITATION_STATUSES).values_list('user_id', flat=True)
+    )
+
+    results, invitations = [], []
+    for user_id in user_ids:
+        if user_id not in freelancers:
+            results.append({'id': user_id, 'result': NOT_FOUND})
+        elif user_id in invited:
+            results.append({'id': user_id, 'result': ALREADY_INVITED})
+        else:
+            invitation = JobInvitation(job_posting=job_posting, user_id=user_id, description=description)
+            invitations.append(invitation)
+            results.append({'id': user_id, 'result': INVITED, 'invitation': invitation.pk})
+
+    if invitations:
+        with transaction.atomic():
+            JobInvitation.objects.bulk_create(invitations)
+            apply_counter_deltas(job_posting.pk, {'invite_count': len(invitations)})
+            dispatch(notify_invitations_sent, [str(invitation.pk) for invitation in invitations])
+        bump_version('job_postings')
+    return results
+
+
+def set_application_statuses(job_posting, application_ids, status):
+    """Moves each of ``job_posting``'s applications in ``application_ids`` to ``status``."""
+    application_ids = _unique(application_ids)
+    results, changed = [], []
+    deltas = dict.fromkeys(application_counters(status), 0)
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Locked so the counter deltas match the statuses being replaced.
+        applications = {
+            application.pk: application
+            for application in JobApplication.objects.select_for_update()
+            .filter(job_posting=job_posting, pk__in=application_ids).only('pk', 'job_posting_id', 'status')
+        }
+        for application_id in application_ids:
+            application = applications.get(application_id)
+            if application is None:
+                results.append({'id': application_id, 'result': NOT_FOUND})
+            elif application.status not in APPLICATION_STATUSES:
+                results.append({'id': application_id, 'result': NOT_ALLOWED})
+            elif application.status == status:
+                results.append({'id': application_id, 'result': UNCHANGED})
+            else:
+                before, after = application_counters(application.status), application_counters(status)
+                for name in deltas:
+                    deltas[name] += after[name] - before[name]
+                application.status = status
+                # bulk_update skips auto_now.
+                application.modified = now
+                changed.append(application)
+                results.append({'id': application_id, 'result': UPDATED})
+
+        if changed:
+            JobApplication.objects.bulk_update(changed, ['status', 'modified'], batch_size=MAX_BULK_ITEMS)
+            apply_counter_deltas(job_posting.pk, deltas)
+
+    if changed:
+        bump_version('job_postings')
+    return results
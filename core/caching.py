@@ -0,0 +1,41 @@
+"""
+Versioned cache namespaces.
+
+Cached entries embed their namespace's version in the key; bumping the
+version (from model signals) makes every older entry unreachable at once,
+without having to know or delete the individual keys.
+"""
+import hashlib
+
+from django.core.cache import cache
+
+
+def version_key(namespace):
+    return f'version:{namespace}'
+
+
+def get_version(namespace):
+    version = cache.get(version_key(namespace))
+    if version is None:
+        cache.add(version_key(namespace), 1, timeout=None)
+        version = cache.get(version_key(namespace), 1)
+    return version
+
+
+def bump_version(namespace):
+    try:
+        return cache.incr(version_key(namespace))
+    except ValueError:
+        cache.add(version_key(namespace), 1, timeout=None)
+        return cache.get(version_key(namespace), 1)
+
+
+def query_fingerprint(params, ignore=()):
+    """Stable digest of query parameters, independent of their order."""
+    items = sorted(
+        (name, value)
+        for name in params
+        if name not in ignore
+        for value in params.getlist(name)
+    )
+    return hashlib.sha1(repr(items).encode()).hexdigest()
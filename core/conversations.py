@@ -0,0 +1,86 @@
+"""
+Conversation threads between two users.
+
+Every participant of a conversation has a ConversationMember row holding
+what their inbox shows (time of the last message and unread count), so an
+inbox is a range scan of that user's member rows and a thread is a range
+scan of ``(conversation, created)`` on Message; neither looks at messages by
+sender OR recipient. ``send_message`` keeps the summaries current.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+
+from core import events
+from core.models import Conversation, ConversationMember, Message
+
+
+def participants(user_id, other_id):
+    """The ``(user_low, user_high)`` pair a conversation is stored under."""
+    return tuple(sorted((user_id, other_id), key=str))
+
+
+def get_or_create_conversation(user_id, other_id):
+    if user_id == other_id:
+        raise ValueError("A conversation needs two different users.")
+    user_low, user_high = participants(user_id, other_id)
+    with transaction.atomic():
+        conversation, created = Conversation.objects.get_or_create(user_low_id=user_low, user_high_id=user_high)
+        if created:
+            ConversationMember.objects.bulk_create([
+                ConversationMember(conversation=conversation, user_id=member_id, last_message_at=conversation.created)
+                for member_id in (user_low, user_high)
+            ])
+    return conversation
+
+
+def send_message(conversation, sender_id, description):
+    """
+    Adds a message to the conversation and, in the same transaction, points
+    the conversation at it and updates both members' summaries with one
+    UPDATE (the recipient's unread count goes up by one). The recipient is
+    sent a ``message`` event.
+    """
+    recipient_id = conversation.other_user_id(sender_id)
+    with transaction.atomic():
+        message = Message.objects.create(
+            conversation=conversation, sender_id=sender_id, recipient_id=recipient_id, description=description
+        )
+        Conversation.objects.filter(pk=conversation.pk).update(last_message=message)
+        ConversationMember.objects.filter(conversation=conversation).update(
+            last_message_at=message.created,
+            unread_count=Case(When(user_id=recipient_id, then=F('unread_count') + 1), default=F('unread_count')),
+        )
+        events.publish([recipient_id], 'message', {
+            'conversation': conversation.pk, 'message': message.pk, 'sender': sender_id,
+        })
+    conversation.last_message = message
+    return message
+
+
+def mark_conversation_read(conversation, user_id):
+    return ConversationMember.objects.filter(conversation=conversation, user_id=user_id).update(unread_count=0)
+
+
+def backfill_conversations():
+    """
+    Files messages written before conversations existed under their pair's
+    conversation and points each one at its latest message. Unread counts
+    start at zero for them. Returns the number of messages filed.
+    """
+    loose = Message.objects.filter(conversation__isnull=True)
+    pairs = {
+        participants(sender_id, recipient_id)
+        for sender_id, recipient_id in loose.values_list('sender_id', 'recipient_id').distinct()
+        if sender_id != recipient_id
+    }
+    filed = 0
+    for user_low, user_high in pairs:
+        with transaction.atomic():
+            conversation = get_or_create_conversation(user_low, user_high)
+            filed += loose.filter(
+                Q(sender_id=user_low, recipient_id=user_high) | Q(sender_id=user_high, recipient_id=user_low)
+            ).update(conversation=conversation)
+            last_message = conversation.messages.order_by('-created', '-id').first()
+            Conversation.objects.filter(pk=conversation.pk).update(last_message=last_message)
+            conversation.members.update(last_message_at=last_message.created)
+    return filed
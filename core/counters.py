@@ -0,0 +1,85 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.models import PROPOSAL_STATUSES, JobApplication, JobInvitation, JobPosting, Profile
+
+
+def application_counters(status):
+    """Counter contributions of a single job application with ``status``."""
+    return {
+        'proposal_count': int(status in PROPOSAL_STATUSES),
+        'interview_count': int(status == 'accepted'),
+    }
+
+
+def invitation_counters(status):
+    """Counter contributions of a single job invitation with ``status``."""
+    return {'invite_count': 1}
+
+
+def apply_counter_deltas(job_posting_id, deltas):
+    """Adds ``deltas`` to the posting's counter columns in a single UPDATE."""
+    changes = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if job_posting_id and changes:
+        JobPosting.objects.filter(pk=job_posting_id).update(**changes)
+
+
+def move_counters(counters, old, new):
+    """
+    Applies the counter change of a row moving from ``old`` to ``new``, both
+    ``(job_posting_id, status)`` tuples or None for a created/deleted row.
+    """
+    if old == new:
+        return
+
+    if old and new and old[0] == new[0]:
+        before, after = counters(old[1]), counters(new[1])
+        apply_counter_deltas(new[0], {name: after[name] - before[name] for name in after})
+        return
+
+    if old:
+        apply_counter_deltas(old[0], {name: -value for name, value in counters(old[1]).items()})
+    if new:
+        apply_counter_deltas(new[0], counters(new[1]))
+
+
+def move_posted_jobs_count(old, new):
+    """
+    Applies the ``Profile.posted_jobs_count`` change of a job posting moving
+    from ``old`` to ``new``, both ``(user_id, status)`` tuples or None for a
+    created/deleted posting. Drafts are not counted.
+    """
+    old_user = old[0] if old and old[1] != 'draft' else None
+    new_user = new[0] if new and new[1] != 'draft' else None
+    if old_user == new_user:
+        return
+    if old_user:
+        Profile.objects.filter(user_id=old_user).update(posted_jobs_count=F('posted_jobs_count') - 1)
+    if new_user:
+        Profile.objects.filter(user_id=new_user).update(posted_jobs_count=F('posted_jobs_count') + 1)
+
+
+def _count_subquery(model, **filters):
+    rows = model.objects.filter(job_posting=OuterRef('pk'), **filters).order_by()
+    rows = rows.values('job_posting').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), Value(0))
+
+
+def rebuild_job_posting_counters(queryset=None):
+    """Recomputes every counter column from the source tables in one UPDATE."""
+    if queryset is None:
+        queryset = JobPosting.objects.all()
+    return queryset.update(
+        proposal_count=_count_subquery(JobApplication, status__in=PROPOSAL_STATUSES),
+        interview_count=_count_subquery(JobApplication, status='accepted'),
+        invite_count=_count_subquery(JobInvitation),
+    )
+
+
+def rebuild_profile_counters(queryset=None):
+    """Recomputes ``posted_jobs_count`` of every profile in one UPDATE."""
+    if queryset is None:
+        queryset = Profile.objects.all()
+    posted = JobPosting.objects.filter(user=OuterRef('user')).exclude(status='draft').order_by()
+    posted = posted.values('user').annotate(total=Count('pk')).values('total')
+    return queryset.update(posted_jobs_count=Coalesce(Subquery(posted), Value(0)))
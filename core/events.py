@@ -0,0 +1,208 @@
+"""
+Per-user server push events.
+
+Writers call ``publish`` (from sync code, once their transaction commits);
+core.sse streams each user's events to their open ``EventSource``
+connections. The broker carrying them is Redis pub/sub when
+``EVENTS_REDIS_URL`` is set, which reaches every ASGI worker, or an
+in-process stand-in for development and tests, which only reaches
+connections served by the publishing process. Notifications are published
+from Celery workers, so the stand-in never delivers them to an ASGI server;
+workmania.asgi refuses to start with it unless ``EVENTS_BACKEND`` names it
+explicitly.
+
+Either broker keeps one bounded queue per open connection. The Redis
+broker shares one pub/sub connection per process between all of them,
+subscribing to a user's channel while that user has a stream open.
+"""
+import asyncio
+import json
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def channel_name(user_id):
+    return f'events:{user_id}'
+
+
+def encode_event(event, data):
+    return json.dumps({'event': event, 'data': data}, separators=(',', ':'), default=str)
+
+
+class InProcessBroker:
+    """Delivers to subscribers in this process, each with a bounded queue."""
+    queue_size = 100
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, messages):
+        with self._lock:
+            targets = [
+                (subscription, payload)
+                for channel, payload in messages
+                for subscription in self._subscribers.get(channel, ())
+            ]
+        for subscription, payload in targets:
+            subscription.loop.call_soon_threadsafe(subscription.put, payload)
+
+    async def subscribe(self, channel):
+        subscription = InProcessSubscription(self, channel, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.channel, None)
+
+
+class InProcessSubscription:
+    """One connection's queue of payloads, filled by its broker."""
+
+    def __init__(self, broker, channel, loop, queue_size):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+
+    def put(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning("Dropped an event for %s: subscriber is not reading", self.channel)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class RedisBroker:
+    """
+    Redis pub/sub; publishing pipelines every message into one round trip.
+    Subscriptions in this process share one pub/sub connection, read by a
+    single task that hands each message to the queues of its channel.
+    """
+    queue_size = 100
+    reconnect_seconds = 1
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+        self._loop = None
+        self._subscribers = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def publish(self, messages):
+        with self.client.pipeline(transaction=False) as pipe:
+            for channel, payload in messages:
+                pipe.publish(channel, payload)
+            pipe.execute()
+
+    def _bind(self, loop):
+        # The pub/sub connection and its reader belong to one event loop.
+        if self._loop is not loop:
+            import redis.asyncio
+            self._loop = loop
+            self._subscribers = {}
+            self._pubsub = redis.asyncio.Redis.from_url(self.url).pubsub(ignore_subscribe_messages=True)
+            self._channel_lock = asyncio.Lock()
+            self._reader = None
+
+    async def subscribe(self, channel):
+        loop = asyncio.get_running_loop()
+        self._bind(loop)
+        subscription = RedisSubscription(self, channel, loop, self.queue_size)
+        async with self._channel_lock:
+            subscribers = self._subscribers.setdefault(channel, set())
+            if not subscribers:
+                await self._pubsub.subscribe(channel)
+            subscribers.add(subscription)
+        if self._reader is None or self._reader.done():
+            self._reader = loop.create_task(self._read())
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        async with self._channel_lock:
+            subscribers = self._subscribers.get(subscription.channel, set())
+            subscribers.discard(subscription)
+            if not subscribers and self._subscribers.pop(subscription.channel, None) is not None:
+                await self._pubsub.unsubscribe(subscription.channel)
+
+    async def _read(self):
+        while self._subscribers:
+            try:
+                message = await self._pubsub.get_message(timeout=None)
+            except Exception:
+                logger.exception("Lost the events pub/sub connection, reconnecting")
+                await asyncio.sleep(self.reconnect_seconds)
+                async with self._channel_lock:
+                    await self._pubsub.reset()
+                    if self._subscribers:
+                        await self._pubsub.subscribe(*self._subscribers)
+                continue
+            if message is None or message['type'] != 'message':
+                continue
+            channel, data = message['channel'], message['data']
+            channel = channel.decode() if isinstance(channel, bytes) else channel
+            payload = data.decode() if isinstance(data, bytes) else data
+            for subscription in list(self._subscribers.get(channel, ())):
+                subscription.put(payload)
+
+
+class RedisSubscription(InProcessSubscription):
+
+    async def close(self):
+        await self.broker.unsubscribe(self)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    backend_path = getattr(settings, 'EVENTS_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    url = getattr(settings, 'EVENTS_REDIS_URL', None)
+    if url:
+        return RedisBroker(url)
+    return InProcessBroker()
+
+
+def publish(user_ids, event, data):
+    """
+    Sends ``event`` with the JSON-serializable ``data`` to every user in
+    ``user_ids`` after the current transaction commits. Delivery is best
+    effort: a broker failure is logged, never raised into the writer.
+    """
+    payload = encode_event(event, data)
+    messages = [(channel_name(user_id), payload) for user_id in user_ids]
+
+    def send():
+        try:
+            get_broker().publish(messages)
+        except Exception:
+            logger.exception("Could not publish %s events", event)
+
+    if messages:
+        transaction.on_commit(send)
@@ -0,0 +1,83 @@
+"""
+Facet counts for the job search page.
+
+``job_posting_facets`` counts a filtered JobPosting queryset per value of
+each ``FACET_FIELDS`` choice field and per ``JOB_PRICE_BUCKETS`` price
+range. All counts come from one conditional-aggregation query
+(``COUNT(CASE WHEN ...)`` per value). Results are cached under the
+``job_postings`` version and a normalized form of the filter parameters,
+so a page of filters and the same filters reordered share one entry.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from core.caching import get_version, query_fingerprint
+from core.models import JobPosting
+
+FACET_FIELDS = ('duration', 'size', 'compensation_type', 'experience_level')
+# Parameters that page, order or shape the list without changing its rows.
+NON_FILTER_PARAMS = (
+    'page', 'page_size', 'cursor', 'pagination', 'ordering', 'fields', 'expand', 'shared', 'format', 'token',
+)
+
+
+def price_buckets():
+    """``(label, Q)`` per price range; each range includes its lower bound only."""
+    bounds = settings.JOB_PRICE_BUCKETS
+    buckets = [
+        (f'{low}-{high}', Q(price__gte=low, price__lt=high))
+        for low, high in zip(bounds, bounds[1:])
+    ]
+    buckets.append((f'{bounds[-1]}+', Q(price__gte=bounds[-1])))
+    return buckets
+
+
+def normalized_filters(params):
+    """Copy of ``params`` without non-filter parameters, with comma lists sorted."""
+    filters = params.copy()
+    for name in NON_FILTER_PARAMS:
+        filters.pop(name, None)
+    for name in list(filters):
+        filters.setlist(name, [
+            ','.join(sorted(part.strip() for part in value.split(','))) for value in filters.getlist(name)
+        ])
+    return filters
+
+
+def facet_cache_key(params, user=None):
+    # Groups select rows per user; every other filter is the same for everyone.
+    owner = user.pk if params.get('group') and user is not None and user.is_authenticated else ''
+    version = get_version('job_postings')
+    return f'facets:job_postings:{version}:{owner}:{query_fingerprint(normalized_filters(params))}'
+
+
+def count_facets(queryset):
+    facets = [
+        (field, value, Q(**{field: value}))
+        for field in FACET_FIELDS
+        for value, _ in JobPosting._meta.get_field(field).choices
+    ]
+    facets += [('price', label, condition) for label, condition in price_buckets()]
+
+    # Positional aliases: choice values are not safe SQL aliases.
+    aggregates = {f'facet_{index}': Count('pk', filter=condition) for index, (_, _, condition) in enumerate(facets)}
+    counts = queryset.order_by().aggregate(total=Count('pk'), **aggregates)
+
+    result = {'total': counts['total']}
+    for index, (field, value, _) in enumerate(facets):
+        result.setdefault(field, {})[value] = counts[f'facet_{index}']
+    return result
+
+
+def job_posting_facets(get_queryset, params, user=None):
+    """
+    Facet counts of the job list filtered by ``params``. ``get_queryset``
+    builds that list and is only called on a cache miss.
+    """
+    key = facet_cache_key(params, user)
+    result = cache.get(key)
+    if result is None:
+        result = count_facets(get_queryset())
+        cache.set(key, result, settings.JOB_FACET_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,103 @@
+"""
+Resized derivatives of image resources.
+
+When an image Resource is created, core.signals queues
+``generate_image_derivatives``. That task decodes the original once and
+writes every ``IMAGE_DERIVATIVE_SIZES`` bounding box in every
+``IMAGE_DERIVATIVE_FORMATS`` to the resource storage. Derivative names come
+from the original's content hash, so identical uploads share them and a
+rerun only renders what is missing. ``Resource.derivatives`` maps
+size -> format -> URL.
+"""
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.caching import bump_version
+from core.models import Profile, Resource
+from core.uploads import content_name, get_resource_storage, save_content
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = frozenset(('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'))
+FORMAT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def is_image(resource):
+    return bool(resource.content_hash) and os.path.splitext(resource.name or '')[1].lower() in IMAGE_EXTENSIONS
+
+
+def derivative_name(content_hash, size, image_format):
+    return f'derivatives/{content_hash[:2]}/{content_hash}-{size}.{FORMAT_EXTENSIONS[image_format]}'
+
+
+def open_image(file, max_size):
+    image = Image.open(file)
+    # JPEG can decode straight at 1/2, 1/4 or 1/8 scale when the largest
+    # derivative allows it, instead of decoding every pixel.
+    image.draft('RGB', (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    # Palette and other modes would resize with nearest neighbour.
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    return image
+
+
+def encode(image, image_format):
+    if image_format == 'jpeg' and image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, image_format.upper(), **SAVE_OPTIONS[image_format])
+    return buffer.getvalue()
+
+
+def generate_derivatives(resource):
+    """
+    Renders and stores the missing derivatives of ``resource``, records them
+    all on it and returns them. An original Pillow cannot decode gets none.
+    """
+    storage = get_resource_storage()
+    sizes = sorted(settings.IMAGE_DERIVATIVE_SIZES, reverse=True)
+    formats = settings.IMAGE_DERIVATIVE_FORMATS
+    names = {
+        (size, image_format): derivative_name(resource.content_hash, size, image_format)
+        for size in sizes for image_format in formats
+    }
+    missing = {key for key, name in names.items() if not storage.exists(name)}
+
+    if missing:
+        try:
+            with storage.open(content_name(resource.content_hash), 'rb') as original:
+                image = open_image(original, sizes[0])
+                # Each size shrinks the one before it, so only the largest
+                # resize reads the full decoded image.
+                for size in sizes:
+                    image.thumbnail((size, size), Image.LANCZOS)
+                    for image_format in formats:
+                        if (size, image_format) in missing:
+                            save_content(storage, names[size, image_format], ContentFile(encode(image, image_format)))
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.warning("Could not render derivatives of resource %s", resource.pk, exc_info=True)
+            return {}
+
+    derivatives = {
+        str(size): {image_format: storage.url(names[size, image_format]) for image_format in formats}
+        for size in sizes
+    }
+    Resource.objects.filter(pk=resource.pk).update(derivatives=derivatives, modified=timezone.now())
+    # Job and user payloads embed avatars and are cached.
+    if Profile.objects.filter(avatar=resource).exists():
+        bump_version('job_postings')
+    return derivatives
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.conversations import backfill_conversations
+
+
+class Command(BaseCommand):
+    help = "Files messages that predate conversations under their sender/recipient pair's conversation."
+
+    def handle(self, *args, **options):
+        filed = backfill_conversations()
+        self.stdout.write(self.style.SUCCESS(f"Filed {filed} messages into conversations."))
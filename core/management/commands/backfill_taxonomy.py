@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.models import JobPosting, Profile
+from core.taxonomy import backfill_terms
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the skill/category tags of profiles and job postings from their comma-separated strings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model in (Profile, JobPosting):
+            synced = backfill_terms(model, chunk_size=options['chunk_size'])
+            self.stdout.write(f"{model._meta.verbose_name_plural}: rebuilt {synced} tag sets")
+        self.stdout.write(self.style.SUCCESS("Taxonomy backfill complete."))
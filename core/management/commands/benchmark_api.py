@@ -0,0 +1,118 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core.models import JobApplication, JobPosting, Profile, User
+from core.taxonomy import split_terms
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the hot API endpoints through the test client against the current database and "
+        "prints p50/p95/p99 latency and SQL query counts as JSON (see generate_dataset)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--label', default='', help="Free-form run label, e.g. the commit being measured.")
+        parser.add_argument('--output', help="Also write the JSON report to this file.")
+        parser.add_argument('--only', help="Comma separated scenario names to run.")
+        parser.add_argument(
+            '--no-response-cache', action='store_true',
+            help="Disable the API response cache so every request renders from the database."
+        )
+
+    def handle(self, *args, **options):
+        scenarios = self.get_scenarios()
+        if options['only']:
+            wanted = set(options['only'].split(','))
+            scenarios = [scenario for scenario in scenarios if scenario[0] in wanted]
+
+        cache_timeout = {'API_RESPONSE_CACHE_TIMEOUT': 0} if options['no_response_cache'] else {}
+        with override_settings(**cache_timeout):
+            results = {
+                name: self.measure(user, url, options['iterations'], options['warmup'])
+                for name, user, url in scenarios
+            }
+
+        report = {
+            'label': options['label'],
+            'iterations': options['iterations'],
+            'response_cache': not options['no_response_cache'],
+            'dataset': {
+                model._meta.model_name: model.objects.count()
+                for model in (User, JobPosting, JobApplication)
+            },
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        self.stdout.write(output)
+
+    def get_scenarios(self):
+        freelancer = User.objects.filter(role='freelancer', is_active=True, profile__isnull=False).order_by('email').first()
+        client = User.objects.filter(role='client', is_active=True).order_by('email').first()
+        posting = JobPosting.objects.filter(status='posted').order_by('-proposal_count', 'id').first()
+        if not (freelancer and client and posting):
+            raise CommandError("Needs at least one freelancer, one client and one posted job; run generate_dataset.")
+
+        profile = Profile.objects.get(user=freelancer)
+        skill = next(iter(split_terms(profile.skills).values()), 'Python')
+        word = (posting.title or 'job').split()[0]
+        jobs = '/api/v1/job_postings/'
+        return [
+            ('job_list_anonymous', None, jobs),
+            ('job_list_freelancer', freelancer, jobs),
+            ('job_list_relevant', freelancer, f'{jobs}?group=relevant'),
+            ('job_list_saved', freelancer, f'{jobs}?group=saved'),
+            ('job_list_applied', freelancer, f'{jobs}?group=applied'),
+            ('job_list_client_posted', client, f'{jobs}?group=posted'),
+            ('job_list_skills', freelancer, f'{jobs}?skills={skill}'),
+            ('job_list_search', freelancer, f'{jobs}?search={word}'),
+            ('job_list_cursor', freelancer, f'{jobs}?pagination=cursor'),
+            ('job_detail', freelancer, f'{jobs}{posting.id}/'),
+            ('job_applications', posting.user, f'{jobs}{posting.id}/job_applications/'),
+            ('freelancer_search', client, f'/api/v1/users/?skills={skill}'),
+            ('users_me', freelancer, '/api/v1/users/me/'),
+        ]
+
+    def measure(self, user, url, iterations, warmup):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for _ in range(warmup):
+            client.get(url)
+
+        timings, query_counts = [], []
+        status = None
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            query_counts.append(len(queries))
+            status = response.status_code
+
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+        return {
+            'url': url,
+            'user': user.email if user else None,
+            'status': status,
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+            'mean_ms': round(float(np.mean(timings)), 2),
+            'queries': {
+                'min': min(query_counts),
+                'median': int(np.median(query_counts)),
+                'max': max(query_counts),
+            },
+        }
@@ -0,0 +1,212 @@
+import random
+import uuid
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.caching import bump_version
+from core.models import (
+    JOB_DURATION_CHOICES,
+    JobApplication,
+    JobInvitation,
+    JobOffer,
+    JobPosting,
+    Profile,
+    SavedFreelancer,
+    SavedJob,
+    User,
+)
+
+SKILLS = (
+    'Python', 'Django', 'JavaScript', 'TypeScript', 'React', 'Vue', 'Angular', 'Node.js', 'Go', 'Rust',
+    'Java', 'Kotlin', 'Swift', 'PHP', 'Laravel', 'Ruby', 'Rails', 'C#', '.NET', 'SQL', 'PostgreSQL',
+    'MongoDB', 'AWS', 'Docker', 'Kubernetes', 'Figma', 'Photoshop', 'Copywriting', 'SEO', 'Excel',
+)
+CATEGORIES = (
+    'Web Development', 'Mobile Development', 'Data Science', 'DevOps', 'Design', 'Writing',
+    'Marketing', 'Admin Support', 'Customer Service', 'Accounting',
+)
+COUNTRIES = (
+    ('US', 'New York'), ('US', 'Austin'), ('GB', 'London'), ('DE', 'Berlin'), ('IN', 'Bangalore'),
+    ('BR', 'Sao Paulo'), ('PH', 'Manila'), ('UA', 'Kyiv'), ('CA', 'Toronto'), ('PK', 'Lahore'),
+)
+TIMEZONES = ('utc', 'America/New_York', 'Europe/London', 'Europe/Berlin', 'Asia/Kolkata', 'Asia/Manila')
+WORDS = (
+    'build', 'website', 'app', 'api', 'dashboard', 'landing', 'page', 'integration', 'fix', 'bug',
+    'design', 'logo', 'data', 'pipeline', 'migration', 'shop', 'backend', 'frontend', 'report', 'automation',
+)
+POSTING_STATUSES = (('posted', 70), ('draft', 10), ('interviewed', 8), ('offered', 5), ('completed', 5), ('cancelled', 2))
+APPLICATION_STATUSES = (('pending', 60), ('accepted', 15), ('rejected', 15), ('cancelled', 10))
+INVITATION_STATUSES = (('pending', 60), ('accepted', 20), ('declined', 15), ('cancelled', 5))
+OFFER_STATUSES = (('pending', 40), ('accepted', 30), ('completed', 20), ('rejected', 5), ('cancelled', 5))
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with a reproducible synthetic dataset (users, profiles, job postings, "
+        "applications, invitations, offers and saved items) using bulk inserts, then rebuilds the "
+        "derived data (counters, taxonomy tags, search index) that bulk inserts skip."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--client-share', type=float, default=0.2, help="Share of users who are clients.")
+        parser.add_argument('--postings', type=int, default=5000)
+        parser.add_argument('--applications', type=int, default=20000)
+        parser.add_argument('--invitations', type=int, default=5000)
+        parser.add_argument('--offers', type=int, default=1000)
+        parser.add_argument('--saved-jobs', type=int, default=3000)
+        parser.add_argument('--saved-freelancers', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--append', action='store_true',
+            help="Generate even if users already exist (use a different --seed to avoid collisions)."
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.exists() and not options['append']:
+            raise CommandError("The database already has users; pass --append to add a dataset anyway.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = f"seed{options['seed']}"
+
+        client_count = max(1, int(options['users'] * options['client_share']))
+        freelancer_count = max(1, options['users'] - client_count)
+        clients = self.create_users(prefix, 'client', client_count)
+        freelancers = self.create_users(prefix, 'freelancer', freelancer_count)
+        self.create_profiles(clients + freelancers)
+
+        postings = self.insert(JobPosting, (self.posting(clients) for _ in range(options['postings'])))
+        self.insert(JobApplication, (
+            JobApplication(
+                id=self.uuid(), job_posting_id=posting_id, user_id=user_id,
+                status=self.weighted(APPLICATION_STATUSES), price=self.price(),
+                duration=self.rng.choice(JOB_DURATION_CHOICES)[0], cover_letter=self.sentence(30),
+            )
+            for posting_id, user_id in self.pairs(postings, freelancers, options['applications'])
+        ))
+        self.insert(JobInvitation, (
+            JobInvitation(
+                id=self.uuid(), job_posting_id=posting_id, user_id=user_id,
+                status=self.weighted(INVITATION_STATUSES), description=self.sentence(12),
+            )
+            for posting_id, user_id in self.pairs(postings, freelancers, options['invitations'])
+        ))
+        self.insert(JobOffer, (
+            JobOffer(
+                id=self.uuid(), job_posting_id=posting_id, user_id=user_id,
+                status=self.weighted(OFFER_STATUSES), price=self.price(),
+            )
+            for posting_id, user_id in self.pairs(postings, freelancers, options['offers'])
+        ))
+        self.insert(SavedJob, (
+            SavedJob(id=self.uuid(), user_id=user_id, job_posting_id=posting_id)
+            for posting_id, user_id in self.pairs(postings, freelancers, options['saved_jobs'])
+        ))
+        self.insert(SavedFreelancer, (
+            SavedFreelancer(id=self.uuid(), user_id=user_id, freelancer_id=freelancer_id)
+            for freelancer_id, user_id in self.pairs(freelancers, clients, options['saved_freelancers'])
+        ))
+
+        # Bulk inserts skip the signals that keep these in sync.
+        call_command('rebuild_job_counters', stdout=self.stdout)
+        call_command('backfill_taxonomy', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        for namespace in ('job_postings', 'relevant_jobs'):
+            bump_version(namespace)
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(clients)} clients, {len(freelancers)} freelancers and {len(postings)} job postings "
+            f"(seed {options['seed']}). Every user's password is 'password'."
+        ))
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def weighted(self, choices):
+        values, weights = zip(*choices)
+        return self.rng.choices(values, weights)[0]
+
+    def sentence(self, words):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(words // 2, words)))
+
+    def price(self):
+        return Decimal(self.rng.randrange(500, 500000)) / 100
+
+    def terms(self, vocabulary, low, high):
+        return ','.join(self.rng.sample(vocabulary, self.rng.randint(low, high)))
+
+    def pairs(self, targets, owners, count):
+        """
+        Yields about ``count`` random ``(target, owner)`` pairs, spread over
+        the targets, without repeating an owner for the same target.
+        """
+        if not targets or not owners:
+            return
+        per_target, remainder = divmod(min(count, len(targets) * len(owners)), len(targets))
+        extra = set(self.rng.sample(range(len(targets)), remainder))
+        for index, target in enumerate(targets):
+            for owner in self.rng.sample(owners, per_target + (index in extra)):
+                yield target, owner
+
+    def insert(self, model, objects):
+        """Bulk-inserts ``objects`` in batches and returns their primary keys."""
+        ids = []
+        objects = iter(objects)
+        with transaction.atomic():
+            while True:
+                batch = list(islice(objects, self.batch_size))
+                if not batch:
+                    break
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+                ids.extend(obj.pk for obj in batch)
+        self.stdout.write(f"{model._meta.verbose_name_plural}: inserted {len(ids)}")
+        return ids
+
+    def create_users(self, prefix, role, count):
+        # Hashing once keeps generation fast; everyone shares the same password.
+        password = make_password('password')
+        return self.insert(User, (
+            User(
+                id=self.uuid(), email=f'{prefix}-{role}{number}@example.com', password=password, role=role,
+                first_name=f'{role.title()}{number}', last_name=self.rng.choice(WORDS).title(),
+            )
+            for number in range(count)
+        ))
+
+    def create_profiles(self, user_ids):
+        def profiles():
+            for user_id in user_ids:
+                country, city = self.rng.choice(COUNTRIES)
+                profile = Profile(
+                    id=self.uuid(), user_id=user_id, country=country, city=city,
+                    timezone=self.rng.choice(TIMEZONES),
+                    title=self.sentence(6), description=self.sentence(60), price=self.price(),
+                    skills=self.terms(SKILLS, 1, 6), categories=self.terms(CATEGORIES, 1, 2),
+                    visibility_status='public' if self.rng.random() < 0.9 else 'private',
+                    working_availability=self.rng.choice(
+                        ('none', 'more_than_30_hours_per_week', 'less_than_30_hours_per_week')
+                    ),
+                    job_success=self.rng.random() * 100, rating=round(self.rng.uniform(3, 5), 1),
+                )
+                profile.completion_percentage = profile.calculate_profile_completion()
+                yield profile
+        self.insert(Profile, profiles())
+
+    def posting(self, clients):
+        return JobPosting(
+            id=self.uuid(), user_id=self.rng.choice(clients), title=self.sentence(8).capitalize(),
+            description=self.sentence(120), skills=self.terms(SKILLS, 1, 5),
+            categories=self.terms(CATEGORIES, 1, 2), status=self.weighted(POSTING_STATUSES),
+            compensation_type=self.rng.choice(('fixed_price', 'hourly')),
+            working_type=self.rng.choice(('part_time', 'full_time')),
+            size=self.rng.choice(('small', 'medium', 'large')),
+            duration=self.rng.choice(JOB_DURATION_CHOICES)[0],
+            experience_level=self.rng.choice(('entry_level', 'mid_level', 'expert_level')),
+            price=self.price(), developers_needed=self.rng.randint(1, 3),
+        )
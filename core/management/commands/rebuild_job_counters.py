@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import rebuild_job_posting_counters, rebuild_profile_counters
+from core.notifications import rebuild_unread_notification_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the denormalized proposal/interview/invite counters on every job posting, "
+        "the posted job count of every profile and the unread notification count of every user."
+    )
+
+    def handle(self, *args, **options):
+        updated = rebuild_job_posting_counters()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} job postings."))
+        updated = rebuild_profile_counters()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt posted job counts for {updated} profiles."))
+        updated = rebuild_unread_notification_counts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt unread notification counts for {updated} users."))
@@ -0,0 +1,144 @@
+"""
+In-process request metrics exported in the Prometheus text format.
+
+Series are kept per process (each worker answers scrapes with its own
+numbers), so scrape every worker or run a single metrics worker behind the
+local scraper. Recording a sample is a dict lookup and a few additions
+under a lock; see core.middleware.MetricsMiddleware for what is recorded.
+"""
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(labelnames, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._series = {}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            series = sorted(self._series.items())
+            lines += [line for labels, value in series for line in self.render_series(labels, value)]
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render_series(self, labels, value):
+        yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        # One slot per bucket plus +Inf; made cumulative when rendered.
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render_series(self, labels, value):
+        counts, total = value
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = (('le', _format_value(float(bound))),)
+            yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}'
+        yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}'
+        yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}'
+
+
+REQUESTS = Counter(
+    'workmania_http_requests_total',
+    'HTTP requests handled, sampled or not.',
+    ('route', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'workmania_http_request_duration_seconds',
+    'Latency of sampled requests.',
+    ('route', 'method'),
+)
+DB_QUERIES = Histogram(
+    'workmania_db_queries_per_request',
+    'SQL statements run by sampled requests.',
+    ('route', 'method'),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'workmania_db_duration_seconds',
+    'Time spent in SQL by sampled requests.',
+    ('route', 'method'),
+)
+SERIALIZER_DURATION = Histogram(
+    'workmania_serializer_duration_seconds',
+    'Time from building the serializer to the finalized, not yet rendered, response in sampled API requests.',
+    ('route', 'method'),
+)
+
+REGISTRY = (REQUESTS, REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZER_DURATION)
+
+
+class RequestSample:
+    """What one sampled request spent, filled in while it runs."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = None
+
+
+def record(route, method, status, duration, sample=None):
+    REQUESTS.inc((route, method, str(status)))
+    if sample is None:
+        return
+    labels = (route, method)
+    REQUEST_DURATION.observe(labels, duration)
+    DB_QUERIES.observe(labels, sample.query_count)
+    DB_DURATION.observe(labels, sample.query_seconds)
+    if sample.serializer_seconds is not None:
+        SERIALIZER_DURATION.observe(labels, sample.serializer_seconds)
+
+
+def render():
+    return '\n'.join(line for metric in REGISTRY for line in metric.render()) + '\n'
@@ -0,0 +1,57 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from core import metrics
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` hook that counts and times SQL statements."""
+
+    def __init__(self, sample):
+        self.sample = sample
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sample.query_seconds += time.perf_counter() - start
+            self.sample.query_count += 1
+
+
+class MetricsMiddleware:
+    """
+    Counts every request per route (the URL name, e.g. ``job_postings-list``)
+    and, for a ``METRICS_SAMPLE_RATE`` share of them, records latency, SQL
+    statement count and SQL time. DRF views using
+    ``core.api.metrics.SerializerTimingMixin`` add their serializer time to
+    the same sample. Exported by ``core.views.metrics``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        sample = None
+        if random.random() < getattr(settings, 'METRICS_SAMPLE_RATE', 1.0):
+            sample = request.metrics_sample = metrics.RequestSample()
+
+        start = time.perf_counter()
+        if sample is None:
+            response = self.get_response(request)
+        else:
+            with connection.execute_wrapper(QueryRecorder(sample)):
+                response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = (match.view_name or match._func_path) if match else 'unresolved'
+        if route != 'metrics':
+            metrics.record(route, request.method, response.status_code, duration, sample)
+        return response
@@ -1,7 +1,9 @@
+import copy
+
 from django.contrib.auth.models import Group
 from django.contrib import admin
 from django.db import models
-from django.db.models import Avg, Count, Max
+from django.db.models import Avg, Count, Max, Q
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.models import (PermissionsMixin, BaseUserManager)
 from core.constants import ROLES
@@ -16,6 +18,9 @@ JOB_DURATION_CHOICES = (
     ('six_plus_months', '6+ months'),
 )
 
+# Application statuses counted as proposals on a job posting.
+PROPOSAL_STATUSES = ('pending', 'accepted', 'rejected')
+
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None):
         if not email:
@@ -69,10 +74,18 @@ class Resource(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
         ('other', 'OTHER'),
     )
 
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='files', null=True, blank=True)
     category = models.CharField(max_length=50, choices=CATEGORIES)
     name = models.CharField(max_length=200, null=True, blank=True)
+    # URL of the stored content; see core.uploads.
     file = models.CharField(max_length=200, null=True, blank=True)
     size = models.CharField(max_length=200, null=True, blank=True)
+    # SHA-256 of the content, which is also its storage name, so identical
+    # uploads share one stored copy.
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    byte_size = models.BigIntegerField(null=True, blank=True)
+    # Resized copies of images by size and format; see core.images.
+    derivatives = models.JSONField(default=dict, blank=True)
     is_active = models.BooleanField(default=True)
     # file = models.FileField(upload_to=resource_path)
 
@@ -80,6 +93,52 @@ class Resource(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
         return f'{self.category} - {self.file}'
 
 
+class UploadSession(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
+    """
+    A resumable upload: the client appends chunks at ``received_bytes``
+    until ``byte_size`` bytes have arrived, then the assembled file becomes
+    a Resource. See core.uploads.
+    """
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='upload_sessions')
+    category = models.CharField(max_length=50, choices=Resource.CATEGORIES)
+    name = models.CharField(max_length=200)
+    byte_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    resource = models.ForeignKey(Resource, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.received_bytes}/{self.byte_size})'
+
+    @property
+    def is_complete(self):
+        return self.resource_id is not None
+
+
+class TaxonomyTerm(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
+    name = models.CharField(max_length=255)
+    # Case-folded name; comma-separated skill/category strings resolve on it.
+    key = models.CharField(max_length=255, unique=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def normalize_key(name):
+        return name.strip().lower()[:255]
+
+
+class Skill(TaxonomyTerm):
+    pass
+
+
+class Category(TaxonomyTerm):
+    class Meta:
+        verbose_name_plural = 'categories'
+
+
 class User(AbstractBaseUser, PermissionsMixin, UUIDPrimaryKeyMixin, CreatedModifiedMixin):
     is_staff = models.BooleanField(default=False)
     email = models.EmailField('email address', unique=True)
@@ -95,6 +154,9 @@ class User(AbstractBaseUser, PermissionsMixin, UUIDPrimaryKeyMixin, CreatedModif
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
     date_joined = models.DateTimeField(auto_now_add=True)
+    # Maintained by core.notifications (and core.signals for single rows) so
+    # the unread badge never has to COUNT notifications.
+    unread_notification_count = models.IntegerField(default=0)
     objects = UserManager()
 
     def clean(self):
@@ -107,6 +169,35 @@ class User(AbstractBaseUser, PermissionsMixin, UUIDPrimaryKeyMixin, CreatedModif
     def get_full_name(self):
         return f"{self.first_name} {self.last_name or ''}"
 
+    def refresh_from_db(self, using=None, fields=None):
+        # Users restored from the token cache defer most columns (see
+        # core.api.authentication); the first deferred read loads them all
+        # in one query rather than one per field.
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields)
+
+
+# ``(points, fields, test)``: a profile earns the points when ``test`` passes
+# for the values of ``fields``. The score is capped at 100. Used by
+# ``Profile.calculate_profile_completion`` and, vectorized, by the
+# ``recompute_profile_completion`` command.
+PROFILE_COMPLETION_RULES = (
+    (10, ('avatar_id',), lambda avatar_id: avatar_id is not None),
+    (10, ('title',), bool),
+    (10, ('description',), bool),
+    (15, ('skills',), bool),
+    (10, ('categories',), bool),
+    (5, ('country', 'city'), lambda country, city: bool(country and city)),
+    (5, ('price',), lambda price: bool(price and price > 0)),
+    (5, ('working_availability',), lambda working_availability: working_availability != 'none'),
+    (10, ('portfolios',), bool),
+    (10, ('educations',), bool),
+    (10, ('experiences',), bool),
+)
+PROFILE_COMPLETION_FIELDS = tuple(dict.fromkeys(name for _, fields, _ in PROFILE_COMPLETION_RULES for name in fields))
+
 
 class Profile(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -134,6 +225,9 @@ class Profile(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
     portfolios = models.JSONField(null=True, blank=True)
     categories = models.TextField(null=True, blank=True)
     skills = models.TextField(null=True, blank=True)
+    # Normalized copies of ``skills``/``categories``, synced by core.taxonomy.
+    skill_tags = models.ManyToManyField(Skill, blank=True, related_name='profiles')
+    category_tags = models.ManyToManyField(Category, blank=True, related_name='profiles')
 
     job_success = models.FloatField(null=True, blank=True, default=0)
     total_earnings = models.FloatField(null=True, blank=True, default=0)
@@ -142,6 +236,9 @@ class Profile(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
     rating = models.FloatField(null=True, blank=True)
     completion_percentage = models.FloatField(null=True, blank=True, default=0)
     hire_rate = models.FloatField(null=True, blank=True, default=0)
+    # Job postings of this user that are not drafts, maintained by core.signals
+    # and rebuilt by the ``rebuild_job_counters`` management command.
+    posted_jobs_count = models.IntegerField(default=0)
 
     working_availability = models.CharField(max_length=255, choices=(
         ('none', 'None'),
@@ -160,6 +257,12 @@ class Profile(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
         ('not_available', 'Not Available'),
     ), default='available')
 
+    class Meta:
+        indexes = [
+            # The freelancer directory: public profiles above a completion threshold.
+            models.Index(fields=['visibility_status', 'completion_percentage'], name='core_profile_visibility_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.user.first_name} {self.user.last_name}"
     
@@ -167,50 +270,71 @@ class Profile(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
     def coins_available(self):
         return 240
     
-    @property
-    def posted_jobs_count(self):
-        return JobPosting.objects.filter(user=self.user).exclude(status='draft').count()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values(field_names)
+        return instance
+
+    def _remember_loaded_values(self, attnames):
+        # JSON values are copied so in-place edits still count as changes.
+        loaded = getattr(self, '_loaded_values', {})
+        for attname in attnames:
+            value = self.__dict__.get(attname)
+            loaded[attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+        self._loaded_values = loaded
+
+    def get_changed_fields(self):
+        """Attnames of loaded fields whose value differs from the database row."""
+        loaded = getattr(self, '_loaded_values', {})
+        return [
+            field.attname for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname in self.__dict__
+            and (field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname])
+        ]
 
     def calculate_profile_completion(self):
-        score = 0
-
-        if self.avatar:
-            score += 10
-        if self.title:
-            score += 10
-        if self.description:
-            score += 10
-        if self.skills:
-            score += 15
-        if self.categories:
-            score += 10
-        if self.country and self.city:
-            score += 5
-        if self.price and self.price > 0:
-            score += 5
-        if self.working_availability != 'none':
-            score += 5
-        if self.portfolios and len(self.portfolios) > 0:
-            score += 10
-        if self.educations and len(self.educations) > 0:
-            score += 10
-        if self.experiences and len(self.experiences) > 0:
-            score += 10
-
+        score = sum(
+            points for points, fields, test in PROFILE_COMPLETION_RULES
+            if test(*(getattr(self, name) for name in fields))
+        )
         return min(score, 100)
 
     def save(self, *args, **kwargs):
-        self.completion_percentage = self.calculate_profile_completion()
+        """
+        Saves a loaded profile by writing only its changed columns (plus
+        ``modified``), and recomputes the completion score only when a field
+        that counts towards it is written. New profiles are saved whole.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and hasattr(self, '_loaded_values'):
+            update_fields = self.get_changed_fields()
+            update_fields.append('modified')
+        if update_fields is not None:
+            update_fields = {self._meta.get_field(name).attname for name in update_fields}
+        if update_fields is None or update_fields & set(PROFILE_COMPLETION_FIELDS):
+            self.completion_percentage = self.calculate_profile_completion()
+            if update_fields is not None:
+                update_fields.add('completion_percentage')
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
+        self._remember_loaded_values(
+            update_fields if update_fields is not None else [field.attname for field in self._meta.concrete_fields]
+        )
 
 
 class JobPosting(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Indexed as the leading column of ``core_posting_user_status_idx``.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     slug = models.SlugField(max_length=255, null=True, blank=True)
     title = models.CharField(max_length=255, null=True, blank=True)
     description = models.TextField(null=True, blank=True)
     skills = models.TextField(null=True, blank=True)
     categories = models.TextField(null=True, blank=True)
+    skill_tags = models.ManyToManyField(Skill, blank=True, related_name='job_postings')
+    category_tags = models.ManyToManyField(Category, blank=True, related_name='job_postings')
     compensation_type = models.CharField(max_length=255, choices=(
         ('fixed_price', 'Fixed price'),
         ('hourly', 'Hourly'),
@@ -247,29 +371,50 @@ class JobPosting(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
         ('completed', 'Completed'),
     ), default='draft', null=True, blank=True)    
 
+    # Denormalized engagement counters, maintained by core.signals and
+    # rebuilt by the ``rebuild_job_counters`` management command.
+    proposal_count = models.IntegerField(default=0, db_index=True)
+    interview_count = models.IntegerField(default=0)
+    invite_count = models.IntegerField(default=0)
+    COUNTER_FIELDS = ('proposal_count', 'interview_count', 'invite_count')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='core_posting_user_status_idx'),
+            # The public feed: everything but drafts, newest first. The condition
+            # matches the list view's filter so the planner can use it.
+            models.Index(
+                fields=['-created', '-id'],
+                name='core_posting_live_idx',
+                condition=~Q(status__in=['draft']),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.user.first_name} {self.user.last_name}"
-    
-    @property
-    def proposal_count(self):
-        return JobApplication.objects.filter(job_posting=self, status__in=['pending', 'accepted', 'rejected']).count()
-
-    @property
-    def interview_count(self):
-        return JobApplication.objects.filter(job_posting=self, status='accepted').count()
-
-    @property
-    def invite_count(self):
-        return JobInvitation.objects.filter(job_posting=self).count()
 
     @property
     def coin_count(self):
         return 2
 
+    def save(self, *args, **kwargs):
+        """
+        Saves a loaded posting without its counter columns, which only move
+        through F() updates; an instance loaded before an application or
+        invitation would otherwise write the old counts back.
+        """
+        if kwargs.get('update_fields') is None and not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class JobApplication(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
-    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='job_applications')
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Each foreign key leads one of the ``(<fk>, status)`` indexes below.
+    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='job_applications', db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     cover_letter = models.TextField(null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     duration = models.CharField(max_length=255, choices=JOB_DURATION_CHOICES, null=True, blank=True)
@@ -282,13 +427,20 @@ class JobApplication(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
     )
     attachments = models.JSONField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='core_app_user_status_idx'),
+            models.Index(fields=['job_posting', 'status'], name='core_app_posting_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.job_posting.title} - {self.user}"
 
 
 class JobInvitation(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
-    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='job_invitations')
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Each foreign key leads one of the ``(<fk>, status)`` indexes below.
+    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='job_invitations', db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     description = models.TextField(null=True, blank=True)
     status = models.CharField(max_length=255, choices=(
         ('pending', 'Pending'),
@@ -298,13 +450,20 @@ class JobInvitation(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
         default='pending'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='core_inv_user_status_idx'),
+            models.Index(fields=['job_posting', 'status'], name='core_inv_posting_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.job_posting.title} - {self.user}"
 
 
 class JobOffer(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
-    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='job_offers')
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Each foreign key leads one of the ``(<fk>, status)`` indexes below.
+    job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='job_offers', db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     status = models.CharField(max_length=255, choices=(
         ('pending', 'Pending'),
@@ -315,6 +474,12 @@ class JobOffer(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
         default='pending'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='core_offer_user_status_idx'),
+            models.Index(fields=['job_posting', 'status'], name='core_offer_posting_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.job_posting.title} - {self.user}"
 
@@ -348,7 +513,8 @@ class JobReview(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
 
 
 class Notification(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Leads both indexes below.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     slug = models.SlugField(max_length=255, null=True, blank=True)
     title = models.CharField(max_length=255, null=True, blank=True)
     description = models.TextField(null=True, blank=True)
@@ -358,6 +524,12 @@ class Notification(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
         default='unread'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created', '-id'], name='core_notification_user_idx'),
+            models.Index(fields=['user', 'status'], name='core_notification_status_idx'),
+        ]
+
 
 class Plan(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
     name = models.CharField(max_length=255, null=True, blank=True)
@@ -390,9 +562,59 @@ class Subscription(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
         return f"{self.user.email} - {self.plan.name}"
 
 
+class Conversation(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
+    """
+    The message thread of a pair of users, stored in a fixed order
+    (``user_low`` < ``user_high``) so there is one thread per pair whoever
+    writes first. See core.conversations.
+    """
+    # Leads the unique constraint below.
+    user_low = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    user_high = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(
+        'Message', on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='core_conversation_pair_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_low} - {self.user_high}"
+
+    def other_user_id(self, user_id):
+        return self.user_high_id if self.user_low_id == user_id else self.user_low_id
+
+
+class ConversationMember(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
+    """One participant's inbox entry for a conversation."""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members', db_index=False)
+    # Leads the inbox index below.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations', db_index=False)
+    unread_count = models.IntegerField(default=0)
+    last_message_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='core_conversationmember_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-last_message_at', '-id'], name='core_member_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.conversation_id}"
+
+
 class Message(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sender')
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recipient')
+    # Null only for messages written before conversations existed; see the
+    # ``backfill_conversations`` command. Leads the thread index below.
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name='messages', null=True, blank=True, db_index=False
+    )
     description = models.TextField(null=True, blank=True)
     status = models.CharField(max_length=255, choices=(
         ('pending', 'Pending'),
@@ -402,19 +624,36 @@ class Message(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
         default='pending'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', '-created', '-id'], name='core_message_thread_idx'),
+        ]
+
     def __str__(self):
         return f"{self.sender.email} - {self.recipient.email}"
 
 class SavedJob(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_jobs')
+    # Indexed as the leading column of the unique constraint.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_jobs', db_index=False)
     job_posting = models.ForeignKey(JobPosting, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'job_posting'], name='core_savedjob_unique'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.job_posting}"
 
 class SavedFreelancer(UUIDPrimaryKeyMixin, CreatedModifiedMixin):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_users')
+    # Indexed as the leading column of the unique constraint.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_users', db_index=False)
     freelancer = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'freelancer'], name='core_savedfreelancer_unique'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.freelancer}"
\ No newline at end of file
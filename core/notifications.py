@@ -0,0 +1,76 @@
+"""
+Notification fan-out and the per-user unread counter.
+
+Notifications are written with ``bulk_create``, which sends no signals, so
+the helpers here keep ``User.unread_notification_count`` in step with the
+rows they write; single rows saved through the ORM (the admin) are counted
+by core.signals. ``rebuild_unread_notification_counts`` recomputes the
+counter from the table when it has drifted.
+"""
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core import events
+from core.models import Notification, User
+
+JOB_POSTING_PUBLISHED = 'job-posting-published'
+APPLICATION_RECEIVED = 'application-received'
+INVITATION_SENT = 'invitation-sent'
+OFFER_MADE = 'offer-made'
+
+
+def adjust_unread_count(user_ids, delta):
+    if delta:
+        User.objects.filter(pk__in=user_ids).update(
+            unread_notification_count=F('unread_notification_count') + delta
+        )
+
+
+def notify(user_ids, slug, title, description=None, batch_size=1000):
+    """
+    Creates one unread notification for each of ``user_ids`` (an iterable,
+    repeats are dropped) with one INSERT and one counter UPDATE per batch,
+    and pushes a ``notification`` event to each of them. Returns the number
+    of notifications created.
+    """
+    user_ids = iter(dict.fromkeys(user_ids))
+    created = 0
+    while True:
+        batch = list(islice(user_ids, batch_size))
+        if not batch:
+            return created
+        with transaction.atomic():
+            Notification.objects.bulk_create([
+                Notification(user_id=user_id, slug=slug, title=title, description=description)
+                for user_id in batch
+            ])
+            adjust_unread_count(batch, 1)
+            events.publish(batch, 'notification', {'slug': slug, 'title': title})
+        created += len(batch)
+
+
+def mark_read(user, ids=None):
+    """
+    Marks the user's unread notifications, or only those in ``ids``, as read
+    with a single UPDATE and returns how many changed.
+    """
+    notifications = Notification.objects.filter(user=user, status='unread')
+    if ids is not None:
+        notifications = notifications.filter(pk__in=ids)
+    with transaction.atomic():
+        updated = notifications.update(status='read')
+        adjust_unread_count([user.pk], -updated)
+    return updated
+
+
+def get_unread_count(user):
+    return User.objects.filter(pk=user.pk).values_list('unread_notification_count', flat=True).first() or 0
+
+
+def rebuild_unread_notification_counts():
+    unread = Notification.objects.filter(user=OuterRef('pk'), status='unread').order_by()
+    unread = unread.values('user').annotate(total=Count('pk')).values('total')
+    return User.objects.update(unread_notification_count=Coalesce(Subquery(unread), Value(0)))
@@ -0,0 +1,306 @@
+"""
+Ranks open job postings for a freelancer by the overlap between the
+posting's skill/category tags and the freelancer's profile tags.
+
+Open postings are kept in a process-local sparse matrix (one L2-normalized
+row per posting, one column per tag) so a recommendation is a single
+sparse matrix-vector product plus a partial sort.
+
+Only saves that open, close or retag a posting are published. Each one
+bumps a version counter (core.caching) and writes the posting's new tags
+to a change log in the shared cache, keyed by that version. The process
+that made the change applies it at once. Other processes replay the log
+entries after their own version at most every
+``RELEVANT_JOBS_REFRESH_SECONDS``. Only a log they cannot replay (expired
+entries, a cleared cache) makes them rebuild the matrix. That rebuild runs
+in a background thread while the current matrix keeps serving.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from scipy import sparse
+
+from core.caching import bump_version, get_version
+from core.models import JobPosting, Profile
+from core.taxonomy import term_keys
+
+logger = logging.getLogger(__name__)
+
+OPEN_JOB_STATUSES = ('posted', 'interviewed', 'offered')
+# Relative weight of a shared tag of each kind in the similarity score.
+TERM_WEIGHTS = {'skill': 1.0, 'category': 0.5}
+VERSION_NAMESPACE = 'relevant_jobs'
+
+
+def change_key(version):
+    return f'relevant_jobs:change:{version}'
+
+
+def relevance_key(status, is_active, skills, categories):
+    """What the index holds for a posting: None when closed, else its term keys."""
+    if not is_active or status not in OPEN_JOB_STATUSES:
+        return None
+    return frozenset(term_keys(skills)), frozenset(term_keys(categories))
+
+
+def _tags(model, owner_ids):
+    """Yields ``(owner_id, (kind, term_id))`` for the skill and category tags of ``model`` rows."""
+    owner_field = model._meta.model_name
+    for kind in TERM_WEIGHTS:
+        through = getattr(model, f'{kind}_tags').through
+        rows = through.objects.filter(**{f'{owner_field}__in': owner_ids})
+        for owner_id, term_id in rows.values_list(f'{owner_field}_id', f'{kind}_id'):
+            yield owner_id, (kind, term_id)
+
+
+def _normalized(rows, columns, weights, row_count, column_count):
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=row_count))
+    data = weights / norms[rows] if len(rows) else weights
+    return sparse.csr_matrix((data.astype(np.float32), (rows, columns)), shape=(row_count, column_count))
+
+
+class RelevantJobsIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._version = None
+        self._checked_at = 0.0
+        self._missing_version = None
+        self._rebuilding = False
+        self._pending = {}
+        self._columns = {}
+        self._posting_ids = []
+        self._rows = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def _column(self, term):
+        column = self._columns.get(term)
+        if column is None:
+            column = self._columns[term] = len(self._columns)
+        return column
+
+    def _vector(self, terms):
+        columns = [self._column(term) for term in terms]
+        weights = [TERM_WEIGHTS[kind] for kind, _ in terms]
+        return np.asarray(columns, dtype=np.int64), np.asarray(weights, dtype=np.float32)
+
+    @staticmethod
+    def _build():
+        """Reads every open posting's tags into a fresh matrix, without touching the index."""
+        version = get_version(VERSION_NAMESPACE)
+        open_ids = JobPosting.objects.filter(is_active=True, status__in=OPEN_JOB_STATUSES).values('pk')
+
+        column_ids, posting_ids, row_ids = {}, [], {}
+        rows, columns, weights = [], [], []
+        for posting_id, term in _tags(JobPosting, open_ids):
+            row = row_ids.get(posting_id)
+            if row is None:
+                row = row_ids[posting_id] = len(posting_ids)
+                posting_ids.append(posting_id)
+            rows.append(row)
+            columns.append(column_ids.setdefault(term, len(column_ids)))
+            weights.append(TERM_WEIGHTS[term[0]])
+
+        matrix = _normalized(
+            np.asarray(rows, dtype=np.int64),
+            np.asarray(columns, dtype=np.int64),
+            np.asarray(weights, dtype=np.float32),
+            len(posting_ids),
+            len(column_ids),
+        )
+        return version, column_ids, posting_ids, row_ids, matrix
+
+    def _install(self, built):
+        # Changes published while the matrix was built are replayed from the
+        # log on the next check, which is made right away; queued vectors
+        # point at the old columns and are dropped.
+        self._version, self._columns, self._posting_ids, self._rows, self._matrix = built
+        self._pending = {}
+        self._alive = np.ones(len(self._posting_ids), dtype=bool)
+        self._missing_version = None
+        self._loaded = True
+        self._checked_at = 0.0
+
+    def load(self):
+        """Builds the matrix for every open posting from the tag tables."""
+        with self._lock:
+            self._install(self._build())
+
+    def _rebuild(self):
+        try:
+            built = self._build()
+            with self._lock:
+                self._install(built)
+        except Exception:
+            logger.exception("Could not rebuild the relevant jobs index")
+        finally:
+            self._rebuilding = False
+
+    def _rebuild_in_thread(self):
+        try:
+            self._rebuild()
+        finally:
+            # The thread's own database connection is not reused.
+            connection.close()
+
+    def schedule_rebuild(self):
+        """Rebuilds the matrix in a background thread; the current one keeps serving meanwhile."""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        if getattr(settings, 'RELEVANT_JOBS_BACKGROUND_REBUILD', True):
+            threading.Thread(target=self._rebuild_in_thread, name='relevant-jobs-rebuild', daemon=True).start()
+        else:
+            self._rebuild()
+
+    def _apply_pending(self):
+        if not self._pending:
+            return
+        rows, columns, weights = [], [], []
+        for posting_id, vector in self._pending.items():
+            old_row = self._rows.pop(posting_id, None)
+            if old_row is not None:
+                self._alive[old_row] = False
+            if vector is None or not len(vector[0]):
+                continue
+            rows.append(np.full(len(vector[0]), len(rows), dtype=np.int64))
+            columns.append(vector[0])
+            weights.append(vector[1])
+            self._rows[posting_id] = len(self._posting_ids)
+            self._posting_ids.append(posting_id)
+        self._pending = {}
+
+        column_count = len(self._columns)
+        matrix = self._matrix
+        matrix.resize((matrix.shape[0], column_count))
+        if rows:
+            appended = _normalized(
+                np.concatenate(rows), np.concatenate(columns), np.concatenate(weights), len(rows), column_count
+            )
+            matrix = sparse.vstack([matrix, appended], format='csr')
+            self._alive = np.concatenate([self._alive, np.ones(len(rows), dtype=bool)])
+        self._matrix = matrix
+
+        # Compact once replaced/closed rows make up most of the matrix.
+        if self._alive.size and self._alive.sum() * 2 < self._alive.size:
+            keep = np.flatnonzero(self._alive)
+            self._matrix = self._matrix[keep]
+            self._posting_ids = [self._posting_ids[row] for row in keep]
+            self._rows = {posting_id: row for row, posting_id in enumerate(self._posting_ids)}
+            self._alive = np.ones(len(keep), dtype=bool)
+
+    def _replay_changes(self):
+        """Applies the logged changes other processes published after this index's version."""
+        current = get_version(VERSION_NAMESPACE)
+        if current == self._version:
+            return
+        max_replay = getattr(settings, 'RELEVANT_JOBS_MAX_REPLAY', 1000)
+        if current < self._version or current - self._version > max_replay:
+            self.schedule_rebuild()
+            return
+
+        versions = range(self._version + 1, current + 1)
+        entries = cache.get_many([change_key(version) for version in versions])
+        for version in versions:
+            entry = entries.get(change_key(version))
+            if entry is None:
+                # Either still being written by its publisher or gone from the
+                # cache; only the second survives until the next check.
+                if self._missing_version == version:
+                    self.schedule_rebuild()
+                self._missing_version = version
+                return
+            posting_id, terms = entry
+            self._pending[posting_id] = None if terms is None else self._vector(terms)
+            self._version = version
+        self._missing_version = None
+
+    def _refresh_if_stale(self):
+        interval = getattr(settings, 'RELEVANT_JOBS_REFRESH_SECONDS', 60)
+        if not self._loaded:
+            # Nothing to serve yet, so the first build runs in the request.
+            self.load()
+        elif time.monotonic() - self._checked_at >= interval:
+            self._checked_at = time.monotonic()
+            self._replay_changes()
+
+    def apply_change(self, posting_id, terms, version):
+        """Queues this process's own change, published as ``version``; ``terms`` None removes it."""
+        with self._lock:
+            self._pending[posting_id] = None if terms is None else self._vector(terms)
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def top_k(self, terms, k):
+        """Returns up to ``k`` ``(posting_id, score)`` pairs for ``terms``, best first."""
+        with self._lock:
+            self._refresh_if_stale()
+            self._apply_pending()
+
+            known = [term for term in terms if term in self._columns]
+            columns = [self._columns[term] for term in known]
+            weights = [TERM_WEIGHTS[kind] for kind, _ in known]
+            if not columns or not self._posting_ids:
+                return []
+
+            query = np.zeros(self._matrix.shape[1], dtype=np.float32)
+            query[columns] = weights
+            scores = self._matrix @ query
+            scores[~self._alive] = 0
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+            return [(self._posting_ids[row], float(scores[row])) for row in candidates]
+
+    def recommend(self, profile, k):
+        return self.top_k([term for _, term in _tags(Profile, [profile.pk])], k)
+
+
+_index = RelevantJobsIndex()
+
+
+def get_relevant_jobs_index():
+    return _index
+
+
+def publish_change(job_posting_id, terms):
+    """Logs a posting's new tags (None once closed) for every process and applies it here."""
+    version = bump_version(VERSION_NAMESPACE)
+    cache.set(change_key(version), (job_posting_id, terms), getattr(settings, 'RELEVANT_JOBS_CHANGE_LOG_TIMEOUT', 3600))
+    if _index.loaded:
+        _index.apply_change(job_posting_id, terms, version)
+
+
+def posting_relevance_key(job_posting):
+    return relevance_key(job_posting.status, job_posting.is_active, job_posting.skills, job_posting.categories)
+
+
+def refresh_posting(job_posting, previous_key=None):
+    """
+    Publishes a posting whose open status or tags differ from
+    ``previous_key``, the ``relevance_key`` of its stored row before the
+    save (None for a new or closed posting).
+    """
+    key = posting_relevance_key(job_posting)
+    if key == previous_key:
+        return
+    terms = None if key is None else [term for _, term in _tags(JobPosting, [job_posting.pk])]
+    publish_change(job_posting.pk, terms)
+
+
+def forget_posting(job_posting):
+    if posting_relevance_key(job_posting) is not None:
+        publish_change(job_posting.pk, None)
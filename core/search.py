@@ -0,0 +1,176 @@
+"""
+Full-text search over job posting titles and descriptions.
+
+The backend is chosen from ``settings.JOB_SEARCH_BACKEND`` (a dotted path)
+or, when unset, from the default database vendor: SQLite uses an FTS5
+virtual table, PostgreSQL a GIN expression index, anything else falls back
+to ``icontains`` matching. Every backend annotates the searched queryset
+with ``search_rank``, where lower values are better matches.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import IntegerField, Q, Value
+from django.utils.module_loading import import_string
+
+from core.models import JobPosting
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_tokens(query):
+    return TOKEN_RE.findall(query or '')
+
+
+class BaseSearchBackend:
+
+    def setup(self):
+        """Creates the index structures if they do not exist yet."""
+
+    def index(self, job_posting):
+        """Adds or refreshes a single job posting in the index."""
+
+    def remove(self, job_posting_id):
+        """Drops a single job posting from the index."""
+
+    def rebuild(self):
+        """Re-indexes every job posting and returns how many were indexed."""
+        return 0
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+
+class ContainsSearchBackend(BaseSearchBackend):
+    """Unindexed fallback: every word must appear in the title or description."""
+
+    def search(self, queryset, query):
+        filters = Q()
+        for word in search_tokens(query):
+            filters &= Q(title__icontains=word) | Q(description__icontains=word)
+        return queryset.filter(filters).annotate(search_rank=Value(0, output_field=IntegerField()))
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """
+    BM25-ranked search through an FTS5 table. Each row's rowid is derived
+    from the posting UUID so single-row updates and deletes are rowid lookups.
+    """
+    table = 'core_jobposting_fts'
+    # bm25() column weights: posting_id (unindexed), title, description.
+    rank_expression = f'bm25({table}, 0.0, 10.0, 1.0)'
+
+    @staticmethod
+    def rowid(job_posting_id):
+        return job_posting_id.int >> 65
+
+    def setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "posting_id UNINDEXED, title, description, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+
+    def _row(self, job_posting_id, title, description):
+        return (self.rowid(job_posting_id), job_posting_id.hex, title or '', description or '')
+
+    def index(self, job_posting):
+        row = self._row(job_posting.pk, job_posting.title, job_posting.description)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [row[0]])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, posting_id, title, description) VALUES (%s, %s, %s, %s)",
+                row
+            )
+
+    def remove(self, job_posting_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [self.rowid(job_posting_id)])
+
+    def rebuild(self, chunk_size=2000):
+        self.setup()
+        postings = JobPosting.objects.values_list('id', 'title', 'description').iterator(chunk_size=chunk_size)
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            chunk = []
+            for row in postings:
+                chunk.append(self._row(*row))
+                if len(chunk) >= chunk_size:
+                    total += self._insert(cursor, chunk)
+                    chunk = []
+            total += self._insert(cursor, chunk)
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return total
+
+    def _insert(self, cursor, rows):
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, posting_id, title, description) VALUES (%s, %s, %s, %s)",
+                rows
+            )
+        return len(rows)
+
+    def match_expression(self, query):
+        # Every word must match, as a prefix so results follow the keystrokes.
+        return ' '.join(f'"{token}"*' for token in search_tokens(query))
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return ContainsSearchBackend().search(queryset, query)
+        return queryset.extra(
+            select={'search_rank': self.rank_expression},
+            tables=[self.table],
+            where=[
+                f'{self.table} MATCH %s',
+                f'{self.table}.posting_id = {JobPosting._meta.db_table}.id',
+            ],
+            params=[match],
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Ranked search through a GIN index on the posting's tsvector."""
+    index_name = 'core_jobposting_search_idx'
+    vector = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+    def setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.index_name} "
+                f"ON {JobPosting._meta.db_table} USING GIN (({self.vector}))"
+            )
+
+    def rebuild(self):
+        self.setup()
+        with connection.cursor() as cursor:
+            cursor.execute(f"REINDEX INDEX {self.index_name}")
+        return JobPosting.objects.count()
+
+    def search(self, queryset, query):
+        tokens = search_tokens(query)
+        if not tokens:
+            return ContainsSearchBackend().search(queryset, query)
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        return queryset.extra(
+            select={'search_rank': f"-ts_rank({self.vector}, to_tsquery('english', %s))"},
+            select_params=[tsquery],
+            where=[f"{self.vector} @@ to_tsquery('english', %s)"],
+            params=[tsquery],
+        )
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    backend_path = getattr(settings, 'JOB_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTS5SearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return ContainsSearchBackend()
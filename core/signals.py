@@ -0,0 +1,239 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.api.authentication import revoke_tokens, revoke_user_tokens
+from core.api.caching import viewer_namespace
+from core.api.permissions import PERMISSIONS_NAMESPACE
+from core.api.tasks import (
+    dispatch,
+    generate_image_derivatives,
+    notify_application_received,
+    notify_invitation_sent,
+    notify_job_posting_published,
+    notify_offer_made,
+)
+from core.caching import bump_version
+from core.counters import application_counters, invitation_counters, move_counters, move_posted_jobs_count
+from core.images import is_image
+from core.models import (
+    JobApplication,
+    JobInvitation,
+    JobOffer,
+    JobPosting,
+    Notification,
+    Profile,
+    Resource,
+    SavedFreelancer,
+    SavedJob,
+    User,
+)
+from core.notifications import adjust_unread_count
+from core.recommendations import forget_posting, refresh_posting, relevance_key
+from core.search import get_search_backend
+from core.taxonomy import sync_terms
+
+
+def _counter_state(instance):
+    return (instance.job_posting_id, instance.status)
+
+
+def _remember_counter_state(sender, instance):
+    # Reads the stored row so status and posting changes can be diffed after save.
+    instance._counter_state = None
+    if not instance._state.adding:
+        instance._counter_state = sender.objects.filter(pk=instance.pk).values_list(
+            'job_posting_id', 'status'
+        ).first()
+
+
+@receiver(pre_save, sender=JobApplication)
+@receiver(pre_save, sender=JobInvitation)
+def remember_counter_state(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _remember_counter_state(sender, instance)
+
+
+@receiver(post_save, sender=JobApplication)
+def update_application_counters(sender, instance, raw=False, **kwargs):
+    if not raw:
+        move_counters(application_counters, getattr(instance, '_counter_state', None), _counter_state(instance))
+
+
+@receiver(post_save, sender=JobInvitation)
+def update_invitation_counters(sender, instance, raw=False, **kwargs):
+    if not raw:
+        move_counters(invitation_counters, getattr(instance, '_counter_state', None), _counter_state(instance))
+
+
+@receiver(post_delete, sender=JobApplication)
+def release_application_counters(sender, instance, **kwargs):
+    move_counters(application_counters, _counter_state(instance), None)
+
+
+@receiver(post_delete, sender=JobInvitation)
+def release_invitation_counters(sender, instance, **kwargs):
+    move_counters(invitation_counters, _counter_state(instance), None)
+
+
+@receiver(post_migrate)
+def setup_search_index(sender, using='default', **kwargs):
+    if sender.name == 'core':
+        get_search_backend().setup()
+
+
+@receiver(post_save, sender=JobPosting)
+def index_job_posting(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=JobPosting)
+def unindex_job_posting(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+    forget_posting(instance)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=JobPosting)
+def sync_taxonomy_terms(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        sync_terms(instance, fields=update_fields)
+
+
+@receiver(post_save, sender=JobPosting)
+def refresh_relevant_jobs(sender, instance, raw=False, **kwargs):
+    # Registered after sync_taxonomy_terms so the posting's tags are current.
+    if not raw:
+        refresh_posting(instance, getattr(instance, '_previous_relevance', None))
+
+
+@receiver(post_save, sender=JobPosting)
+@receiver(post_save, sender=JobApplication)
+@receiver(post_save, sender=JobInvitation)
+@receiver(post_save, sender=JobOffer)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=JobPosting)
+@receiver(post_delete, sender=JobApplication)
+@receiver(post_delete, sender=JobInvitation)
+@receiver(post_delete, sender=JobOffer)
+@receiver(post_delete, sender=Profile)
+def invalidate_job_posting_responses(sender, **kwargs):
+    bump_version('job_postings')
+
+
+@receiver(post_save, sender=SavedJob)
+@receiver(post_save, sender=SavedFreelancer)
+@receiver(post_delete, sender=SavedJob)
+@receiver(post_delete, sender=SavedFreelancer)
+def invalidate_viewer_state(sender, instance, **kwargs):
+    # Changes the user's is_saved flags, and so the ETags they are served.
+    bump_version(viewer_namespace(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_job_posting_owners(sender, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no job posting response renders.
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_version('job_postings')
+
+
+@receiver(post_save, sender=User)
+def revoke_cached_credentials(sender, instance, raw=False, **kwargs):
+    # The cached user is served as request.user, so any change (password
+    # reset, deactivation, profile edits) drops it.
+    if not raw:
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    revoke_tokens(instance.key)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permissions(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version(PERMISSIONS_NAMESPACE)
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_deleted_permissions(sender, **kwargs):
+    # Cascaded deletes of the m2m rows do not send m2m_changed.
+    bump_version(PERMISSIONS_NAMESPACE)
+
+
+@receiver(pre_save, sender=JobPosting)
+def remember_job_posting_state(sender, instance, raw=False, **kwargs):
+    # The stored (user_id, status) and relevance key, diffed after save by the receivers below.
+    instance._previous_state = instance._previous_relevance = None
+    if not raw and not instance._state.adding:
+        row = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list('user_id', 'status', 'is_active', 'skills', 'categories')
+            .first()
+        )
+        if row is not None:
+            instance._previous_state = row[:2]
+            instance._previous_relevance = relevance_key(*row[1:])
+
+
+@receiver(post_save, sender=JobPosting)
+def update_posted_jobs_count(sender, instance, raw=False, **kwargs):
+    if not raw:
+        move_posted_jobs_count(getattr(instance, '_previous_state', None), (instance.user_id, instance.status))
+
+
+@receiver(post_delete, sender=JobPosting)
+def release_posted_jobs_count(sender, instance, **kwargs):
+    move_posted_jobs_count((instance.user_id, instance.status), None)
+
+
+@receiver(post_save, sender=JobPosting)
+def announce_published_job_posting(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+    if not raw and instance.status == 'posted' and (previous is None or previous[1] == 'draft'):
+        dispatch(notify_job_posting_published, str(instance.pk))
+
+
+@receiver(post_save, sender=JobApplication)
+@receiver(post_save, sender=JobInvitation)
+@receiver(post_save, sender=JobOffer)
+def announce_created_job_event(sender, instance, created=False, raw=False, **kwargs):
+    tasks = {
+        JobApplication: notify_application_received,
+        JobInvitation: notify_invitation_sent,
+        JobOffer: notify_offer_made,
+    }
+    if created and not raw:
+        dispatch(tasks[sender], str(instance.pk))
+
+
+@receiver(post_save, sender=Resource)
+def render_image_derivatives(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw and is_image(instance):
+        dispatch(generate_image_derivatives, str(instance.pk))
+
+
+@receiver(pre_save, sender=Notification)
+def remember_notification_status(sender, instance, raw=False, **kwargs):
+    instance._was_unread = False
+    if not raw and not instance._state.adding:
+        instance._was_unread = sender.objects.filter(pk=instance.pk, status='unread').exists()
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, raw=False, **kwargs):
+    if not raw:
+        delta = int(instance.status == 'unread') - int(getattr(instance, '_was_unread', False))
+        adjust_unread_count([instance.user_id], delta)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_unread_notification(sender, instance, **kwargs):
+    if instance.status == 'unread':
+        adjust_unread_count([instance.user_id], -1)
@@ -0,0 +1,122 @@
+"""
+Server-Sent Events endpoint, mounted by workmania.asgi at ``EVENTS_PATH``.
+
+Django 3.2 views cannot stream from an async iterator, so this is a plain
+ASGI app next to Django. It authenticates the API token (``?token=``, since
+``EventSource`` cannot send headers, or the ``Authorization`` header),
+subscribes to the user's channel in core.events and writes each event as it
+arrives. While the connection is idle a comment line goes out every
+``EVENTS_HEARTBEAT_SECONDS`` so proxies keep it open.
+
+Events published by Celery workers only reach this app over Redis, so it
+will not start on the in-process broker unless ``EVENTS_BACKEND`` selects
+that broker on purpose (see core.events).
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.api.authentication import QueryParamAuthentication
+from core.events import InProcessBroker, channel_name, get_broker
+
+RETRY_MILLISECONDS = 3000
+
+
+def _token_from_scope(scope):
+    token = parse_qs(scope.get('query_string', b'').decode()).get(QueryParamAuthentication.query_param_name)
+    if token:
+        return token[0]
+    header = dict(scope.get('headers', ())).get(b'authorization', b'').decode().split()
+    if len(header) == 2 and header[0].lower() == QueryParamAuthentication.keyword.lower():
+        return header[1]
+    return None
+
+
+@sync_to_async
+def authenticate(scope):
+    """Returns the id of the token's user, or None."""
+    key = _token_from_scope(scope)
+    if not key:
+        return None
+    close_old_connections()
+    try:
+        user, _ = QueryParamAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    finally:
+        close_old_connections()
+    return user.pk
+
+
+def format_event(payload):
+    message = json.loads(payload)
+    data = json.dumps(message['data'], separators=(',', ':'))
+    return f"event: {message['event']}\ndata: {data}\n\n".encode()
+
+
+class EventStreamApp:
+
+    def __init__(self):
+        if isinstance(get_broker(), InProcessBroker) and not getattr(settings, 'EVENTS_BACKEND', None):
+            raise ImproperlyConfigured(
+                "EVENTS_REDIS_URL is not set: events published by Celery workers would never reach "
+                "this server. Set it, or set EVENTS_BACKEND = 'core.events.InProcessBroker' to accept that."
+            )
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            return await self.respond(send, 405, {'detail': 'Method not allowed.'})
+        user_id = await authenticate(scope)
+        if user_id is None:
+            return await self.respond(send, 401, {'detail': 'Authentication credentials were not provided.'})
+
+        subscription = await get_broker().subscribe(channel_name(user_id))
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    # Stops nginx from buffering the stream.
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await self.write(send, f'retry: {RETRY_MILLISECONDS}\n\n'.encode())
+            await self.stream(subscription, disconnected, send)
+        finally:
+            disconnected.cancel()
+            await subscription.close()
+
+    async def stream(self, subscription, disconnected, send):
+        heartbeat = getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', 15)
+        while True:
+            next_event = asyncio.ensure_future(subscription.get(heartbeat))
+            await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                next_event.cancel()
+                return
+            payload = next_event.result()
+            await self.write(send, format_event(payload) if payload else b': keep-alive\n\n')
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def write(self, send, body):
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    async def respond(self, send, status, data):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': json.dumps(data).encode()})
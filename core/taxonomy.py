@@ -0,0 +1,104 @@
+"""
+Keeps the Skill/Category many-to-many tables in sync with the comma-separated
+``skills`` and ``categories`` strings on Profile and JobPosting, and builds
+the indexed filters that replace ``icontains`` matching on those strings.
+"""
+from core.models import Category, JobPosting, Profile, Skill
+
+# (string field, m2m field, term model) pairs synced on both models.
+TAXONOMY_FIELDS = (
+    ('skills', 'skill_tags', Skill),
+    ('categories', 'category_tags', Category),
+)
+
+
+def split_terms(raw):
+    """Returns the distinct, non-empty names of a comma-separated string in order."""
+    names = {}
+    for name in (raw or '').split(','):
+        name = name.strip()
+        if name:
+            names.setdefault(Skill.normalize_key(name), name)
+    return names
+
+
+def term_keys(raw):
+    return list(split_terms(raw))
+
+
+def resolve_terms(term_model, names):
+    """
+    Maps ``{key: name}`` to existing terms, creating the missing ones.
+    Returns ``{key: term_id}``.
+    """
+    if not names:
+        return {}
+    existing = dict(term_model.objects.filter(key__in=names).values_list('key', 'id'))
+    missing = [term_model(key=key, name=name) for key, name in names.items() if key not in existing]
+    if missing:
+        term_model.objects.bulk_create(missing, ignore_conflicts=True)
+        existing = dict(term_model.objects.filter(key__in=names).values_list('key', 'id'))
+    return existing
+
+
+def sync_terms(instance, fields=None):
+    """Points the instance's m2m tags at the terms named in its string fields."""
+    for field_name, m2m_name, term_model in TAXONOMY_FIELDS:
+        if fields is not None and field_name not in fields:
+            continue
+        term_ids = resolve_terms(term_model, split_terms(getattr(instance, field_name)))
+        getattr(instance, m2m_name).set(term_ids.values())
+
+
+def backfill_terms(model, chunk_size=1000):
+    """Rebuilds the m2m tags of every ``model`` row from its strings in bulk."""
+    total = 0
+    for field_name, m2m_name, term_model in TAXONOMY_FIELDS:
+        through = getattr(model, m2m_name).through
+        source_column = f'{model._meta.model_name}_id'
+        term_column = f'{term_model._meta.model_name}_id'
+
+        # Null strings are included so rows that lost their tags are cleared.
+        rows = model.objects.values_list('pk', field_name)
+        chunk = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                total += _backfill_chunk(through, term_model, source_column, term_column, chunk)
+                chunk = []
+        total += _backfill_chunk(through, term_model, source_column, term_column, chunk)
+    return total
+
+
+def _backfill_chunk(through, term_model, source_column, term_column, rows):
+    if not rows:
+        return 0
+    parsed = [(pk, split_terms(raw)) for pk, raw in rows]
+    names = {}
+    for _, terms in parsed:
+        names.update(terms)
+    term_ids = resolve_terms(term_model, names)
+
+    through.objects.filter(**{f'{source_column}__in': [pk for pk, _ in parsed]}).delete()
+    links = [
+        through(**{source_column: pk, term_column: term_ids[key]})
+        for pk, terms in parsed for key in terms
+    ]
+    through.objects.bulk_create(links, ignore_conflicts=True)
+    return len(parsed)
+
+
+def job_postings_with_terms(m2m_name, raw):
+    """Ids of job postings tagged with any of the comma-separated terms, as a subquery."""
+    field = JobPosting._meta.get_field(m2m_name)
+    through = field.remote_field.through
+    term_name = field.related_model._meta.model_name
+    return through.objects.filter(**{f'{term_name}__key__in': term_keys(raw)}).values('jobposting_id')
+
+
+def users_with_terms(m2m_name, raw):
+    """Ids of users whose profile is tagged with any of the terms, as a subquery."""
+    field = Profile._meta.get_field(m2m_name)
+    through = field.remote_field.through
+    term_name = field.related_model._meta.model_name
+    return through.objects.filter(**{f'{term_name}__key__in': term_keys(raw)}).values('profile__user_id')
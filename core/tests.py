@@ -1 +1,1563 @@
-
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import uuid
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from requests import Timeout
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import (
+    JobApplication,
+    JobInvitation,
+    JobOffer,
+    JobPosting,
+    Notification,
+    Profile,
+    Resource,
+    SavedFreelancer,
+    SavedJob,
+    Skill,
+    UploadSession,
+    User,
+)
+from core import bulk, events, images, metrics, notifications, uploads
+from core.api import geoip
+from core.api.tasks import generate_image_derivatives
+from core.api.authentication import _cache_key, local_tokens
+from core.api.permissions import CustomPermission, get_permission_codenames
+from core.api.serializers import JobPostingSerializer
+from core.caching import get_version
+from core.conversations import get_or_create_conversation, send_message
+from core.counters import rebuild_job_posting_counters, rebuild_profile_counters
+from core.recommendations import VERSION_NAMESPACE, RelevantJobsIndex, change_key, get_relevant_jobs_index
+from core.sse import EventStreamApp
+
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+# Django aliases tables in subqueries (``"core_jobposting" U0``); plans name the alias.
+TABLE_ALIAS_RE = re.compile(r'"(\w+)" (\w+)')
+
+
+class QueryLog:
+    """``connection.execute_wrapper`` hook that keeps every SELECT with its parameters."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+class ListQueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on every SELECT issued by the list endpoints and
+    fails on a full scan of an application table. Scans of an index (for
+    ORDER BY ... LIMIT) and of the search virtual table are fine.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(email='client@example.com', role='client')
+        cls.freelancer = User.objects.create(email='freelancer@example.com', role='freelancer')
+        Profile.objects.create(user=cls.client_user)
+        Profile.objects.create(user=cls.freelancer, skills='Python', categories='Web', title='Developer')
+        cls.job_posting = JobPosting.objects.create(
+            user=cls.client_user, title='Python developer', description='Django API', skills='Python',
+            categories='Web', status='posted',
+        )
+        JobApplication.objects.create(job_posting=cls.job_posting, user=cls.freelancer, status='accepted')
+        JobInvitation.objects.create(job_posting=cls.job_posting, user=cls.freelancer)
+        JobOffer.objects.create(job_posting=cls.job_posting, user=cls.freelancer)
+        SavedJob.objects.create(user=cls.freelancer, job_posting=cls.job_posting)
+        SavedFreelancer.objects.create(user=cls.client_user, freelancer=cls.freelancer)
+        cls.conversation = get_or_create_conversation(cls.client_user.pk, cls.freelancer.pk)
+        send_message(cls.conversation, cls.client_user.pk, 'Hello')
+        cls.app_tables = set(connection.introspection.table_names())
+
+    def setUp(self):
+        # A cached response would hide the queries behind it, and the relevant
+        # jobs index is loaded once per process rather than per request.
+        cache.clear()
+        get_relevant_jobs_index().load()
+
+    def full_scans(self, user, url):
+        if user:
+            self.client.force_login(user)
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        scans = []
+        with connection.cursor() as cursor:
+            for sql, params in log.queries:
+                aliases = dict((alias, table) for table, alias in TABLE_ALIAS_RE.findall(sql))
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                for row in cursor.fetchall():
+                    match = FULL_SCAN_RE.match(row[-1])
+                    table = match and aliases.get(match.group(1), match.group(1))
+                    if table in self.app_tables:
+                        scans.append(f'{table}: {sql}')
+        return scans
+
+    def assertNoFullScans(self, user, urls):
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.full_scans(user, url), [])
+
+    def test_freelancer_job_groups(self):
+        self.assertNoFullScans(self.freelancer, [
+            f'/api/v1/job_postings/?group={group}'
+            for group in ('all', 'saved', 'relevant', 'applied', 'invited', 'interviewed', 'offered', 'archived')
+        ])
+
+    def test_client_job_groups(self):
+        self.assertNoFullScans(self.client_user, [
+            f'/api/v1/job_postings/?group={group}'
+            for group in ('all', 'posted', 'draft', 'interviewed', 'hired', 'finished')
+        ])
+
+    def test_job_filters(self):
+        self.assertNoFullScans(None, [
+            '/api/v1/job_postings/',
+            '/api/v1/job_postings/?pagination=cursor',
+            '/api/v1/job_postings/?skills=Python',
+            '/api/v1/job_postings/?search=python',
+        ])
+
+    def test_job_applications(self):
+        job_posting_id = self.job_posting.id
+        self.assertNoFullScans(self.client_user, [
+            f'/api/v1/job_postings/{job_posting_id}/job_applications/?group={group}'
+            for group in ('all', 'interviewed', 'offered', 'archived')
+        ])
+
+    def test_freelancer_groups(self):
+        job_posting_id = self.job_posting.id
+        self.assertNoFullScans(self.client_user, [
+            '/api/v1/users/?group=saved',
+            '/api/v1/users/?skills=Python',
+            f'/api/v1/users/?job_posting_id={job_posting_id}&content_type=invitations&group=invited',
+        ] + [
+            f'/api/v1/users/?job_posting_id={job_posting_id}&content_type=proposals&group={group}'
+            for group in ('all', 'interviewed', 'offered', 'archived')
+        ])
+
+    def test_conversations(self):
+        conversation_id = self.conversation.id
+        self.assertNoFullScans(self.freelancer, [
+            '/api/v1/conversations/',
+            f'/api/v1/conversations/{conversation_id}/',
+            f'/api/v1/conversations/{conversation_id}/messages/',
+        ])
+
+
+class ResponseCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        client_user = User.objects.create(email='client@example.com', role='client')
+        for title in ('First', 'Second', 'Third'):
+            JobPosting.objects.create(user=client_user, title=title, status='posted')
+        cls.first = User.objects.create(email='first@example.com', role='freelancer')
+        cls.second = User.objects.create(email='second@example.com', role='freelancer')
+        Profile.objects.create(user=cls.first)
+        Profile.objects.create(user=cls.second)
+        cls.first_token = Token.objects.create(user=cls.first).key
+        cls.second_token = Token.objects.create(user=cls.second).key
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_links_do_not_carry_another_viewers_token(self):
+        first = self.client.get(f'/api/v1/job_postings/?page_size=1&token={self.first_token}').json()
+        self.assertIn(f'token={self.first_token}', first['next'])
+
+        second = self.client.get(
+            '/api/v1/job_postings/?page_size=1', HTTP_AUTHORIZATION=f'Token {self.second_token}'
+        ).json()
+        self.assertEqual(second['results'], first['results'])
+        self.assertNotIn('token=', second['next'])
+
+        third = self.client.get(f'/api/v1/job_postings/?page_size=1&token={self.second_token}').json()
+        self.assertIn(f'token={self.second_token}', third['next'])
+        self.assertNotIn(self.first_token, third['next'])
+
+
+class JobListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        client_user = User.objects.create(email='client@example.com', role='client')
+        JobPosting.objects.create(user=client_user, title='Python developer', skills='Python', status='posted')
+        cls.freelancer = User.objects.create(email='freelancer@example.com', role='freelancer')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.freelancer)
+
+    def test_freelancer_without_profile(self):
+        for group in ('all', 'saved', 'relevant', 'applied'):
+            with self.subTest(group=group):
+                response = self.client.get(f'/api/v1/job_postings/?group={group}')
+                self.assertEqual(response.status_code, 200)
+
+    def test_profile_is_only_read_for_relevant_jobs(self):
+        Profile.objects.create(user=self.freelancer, skills='Python')
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            self.client.get('/api/v1/job_postings/?group=saved')
+        viewer_profile_reads = [
+            sql for sql, params in log.queries
+            if 'FROM "core_profile"' in sql and self.freelancer.pk.hex in map(str, params)
+        ]
+        self.assertEqual(viewer_profile_reads, [])
+
+
+class BulkEndpointTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(email='owner@example.com', role='client')
+        cls.other_client = User.objects.create(email='other@example.com', role='client')
+        cls.freelancers = [
+            User.objects.create(email=f'freelancer{index}@example.com', role='freelancer') for index in range(4)
+        ]
+        cls.job_posting = JobPosting.objects.create(user=cls.owner, title='Python developer', status='posted')
+        cls.other_posting = JobPosting.objects.create(user=cls.other_client, title='Go developer', status='posted')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+    def bulk_invite_url(self, job_posting):
+        return f'/api/v1/job_postings/{job_posting.pk}/job_invitations/bulk_invite/'
+
+    def bulk_status_url(self, job_posting):
+        return f'/api/v1/job_postings/{job_posting.pk}/job_applications/bulk_status/'
+
+    def test_bulk_invite(self):
+        first, second, third, _ = self.freelancers
+        JobInvitation.objects.create(job_posting=self.job_posting, user=first)
+        missing = uuid.uuid4()
+        requested = [second.pk, missing, first.pk, self.other_client.pk, third.pk, second.pk]
+
+        response = self.client.post(
+            self.bulk_invite_url(self.job_posting), {'users': [str(pk) for pk in requested]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(
+            [(result['id'], result['result']) for result in results],
+            [
+                (str(second.pk), 'invited'),
+                (str(missing), 'not_found'),
+                (str(first.pk), 'already_invited'),
+                (str(self.other_client.pk), 'not_found'),
+                (str(third.pk), 'invited'),
+            ],
+        )
+        self.assertEqual(
+            set(JobInvitation.objects.filter(job_posting=self.job_posting).values_list('user', flat=True)),
+            {first.pk, second.pk, third.pk},
+        )
+        self.job_posting.refresh_from_db()
+        self.assertEqual(self.job_posting.invite_count, 3)
+
+    def test_bulk_status(self):
+        pending, other_pending, cancelled, accepted = [
+            JobApplication.objects.create(job_posting=self.job_posting, user=freelancer, status=status)
+            for freelancer, status in zip(self.freelancers, ('pending', 'pending', 'cancelled', 'accepted'))
+        ]
+        elsewhere = JobApplication.objects.create(job_posting=self.other_posting, user=self.freelancers[0])
+        self.job_posting.refresh_from_db()
+        self.assertEqual((self.job_posting.proposal_count, self.job_posting.interview_count), (3, 1))
+
+        requested = [cancelled, pending, elsewhere, other_pending, accepted]
+        response = self.client.post(
+            self.bulk_status_url(self.job_posting),
+            {'ids': [str(application.pk) for application in requested], 'status': 'accepted'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(result['id'], result['result']) for result in response.json()['results']],
+            [
+                (str(cancelled.pk), 'not_allowed'),
+                (str(pending.pk), 'updated'),
+                (str(elsewhere.pk), 'not_found'),
+                (str(other_pending.pk), 'updated'),
+                (str(accepted.pk), 'unchanged'),
+            ],
+        )
+        cancelled.refresh_from_db()
+        elsewhere.refresh_from_db()
+        self.assertEqual((cancelled.status, elsewhere.status), ('cancelled', 'pending'))
+        self.job_posting.refresh_from_db()
+        self.assertEqual((self.job_posting.proposal_count, self.job_posting.interview_count), (3, 3))
+
+        self.client.post(
+            self.bulk_status_url(self.job_posting), {'ids': [str(pending.pk)], 'status': 'rejected'},
+            content_type='application/json',
+        )
+        self.job_posting.refresh_from_db()
+        self.assertEqual((self.job_posting.proposal_count, self.job_posting.interview_count), (3, 2))
+
+    def test_posting_of_another_client(self):
+        application = JobApplication.objects.create(job_posting=self.other_posting, user=self.freelancers[0])
+
+        response = self.client.post(
+            self.bulk_invite_url(self.other_posting), {'users': [str(self.freelancers[1].pk)]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(JobInvitation.objects.filter(job_posting=self.other_posting).exists())
+
+        response = self.client.post(
+            self.bulk_status_url(self.other_posting), {'ids': [str(application.pk)], 'status': 'rejected'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+        application.refresh_from_db()
+        self.assertEqual(application.status, 'pending')
+
+
+class UnreadNotificationCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@example.com', role='freelancer')
+        cls.other = User.objects.create(email='other@example.com', role='freelancer')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertUnreadCount(self, expected):
+        self.assertEqual(notifications.get_unread_count(self.user), expected)
+        self.assertEqual(self.client.get('/api/v1/notifications/unread_count/').json(), {'unread_count': expected})
+        self.assertEqual(Notification.objects.filter(user=self.user, status='unread').count(), expected)
+
+    def test_count_follows_notification_changes(self):
+        self.assertEqual(notifications.notify([self.user.pk, self.other.pk, self.user.pk], 'test', 'Hello'), 2)
+        self.assertUnreadCount(1)
+
+        single = Notification.objects.create(user=self.user, title='Single')
+        Notification.objects.create(user=self.user, title='Already read', status='read')
+        self.assertUnreadCount(2)
+
+        single.status = 'read'
+        single.save()
+        self.assertUnreadCount(1)
+        single.save()
+        self.assertUnreadCount(1)
+
+        single.status = 'unread'
+        single.save()
+        self.assertUnreadCount(2)
+
+        response = self.client.post(
+            '/api/v1/notifications/mark_read/', {'ids': [str(single.pk)]}, content_type='application/json'
+        )
+        self.assertEqual(response.json(), {'updated': 1, 'unread_count': 1})
+        self.assertUnreadCount(1)
+
+        self.assertEqual(notifications.mark_read(self.user), 1)
+        self.assertUnreadCount(0)
+        self.assertEqual(notifications.get_unread_count(self.other), 1)
+
+    def test_deleting_notifications(self):
+        unread = Notification.objects.create(user=self.user, title='Unread')
+        read = Notification.objects.create(user=self.user, title='Read', status='read')
+        Notification.objects.create(user=self.user, title='Kept')
+        self.assertUnreadCount(2)
+
+        self.assertEqual(self.client.delete(f'/api/v1/notifications/{unread.pk}/').status_code, 204)
+        self.assertUnreadCount(1)
+
+        read.delete()
+        self.assertUnreadCount(1)
+
+    def test_rebuild_matches_incremental_count(self):
+        notifications.notify([self.user.pk, self.other.pk], 'test', 'Hello')
+        Notification.objects.create(user=self.user, title='Single')
+        notifications.mark_read(self.other)
+        counts = dict(User.objects.values_list('pk', 'unread_notification_count'))
+
+        User.objects.update(unread_notification_count=0)
+        notifications.rebuild_unread_notification_counts()
+        self.assertEqual(dict(User.objects.values_list('pk', 'unread_notification_count')), counts)
+
+
+class PostedJobsCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create(email='first@example.com', role='client')
+        cls.second = User.objects.create(email='second@example.com', role='client')
+        Profile.objects.create(user=cls.first)
+        Profile.objects.create(user=cls.second)
+
+    def posted_jobs_counts(self):
+        return dict(Profile.objects.values_list('user', 'posted_jobs_count'))
+
+    def assertPostedJobsCounts(self, first, second):
+        self.assertEqual(self.posted_jobs_counts(), {self.first.pk: first, self.second.pk: second})
+
+    def test_count_follows_status_owner_and_delete(self):
+        job_posting = JobPosting.objects.create(user=self.first, title='Draft')
+        JobPosting.objects.create(user=self.first, title='Posted', status='posted')
+        self.assertPostedJobsCounts(1, 0)
+
+        job_posting.status = 'posted'
+        job_posting.save()
+        self.assertPostedJobsCounts(2, 0)
+        job_posting.save()
+        self.assertPostedJobsCounts(2, 0)
+
+        job_posting.status = 'draft'
+        job_posting.save()
+        self.assertPostedJobsCounts(1, 0)
+
+        job_posting.user = self.second
+        job_posting.save()
+        self.assertPostedJobsCounts(1, 0)
+
+        job_posting.status = 'completed'
+        job_posting.save()
+        self.assertPostedJobsCounts(1, 1)
+
+        job_posting.user = self.first
+        job_posting.save()
+        self.assertPostedJobsCounts(2, 0)
+
+        job_posting.delete()
+        self.assertPostedJobsCounts(1, 0)
+        JobPosting.objects.create(user=self.second, title='Draft').delete()
+        self.assertPostedJobsCounts(1, 0)
+
+    def test_rebuild_matches_incremental_count(self):
+        for user, status in ((self.first, 'posted'), (self.first, 'draft'), (self.second, 'cancelled')):
+            JobPosting.objects.create(user=user, title=status, status=status)
+        moved = JobPosting.objects.create(user=self.first, title='Moved', status='posted')
+        moved.user = self.second
+        moved.save()
+        counts = self.posted_jobs_counts()
+        self.assertEqual(counts, {self.first.pk: 1, self.second.pk: 2})
+
+        Profile.objects.update(posted_jobs_count=0)
+        rebuild_profile_counters()
+        self.assertEqual(self.posted_jobs_counts(), counts)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@example.com', role='freelancer')
+        Notification.objects.bulk_create([Notification(user=cls.user, title=str(index)) for index in range(7)])
+        # Rows sharing a timestamp are told apart by id alone.
+        Notification.objects.update(created=timezone.now())
+        cls.expected = [str(pk) for pk in Notification.objects.order_by('-created', '-id').values_list('pk', flat=True)]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def walk(self, url, link):
+        """Follows ``link`` from ``url``; returns the ids of each page and the last page."""
+        pages = []
+        while url:
+            # Bounded, so a cursor that repeats a page fails instead of looping.
+            self.assertLessEqual(len(pages), len(self.expected))
+            body = self.client.get(url).json()
+            pages.append([item['id'] for item in body['results']])
+            url = body[link]
+        return pages, body
+
+    def test_pages_through_equal_timestamps(self):
+        pages, last_page = self.walk('/api/v1/notifications/?pagination=cursor&page_size=2', 'next')
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), self.expected)
+
+        pages, _ = self.walk(last_page['previous'], 'previous')
+        self.assertEqual(sum(reversed(pages), []), self.expected[:-1])
+
+    def test_malformed_cursor(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(payload.encode()).decode()
+
+        for cursor in ('not a cursor', encode('[1'), encode('{"r":0}'), encode('{"p":["yesterday","x"],"r":0}')):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/v1/notifications/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+
+    def test_ranked_lists_refuse_cursors(self):
+        JobPosting.objects.create(user=self.user, title='Python developer', skills='Python', status='posted')
+        Profile.objects.create(user=self.user, skills='Python')
+        get_relevant_jobs_index().load()
+        cache.clear()
+
+        self.assertEqual(self.client.get('/api/v1/job_postings/?pagination=cursor').status_code, 200)
+        for query in ('search=python', 'group=relevant', 'ordering=title'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/v1/job_postings/?pagination=cursor&{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json())
+                self.assertEqual(self.client.get(f'/api/v1/job_postings/?{query}').status_code, 200)
+
+
+class ResumableUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@example.com', role='freelancer')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overridden = override_settings(
+            MEDIA_ROOT=media_root, RESOURCE_UPLOAD_PARTS_DIR=os.path.join(media_root, 'parts')
+        )
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.media_root = media_root
+        self.client.force_login(self.user)
+
+    def start(self, content, name='notes.txt'):
+        response = self.client.post(
+            '/api/v1/resource_uploads/', {'name': name, 'category': 'document', 'byte_size': len(content)}
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def put(self, session_id, chunk, offset):
+        return self.client.put(
+            f'/api/v1/resource_uploads/{session_id}/', chunk, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def upload(self, content, name='notes.txt'):
+        response = self.put(self.start(content, name), content, 0)
+        self.assertEqual(response.status_code, 200)
+        return Resource.objects.get(pk=response.json()['resource']['id'])
+
+    def stored_files(self):
+        return [
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(os.path.join(self.media_root, 'resources')) for name in names
+        ]
+
+    def test_last_chunk_creates_the_resource(self):
+        session_id = self.start(b'helloworld')
+
+        response = self.put(session_id, b'hello', 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['received_bytes'], response.json()['resource']), (5, None))
+
+        for offset in (0, 7):
+            with self.subTest(offset=offset):
+                response = self.put(session_id, b'world', offset)
+                self.assertEqual(response.status_code, 409)
+                self.assertEqual(response.json()['received_bytes'], 5)
+
+        response = self.put(session_id, b'world', 5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['received_bytes'], 10)
+        resource = Resource.objects.get(pk=response.json()['resource']['id'])
+        self.assertEqual(resource.content_hash, hashlib.sha256(b'helloworld').hexdigest())
+        self.assertEqual((resource.user, resource.byte_size), (self.user, 10))
+        with open(os.path.join(self.media_root, uploads.content_name(resource.content_hash)), 'rb') as f:
+            self.assertEqual(f.read(), b'helloworld')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'parts')), [])
+
+        self.assertEqual(self.put(session_id, b'!', 10).status_code, 409)
+        self.assertEqual(Resource.objects.count(), 1)
+
+    def test_losing_writer_leaves_the_part_alone(self):
+        session_id = self.start(b'helloworld')
+        stale = UploadSession.objects.get(pk=session_id)
+        self.put(session_id, b'hello', 0)
+
+        with self.assertRaises(uploads.UploadOffsetMismatch) as raised:
+            uploads.append_chunk(stale, io.BytesIO(b'XXXXX'), 0, 5)
+        self.assertEqual(raised.exception.received_bytes, 5)
+        with open(uploads.part_path(stale), 'rb') as part:
+            self.assertEqual(part.read(), b'hello')
+
+        self.put(session_id, b'world', 5)
+        self.assertEqual(Resource.objects.get().content_hash, hashlib.sha256(b'helloworld').hexdigest())
+
+    def test_repeated_content_is_stored_once(self):
+        first = self.upload(b'same content')
+        second = self.upload(b'same content')
+        response = self.client.post(
+            '/api/v1/resources/', {'file': SimpleUploadedFile('notes.txt', b'same content'), 'category': 'document'}
+        )
+        self.assertEqual(response.status_code, 200)
+        third = Resource.objects.get(pk=response.json()['id'])
+
+        self.assertEqual(len({first.pk, second.pk, third.pk}), 3)
+        self.assertEqual({first.file, second.file, third.file}, {first.file})
+        self.assertEqual(self.stored_files(), [uploads.content_name(first.content_hash)])
+
+        self.upload(b'other content')
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_writers_racing_on_the_same_content(self):
+        first = self.upload(b'same content', 'notes.txt')
+        # The second writer checked before the first one's file appeared.
+        exists = FileSystemStorage.exists
+        checks = []
+
+        def exists_after_the_first_check(storage, name):
+            checks.append(name)
+            return len(checks) > 1 and exists(storage, name)
+
+        with mock.patch.object(FileSystemStorage, 'exists', exists_after_the_first_check):
+            second = self.upload(b'same content', 'notes.pdf')
+        self.assertGreater(len(checks), 1)
+        self.assertEqual(first.file, second.file)
+        self.assertEqual(self.stored_files(), [uploads.content_name(first.content_hash)])
+        self.assertEqual(os.path.basename(self.stored_files()[0]), first.content_hash)
+
+
+@override_settings(
+    GEOIP_RANGES_FILE=None, GEOIP_REMOTE_FALLBACK=True, GEOIP_CACHE_TIMEOUT=300, GEOIP_MISS_CACHE_TIMEOUT=200,
+    GEOIP_ERROR_CACHE_TIMEOUT=10,
+)
+class GeoIPCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def remote_response(self, ip):
+        responses = {
+            '8.8.8.8': mock.Mock(status_code=200, json=lambda: {'country_name': 'United States', 'city': 'Mountain View'}),
+            '1.1.1.1': mock.Mock(status_code=404),
+            '9.9.9.9': mock.Mock(status_code=200, json=lambda: {'error': True, 'reason': 'RateLimited'}),
+            '4.4.4.4': mock.Mock(status_code=503),
+        }
+        if ip not in responses:
+            raise Timeout()
+        return responses[ip]
+
+    def test_failed_lookups_are_cached_briefly(self):
+        session = mock.Mock()
+        session.get.side_effect = lambda url, timeout: self.remote_response(url.split('/')[3])
+        ips = ['8.8.8.8', '1.1.1.1', '9.9.9.9', '4.4.4.4', '208.67.222.222']
+
+        with mock.patch.object(geoip, 'get_session', return_value=session), \
+                mock.patch.object(geoip.cache, 'set_many', wraps=geoip.cache.set_many) as set_many:
+            locations = geoip.resolve_ip_locations(ips)
+
+        self.assertEqual(locations['8.8.8.8']['city'], 'Mountain View')
+        self.assertEqual([ip for ip in ips if locations[ip] is None], ips[1:])
+        timeouts = {
+            key[len(geoip.CACHE_KEY_PREFIX):]: call.kwargs['timeout']
+            for call in set_many.call_args_list for key in call.args[0]
+        }
+        self.assertEqual(
+            timeouts, {'8.8.8.8': 300, '1.1.1.1': 200, '9.9.9.9': 10, '4.4.4.4': 10, '208.67.222.222': 10}
+        )
+
+
+class JobPostingCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(email='owner@example.com', role='client')
+        cls.freelancer = User.objects.create(email='freelancer@example.com', role='freelancer')
+        cls.invited = User.objects.create(email='invited@example.com', role='freelancer')
+        cls.job_posting = JobPosting.objects.create(user=cls.owner, title='Python developer', status='posted')
+
+    def setUp(self):
+        cache.clear()
+
+    def applications_url(self, *parts):
+        return '/'.join([f'/api/v1/job_postings/{self.job_posting.pk}/job_applications', *parts, ''])
+
+    def counters(self):
+        return JobPosting.objects.values_list(*JobPosting.COUNTER_FIELDS).get(pk=self.job_posting.pk)
+
+    def assertCounters(self, proposal_count, interview_count, invite_count):
+        counters = self.counters()
+        self.assertEqual(counters, (proposal_count, interview_count, invite_count))
+        rebuild_job_posting_counters()
+        self.assertEqual(self.counters(), counters)
+
+    def set_status(self, application_id, status):
+        return self.client.patch(
+            self.applications_url(application_id), {'status': status}, content_type='application/json'
+        )
+
+    def test_stale_instance_save_keeps_counters(self):
+        stale = JobPosting.objects.get(pk=self.job_posting.pk)
+        JobApplication.objects.create(job_posting=self.job_posting, user=self.freelancer)
+        self.assertEqual(JobPosting.objects.get(pk=self.job_posting.pk).proposal_count, 1)
+
+        stale.title = 'Django developer'
+        stale.save()
+        self.job_posting.refresh_from_db()
+        self.assertEqual((self.job_posting.title, self.job_posting.proposal_count), ('Django developer', 1))
+
+        self.client.force_login(self.owner)
+        response = self.client.patch(
+            f'/api/v1/job_postings/{self.job_posting.pk}/', {'title': 'Go developer'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertCounters(1, 0, 0)
+
+    def test_apply_invite_status_change_and_delete(self):
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            f'/api/v1/job_postings/{self.job_posting.pk}/job_invitations/',
+            {'job_posting': str(self.job_posting.pk), 'user': str(self.invited.pk)},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertCounters(0, 0, 1)
+
+        self.client.force_login(self.freelancer)
+        response = self.client.post(self.applications_url(), {'cover_letter': 'Hi'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        application_id = response.json()['id']
+        self.assertCounters(1, 0, 1)
+
+        # An invited freelancer's application goes straight to an interview.
+        self.client.force_login(self.invited)
+        self.client.post(self.applications_url(), {'cover_letter': 'Hello'}, content_type='application/json')
+        self.assertCounters(2, 1, 1)
+
+        self.client.force_login(self.freelancer)
+        self.assertEqual(self.set_status(application_id, 'accepted').status_code, 200)
+        self.assertCounters(2, 2, 1)
+        self.set_status(application_id, 'cancelled')
+        self.assertCounters(1, 1, 1)
+        self.set_status(application_id, 'pending')
+        self.assertCounters(2, 1, 1)
+
+        self.assertEqual(self.client.delete(self.applications_url(application_id)).status_code, 204)
+        self.assertCounters(1, 1, 1)
+        JobInvitation.objects.get(job_posting=self.job_posting).delete()
+        self.assertCounters(1, 1, 0)
+
+
+class TokenCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@example.com', password='old-password')
+        cls.key = Token.objects.create(user=cls.user).key
+
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+
+    def get(self, path='/api/v1/notifications/unread_count/', **extra):
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Token {self.key}', **extra)
+
+    def token_queries(self, path='/api/v1/notifications/unread_count/'):
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            self.assertEqual(self.get(path).status_code, 200)
+        return [sql for sql, _ in log.queries if 'authtoken_token' in sql]
+
+    def test_cache_hit_skips_the_token_lookup(self):
+        self.assertEqual(len(self.token_queries()), 1)
+        self.assertEqual(self.token_queries(), [])
+        local_tokens.clear()
+        self.assertEqual(self.token_queries(), [])
+
+    def test_cached_entry_holds_no_password(self):
+        self.get()
+        cached = cache.get(_cache_key(self.key))
+        self.assertIsNotNone(cached)
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(cached))
+        self.assertEqual(self.get('/api/v1/users/me/').json()['email'], 'user@example.com')
+
+    def test_full_save_of_the_cached_user_keeps_other_columns(self):
+        self.get()
+        notifications.notify([self.user.pk], 'test', 'Hello')
+        response = self.client.delete('/api/v1/users/delete/', HTTP_AUTHORIZATION=f'Token {self.key}')
+        self.assertEqual(response.status_code, 200)
+        modified = self.user.modified
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.is_active, self.user.unread_notification_count), (False, 1))
+        self.assertGreater(self.user.modified, modified)
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_password_change_revokes_and_keeps_other_columns(self):
+        self.get()
+        notifications.notify([self.user.pk], 'test', 'Hello')
+        response = self.client.post(
+            '/rest-auth/password/change/',
+            {'old_password': 'old-password', 'new_password1': 'N3w-passw0rd!', 'new_password2': 'N3w-passw0rd!'},
+            HTTP_AUTHORIZATION=f'Token {self.key}',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache.get(_cache_key(self.key)))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('N3w-passw0rd!'))
+        self.assertEqual(self.user.unread_notification_count, 1)
+
+    def test_logout_revokes_the_token(self):
+        self.get()
+        response = self.client.post('/rest-auth/logout/', HTTP_AUTHORIZATION=f'Token {self.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_token_deleted_while_cached(self):
+        self.get()
+        Token.objects.filter(key=self.key).delete()
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_user_change_is_seen_at_once(self):
+        self.get()
+        User.objects.get(pk=self.user.pk).save()
+        self.assertIsNone(cache.get(_cache_key(self.key)))
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.get().status_code, 401)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(email='owner@example.com', role='client')
+        cls.freelancer = User.objects.create(email='freelancer@example.com', role='freelancer')
+        cls.viewer = User.objects.create(email='viewer@example.com', role='freelancer')
+        for user in (cls.owner, cls.freelancer, cls.viewer):
+            Profile.objects.create(user=user)
+        cls.job_posting = JobPosting.objects.create(user=cls.owner, title='Python developer', status='posted')
+        cls.other_posting = JobPosting.objects.create(user=cls.owner, title='Go developer', status='posted')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.viewer)
+
+    def assertRevalidates(self, url, etag, status_code):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status_code)
+        return response['ETag']
+
+    def unrelated_writes(self):
+        stranger = User.objects.create(email=f'stranger{User.objects.count()}@example.com', role='client')
+        Profile.objects.create(user=stranger)
+        JobPosting.objects.create(user=stranger, title='Draft')
+        JobApplication.objects.create(job_posting=self.other_posting, user=self.freelancer)
+        SavedJob.objects.create(user=self.freelancer, job_posting=self.job_posting)
+
+    def test_job_posting_detail(self):
+        url = f'/api/v1/job_postings/{self.job_posting.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.unrelated_writes()
+        self.assertRevalidates(url, etag, 304)
+
+        application = JobApplication.objects.create(job_posting=self.job_posting, user=self.freelancer)
+        etag = self.assertRevalidates(url, etag, 200)
+        self.assertRevalidates(url, etag, 304)
+
+        # Bulk invitations send no signals and move the counter with F().
+        bulk.invite_freelancers(self.job_posting, [self.viewer.pk])
+        etag = self.assertRevalidates(url, etag, 200)
+
+        Profile.objects.get(user=self.freelancer).save()
+        etag = self.assertRevalidates(url, etag, 200)
+
+        application.delete()
+        etag = self.assertRevalidates(url, etag, 200)
+
+        SavedJob.objects.create(user=self.viewer, job_posting=self.job_posting)
+        self.assertRevalidates(url, etag, 200)
+
+    def test_job_posting_list(self):
+        url = '/api/v1/job_postings/'
+        etag = self.client.get(url)['ETag']
+        User.objects.create(email='stranger@example.com', role='client')
+        Notification.objects.create(user=self.owner, title='Hello')
+        self.assertRevalidates(url, etag, 304)
+
+        Profile.objects.get(user=self.owner).save()
+        self.assertRevalidates(url, etag, 200)
+
+    def test_user_detail(self):
+        url = f'/api/v1/users/{self.owner.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.unrelated_writes()
+        self.assertRevalidates(url, etag, 304)
+
+        JobPosting.objects.create(user=self.owner, title='Rust developer', status='posted')
+        self.assertRevalidates(url, etag, 200)
+
+
+@override_settings(RELEVANT_JOBS_REFRESH_SECONDS=0, RELEVANT_JOBS_BACKGROUND_REBUILD=False)
+class RelevantJobsIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(email='client@example.com', role='client')
+        Profile.objects.create(user=cls.client_user)
+
+    def setUp(self):
+        cache.clear()
+        # Stands in for the index of another worker process.
+        self.other = RelevantJobsIndex()
+        self.other.load()
+
+    def version(self):
+        return get_version(VERSION_NAMESPACE)
+
+    def recommended(self, *skills):
+        terms = [('skill', Skill.objects.get(key=Skill.normalize_key(skill)).pk) for skill in skills]
+        return [posting_id for posting_id, _ in self.other.top_k(terms, 10)]
+
+    def test_only_relevance_changes_are_published(self):
+        start = self.version()
+        draft = JobPosting.objects.create(user=self.client_user, title='Draft', skills='Rust')
+        draft.title = 'Rust developer'
+        draft.save()
+        self.assertEqual(self.version(), start)
+
+        draft.status = 'posted'
+        draft.save()
+        self.assertEqual(self.version(), start + 1)
+        draft.description = 'Async services'
+        draft.skills = 'rust'
+        draft.save()
+        self.assertEqual(self.version(), start + 1)
+
+        draft.skills = 'Rust, Go'
+        draft.save()
+        self.assertEqual(self.version(), start + 2)
+        draft.status = 'completed'
+        draft.save()
+        self.assertEqual(self.version(), start + 3)
+        draft.delete()
+        self.assertEqual(self.version(), start + 3)
+
+    def test_other_process_replays_changes_without_rebuilding(self):
+        job_posting = JobPosting.objects.create(user=self.client_user, title='Rust', skills='Rust', status='posted')
+        with mock.patch.object(RelevantJobsIndex, '_build', side_effect=AssertionError('rebuilt')):
+            self.assertEqual(self.recommended('Rust'), [job_posting.pk])
+
+            job_posting.skills = 'Go'
+            job_posting.save()
+            self.assertEqual(self.recommended('Rust'), [])
+            self.assertEqual(self.recommended('Go'), [job_posting.pk])
+
+            job_posting.delete()
+            self.assertEqual(self.recommended('Go'), [])
+
+    def test_lost_change_is_rebuilt_from_the_database(self):
+        job_posting = JobPosting.objects.create(user=self.client_user, title='Rust', skills='Rust', status='posted')
+        cache.delete(change_key(self.version()))
+        # The first miss may be a publisher still writing its entry.
+        self.assertEqual(self.recommended('Rust'), [])
+        self.assertEqual(self.recommended('Rust'), [job_posting.pk])
+
+
+@override_settings(METRICS_TOKEN='scrape-token', METRICS_SAMPLE_RATE=1.0)
+class MetricsEndpointTests(TestCase):
+
+    def setUp(self):
+        for metric in metrics.REGISTRY:
+            metric.clear()
+        self.client.force_login(User.objects.create(email='client@example.com', role='client'))
+
+    def scrape(self, **headers):
+        return self.client.get('/metrics', **headers)
+
+    def test_exposition(self):
+        self.assertEqual(self.client.get('/api/v1/job_postings/').status_code, 200)
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE workmania_http_requests_total counter', lines)
+        self.assertIn('workmania_http_requests_total{route="job_postings-list",method="GET",status="200"} 1', lines)
+        labels = 'route="job_postings-list",method="GET"'
+        for histogram in ('workmania_http_request_duration_seconds', 'workmania_serializer_duration_seconds'):
+            self.assertIn(f'{histogram}_bucket{{{labels},le="+Inf"}} 1', lines)
+            self.assertIn(f'{histogram}_count{{{labels}}} 1', lines)
+        # Scrapes are not counted themselves.
+        self.assertNotIn('route="metrics"', response.content.decode())
+
+    def test_requires_the_bearer_token(self):
+        self.assertEqual(self.scrape().status_code, 404)
+        self.assertEqual(self.scrape(REMOTE_ADDR='127.0.0.1').status_code, 404)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Token scrape-token').status_code, 404)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+
+@override_settings(EVENTS_BACKEND='core.events.InProcessBroker', EVENTS_HEARTBEAT_SECONDS=0.05)
+class EventStreamTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@example.com', role='freelancer')
+        cls.other = User.objects.create(email='other@example.com', role='freelancer')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.addCleanup(events.get_broker.cache_clear)
+        # Connections are managed by the test case, not per stream.
+        patcher = mock.patch('core.sse.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def open_stream(self, query_string=b'', until=lambda body: True):
+        """Runs the app until ``until(body)`` holds, then disconnects; returns (status, body)."""
+        received = asyncio.Queue()
+        messages = []
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/v1/events/', 'query_string': query_string, 'headers': []}
+
+        async def send(message):
+            messages.append(message)
+
+        def body():
+            return b''.join(message.get('body', b'') for message in messages[1:]).decode()
+
+        app = asyncio.ensure_future(EventStreamApp()(scope, received.get, send))
+        for _ in range(200):
+            if app.done() or (messages and until(body())):
+                break
+            await asyncio.sleep(0.01)
+        await received.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(app, 1)
+        return messages[0]['status'], body()
+
+    async def test_requires_a_valid_token(self):
+        self.assertEqual((await self.open_stream())[0], 401)
+        self.assertEqual((await self.open_stream(b'token=wrong'))[0], 401)
+        status, body = await self.open_stream(f'token={self.token.key}'.encode())
+        self.assertEqual(status, 200)
+        self.assertTrue(body.startswith('retry: '))
+
+    async def test_streams_only_the_users_events(self):
+        def publish_once_subscribed(body):
+            if body and not published:
+                events.get_broker().publish([
+                    (events.channel_name(self.other.pk), events.encode_event('notification', {'title': 'Theirs'})),
+                    (events.channel_name(self.user.pk), events.encode_event('notification', {'title': 'Mine'})),
+                ])
+                published.append(True)
+            return 'event:' in body
+
+        published = []
+        status, body = await self.open_stream(f'token={self.token.key}'.encode(), publish_once_subscribed)
+        self.assertEqual(status, 200)
+        self.assertIn('event: notification\ndata: {"title":"Mine"}\n\n', body)
+        self.assertNotIn('Theirs', body)
+
+    async def test_idle_stream_sends_keep_alive_comments(self):
+        status, body = await self.open_stream(f'token={self.token.key}'.encode(), lambda body: ': keep-alive' in body)
+        self.assertEqual(status, 200)
+        self.assertIn(': keep-alive\n\n', body)
+
+    async def test_redis_streams_share_one_pubsub_connection(self):
+        class PubSub:
+            def __init__(self):
+                self.channels = []
+                self.messages = asyncio.Queue()
+
+            async def subscribe(self, *channels):
+                self.channels += channels
+
+            async def unsubscribe(self, channel):
+                self.channels.remove(channel)
+                await self.messages.put(None)
+
+            async def get_message(self, timeout):
+                return await self.messages.get()
+
+        pubsub = PubSub()
+        client = mock.Mock(**{'pubsub.return_value': pubsub})
+        broker = events.RedisBroker('redis://events')
+        with mock.patch('redis.asyncio.Redis.from_url', return_value=client):
+            first = await broker.subscribe(events.channel_name(self.user.pk))
+            second = await broker.subscribe(events.channel_name(self.user.pk))
+            other = await broker.subscribe(events.channel_name(self.other.pk))
+        client.pubsub.assert_called_once()
+        self.assertEqual(pubsub.channels, [events.channel_name(self.user.pk), events.channel_name(self.other.pk)])
+
+        channel = events.channel_name(self.user.pk).encode()
+        await pubsub.messages.put({'type': 'message', 'channel': channel, 'data': b'payload'})
+        self.assertEqual([await first.get(1), await second.get(1)], ['payload', 'payload'])
+        self.assertIsNone(await other.get(0.01))
+
+        await first.close()
+        self.assertEqual(len(pubsub.channels), 2)
+        await second.close()
+        await other.close()
+        self.assertEqual(pubsub.channels, [])
+        await asyncio.wait_for(broker._reader, 1)
+
+    def test_refuses_the_implicit_in_process_broker(self):
+        with override_settings(EVENTS_BACKEND=None, EVENTS_REDIS_URL=None):
+            events.get_broker.cache_clear()
+            with self.assertRaises(ImproperlyConfigured):
+                EventStreamApp()
+
+
+class TaxonomyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(email='client@example.com', role='client')
+        Profile.objects.create(user=cls.client_user)
+        cls.java = JobPosting.objects.create(user=cls.client_user, title='Java', skills='Java, Spring', status='posted')
+        cls.javascript = JobPosting.objects.create(
+            user=cls.client_user, title='JavaScript', skills='JavaScript', status='posted',
+        )
+        cls.java_developer = User.objects.create(email='java@example.com', role='freelancer')
+        cls.javascript_developer = User.objects.create(email='javascript@example.com', role='freelancer')
+        Profile.objects.create(user=cls.java_developer, skills=' JAVA ')
+        Profile.objects.create(user=cls.javascript_developer, skills='javascript, Node')
+        # Listed in the freelancer search.
+        Profile.objects.exclude(user=cls.client_user).update(visibility_status='public', completion_percentage=100)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.client_user)
+
+    def listed(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.json()['results']}
+
+    def tags(self, instance):
+        return set(instance.skill_tags.values_list('key', flat=True))
+
+    def test_skills_filter_matches_whole_terms(self):
+        self.assertEqual(self.listed('/api/v1/job_postings/?skills=Java'), {str(self.java.pk)})
+        self.assertEqual(
+            self.listed('/api/v1/job_postings/?skills=java,javascript'), {str(self.java.pk), str(self.javascript.pk)},
+        )
+        self.assertEqual(
+            self.listed('/api/v1/users/?role=freelancer&skills=Java'), {str(self.java_developer.pk)},
+        )
+
+    def test_names_are_normalized_to_one_term(self):
+        self.assertEqual(Skill.objects.filter(key='java').count(), 1)
+        self.assertEqual(self.tags(self.java_developer.profile), {'java'})
+        self.assertEqual(self.tags(self.java), {'java', 'spring'})
+        self.assertEqual(self.listed('/api/v1/job_postings/?skills=%20JAVA%20'), {str(self.java.pk)})
+
+        self.java.skills = 'Spring,spring , '
+        self.java.save()
+        self.assertEqual(self.tags(self.java), {'spring'})
+
+    def test_backfill_rebuilds_and_clears_tags(self):
+        JobPosting.skill_tags.through.objects.all().delete()
+        Profile.objects.filter(user=self.javascript_developer).update(skills=None)
+        out = io.StringIO()
+        call_command('backfill_taxonomy', chunk_size=1, stdout=out)
+
+        self.assertIn('Taxonomy backfill complete.', out.getvalue())
+        self.assertEqual(self.tags(self.java), {'java', 'spring'})
+        self.assertEqual(self.tags(self.javascript), {'javascript'})
+        self.assertEqual(self.tags(self.java_developer.profile), {'java'})
+        self.assertEqual(self.tags(Profile.objects.get(user=self.javascript_developer)), set())
+
+
+class JobPostingListSerializerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create(email='viewer@example.com', role='freelancer')
+        cls.freelancer = User.objects.create(email='freelancer@example.com', role='freelancer')
+        owners = [User.objects.create(email=f'client{index}@example.com', role='client') for index in range(2)]
+        for user in (cls.viewer, cls.freelancer, *owners):
+            Profile.objects.create(user=user, title=user.email)
+        cls.job_postings = [
+            JobPosting.objects.create(user=owners[index % 2], title=f'Posting {index}', status='posted')
+            for index in range(3)
+        ]
+        first, second, third = cls.job_postings
+        SavedJob.objects.create(user=cls.viewer, job_posting=first)
+        SavedFreelancer.objects.create(user=cls.viewer, freelancer=owners[0])
+        for job_posting in (first, second):
+            JobApplication.objects.create(job_posting=job_posting, user=cls.viewer)
+            JobApplication.objects.create(job_posting=job_posting, user=cls.freelancer, status='accepted')
+        JobInvitation.objects.create(job_posting=third, user=cls.viewer)
+        JobInvitation.objects.create(job_posting=second, user=cls.viewer, status='declined')
+        JobOffer.objects.create(job_posting=second, user=cls.viewer)
+
+    def context(self, query=''):
+        request = APIRequestFactory().get(f'/api/v1/job_postings/{query}')
+        force_authenticate(request, user=self.viewer)
+        request = Request(request)
+        request.user = self.viewer
+        return {'request': request}
+
+    def test_list_matches_per_object_output(self):
+        for query in ('', '?expand=user,my_application,job_applications', '?fields=id,is_saved,my_offer'):
+            with self.subTest(query=query):
+                per_object = [
+                    JobPostingSerializer(job_posting, context=self.context(query)).data
+                    for job_posting in JobPosting.objects.order_by('pk')
+                ]
+                listed = JobPostingSerializer(JobPosting.objects.order_by('pk'), many=True, context=self.context(query))
+                self.assertEqual(listed.data, per_object)
+
+    def test_list_queries_do_not_grow_with_the_page(self):
+        # Postings, owners, their profiles (none has an avatar), applications,
+        # invitations, offers, and the viewer's saved jobs, saved owners,
+        # applications, invitations and offers.
+        with self.assertNumQueries(11):
+            JobPostingSerializer(JobPosting.objects.all(), many=True, context=self.context()).data
+        for index in range(3):
+            job_posting = JobPosting.objects.create(user=self.freelancer, title=f'More {index}', status='posted')
+            JobApplication.objects.create(job_posting=job_posting, user=self.viewer)
+        with self.assertNumQueries(11):
+            JobPostingSerializer(JobPosting.objects.all(), many=True, context=self.context()).data
+
+
+class JobApplicationListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(email='owner@example.com', role='client')
+        cls.job_posting = JobPosting.objects.create(user=cls.owner, title='Python developer', status='posted')
+        for index in range(2):
+            freelancer = User.objects.create(email=f'freelancer{index}@example.com', role='freelancer')
+            JobApplication.objects.create(job_posting=cls.job_posting, user=freelancer)
+        cls.url = f'/api/v1/job_postings/{cls.job_posting.pk}/job_applications/'
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def rows(self, query=''):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_postings_by_default(self):
+        rows = self.rows()['results']
+        self.assertEqual(len(rows), 2)
+        # The full posting serializer renders its relations; the summary does not.
+        self.assertIn('job_applications', rows[0]['job_posting'])
+        self.assertNotIn('included', self.rows('?shared=1'))
+
+    def test_summary_view(self):
+        rows = self.rows('?view=summary')['results']
+        self.assertEqual(rows[0]['job_posting']['id'], str(self.job_posting.pk))
+        self.assertNotIn('job_applications', rows[0]['job_posting'])
+
+        body = self.rows('?view=summary&shared=1')
+        self.assertEqual([row['job_posting'] for row in body['results']], [str(self.job_posting.pk)] * 2)
+        self.assertEqual(list(body['included']['job_postings']), [str(self.job_posting.pk)])
+
+    def test_unpaginated_summary_carries_included(self):
+        with mock.patch('core.api.views.JobApplicationViewSet.pagination_class', None):
+            self.assertEqual(len(self.rows('?view=summary')), 2)
+            body = self.rows('?view=summary&shared=1')
+        self.assertEqual(len(body['results']), 2)
+        self.assertEqual(list(body['included']['job_postings']), [str(self.job_posting.pk)])
+
+
+class SparseFieldsetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(email='owner@example.com', role='client')
+        cls.freelancer = User.objects.create(email='freelancer@example.com', role='freelancer')
+        Profile.objects.create(user=cls.owner, title='Client')
+        Profile.objects.create(user=cls.freelancer)
+        cls.job_posting = JobPosting.objects.create(user=cls.owner, title='Python developer', status='posted')
+        JobApplication.objects.create(job_posting=cls.job_posting, user=cls.freelancer)
+        JobInvitation.objects.create(job_posting=cls.job_posting, user=cls.freelancer)
+        JobOffer.objects.create(job_posting=cls.job_posting, user=cls.freelancer)
+
+    def setUp(self):
+        cache.clear()
+
+    def results(self, query):
+        response = self.client.get(f'/api/v1/job_postings/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_pruned_fields_cost_no_queries(self):
+        # The count, the page and the validators of the ETag; nothing is
+        # loaded for the fields that are left out.
+        with self.assertNumQueries(3):
+            results = self.results('fields=id,title')
+        self.assertEqual(results, [{'id': str(self.job_posting.pk), 'title': 'Python developer'}])
+
+        # Unexpanded, the owner collapses to its id and the other relations
+        # are left out; only the expanded offers are loaded.
+        cache.clear()
+        with self.assertNumQueries(4):
+            item, = self.results('expand=job_offers')
+        self.assertEqual(item['user'], str(self.owner.pk))
+        self.assertNotIn('job_applications', item)
+        self.assertEqual([offer['user'] for offer in item['job_offers']], [str(self.freelancer.pk)])
+
+    def test_expanded_fields(self):
+        item, = self.results('fields=id,user.email,user.profile.title,job_offers')
+        self.assertEqual(set(item), {'id', 'user', 'job_offers'})
+        self.assertEqual(item['user'], {
+            'id': str(self.owner.pk), 'email': 'owner@example.com',
+            'profile': {'id': str(self.owner.profile.pk), 'title': 'Client'},
+        })
+        self.assertEqual([offer['user'] for offer in item['job_offers']], [str(self.freelancer.pk)])
+
+        cache.clear()
+        item, = self.results('expand=user')
+        self.assertIsInstance(item['user'], dict)
+        self.assertIn('title', item)
+        self.assertNotIn('job_offers', item)
+
+
+class PermissionCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='member@example.com', role='client')
+        cls.group = Group.objects.create(name='Editors')
+        cls.view = Permission.objects.get(codename='view_jobposting')
+        cls.change = Permission.objects.get(codename='change_jobposting')
+
+    def setUp(self):
+        cache.clear()
+
+    def codenames(self):
+        # A fresh instance each time, so Django's per-instance cache plays no part.
+        return get_permission_codenames(User.objects.get(pk=self.user.pk))
+
+    def test_resolved_once_until_a_permission_changes(self):
+        self.user.user_permissions.add(self.view)
+        self.assertEqual(self.codenames(), {'view_jobposting'})
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_permission_codenames(user), {'view_jobposting'})
+
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self.change)
+        self.assertEqual(self.codenames(), {'view_jobposting', 'change_jobposting'})
+
+        self.user.user_permissions.remove(self.view)
+        self.assertEqual(self.codenames(), {'change_jobposting'})
+
+        self.group.delete()
+        self.assertEqual(self.codenames(), set())
+
+    def test_superuser_and_inactive_state(self):
+        self.assertEqual(self.codenames(), set())
+        User.objects.filter(pk=self.user.pk).update(is_superuser=True)
+        self.assertIn('change_jobposting', self.codenames())
+        User.objects.filter(pk=self.user.pk).update(is_superuser=False, is_active=False)
+        self.assertEqual(self.codenames(), set())
+
+    def test_custom_permission_follows_grants(self):
+        permission = CustomPermission({'PUT': ['change_jobposting']})
+
+        def allowed():
+            return permission.has_permission(mock.Mock(method='PUT', user=User.objects.get(pk=self.user.pk)), None)
+
+        self.assertFalse(allowed())
+        self.user.user_permissions.add(self.change)
+        self.assertTrue(allowed())
+        self.user.user_permissions.clear()
+        self.assertFalse(allowed())
+
+
+class ProfilePartialSaveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='freelancer@example.com', role='freelancer')
+        cls.profile = Profile.objects.create(user=cls.user, title='Developer', languages={'english': 'fluent'})
+
+    def written_columns(self, profile):
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "core_profile"')]
+        self.assertEqual(len(updates), 1)
+        return set(re.findall(r'"(\w+)" = ', updates[0].split(' WHERE ')[0]))
+
+    def test_only_changed_columns_are_written(self):
+        profile = Profile.objects.get(pk=self.profile.pk)
+        profile.phone = '555-0100'
+        self.assertEqual(self.written_columns(profile), {'phone', 'modified'})
+
+        profile.description = 'Django and DRF'
+        self.assertEqual(self.written_columns(profile), {'description', 'completion_percentage', 'modified'})
+        self.assertEqual(Profile.objects.get(pk=profile.pk).completion_percentage, 20)
+
+        profile.languages['english'] = 'native'
+        self.assertEqual(self.written_columns(profile), {'languages', 'modified'})
+        self.assertEqual(self.written_columns(profile), {'modified'})
+
+    def test_concurrent_edits_of_other_columns_survive(self):
+        first = Profile.objects.get(pk=self.profile.pk)
+        second = Profile.objects.get(pk=self.profile.pk)
+        first.city = 'Lisbon'
+        first.save()
+        second.title = 'Senior developer'
+        second.save()
+
+        profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertEqual((profile.city, profile.title), ('Lisbon', 'Senior developer'))
+
+    def test_recompute_command_fixes_stale_scores(self):
+        Profile.objects.filter(pk=self.profile.pk).update(completion_percentage=0, skills='Python')
+        out = io.StringIO()
+        call_command('recompute_profile_completion', chunk_size=1, stdout=out)
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).completion_percentage, 25)
+        self.assertIn('updated 1 completion scores', out.getvalue())
+
+
+@override_settings(IMAGE_DERIVATIVE_SIZES=(64, 256, 1024), IMAGE_DERIVATIVE_FORMATS=('webp', 'jpeg'))
+class ImageDerivativeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@example.com', role='freelancer')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overridden = override_settings(MEDIA_ROOT=media_root)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.client.force_login(self.user)
+
+    def png(self, size=(300, 200)):
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def upload(self, content, name='avatar.png'):
+        # The task runs in the test, once the upload's transaction would commit.
+        def run_task(args, **kwargs):
+            generate_image_derivatives(*args)
+
+        with mock.patch.object(generate_image_derivatives, 'apply_async', side_effect=run_task):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    '/api/v1/resources/', {'file': SimpleUploadedFile(name, content), 'category': 'image'}
+                )
+        self.assertEqual(response.status_code, 200)
+        return Resource.objects.get(pk=response.json()['id'])
+
+    def stored_image(self, url):
+        storage = uploads.get_resource_storage()
+        name = url[len(storage.base_url):]
+        with storage.open(name, 'rb') as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+    def test_upload_renders_every_size_and_format(self):
+        resource = self.upload(self.png())
+        self.assertEqual(set(resource.derivatives), {'64', '256', '1024'})
+        for size, formats in resource.derivatives.items():
+            self.assertEqual(set(formats), {'webp', 'jpeg'})
+            for image_format, url in formats.items():
+                image = self.stored_image(url)
+                self.assertEqual(image.format, image_format.upper())
+                # Bounded by the size, never enlarged.
+                self.assertEqual(image.size, {'64': (64, 43), '256': (256, 171), '1024': (300, 200)}[size])
+
+        response = self.client.get(f'/api/v1/resources/{resource.pk}/')
+        self.assertEqual(response.json()['derivatives'], resource.derivatives)
+
+    def test_identical_content_shares_derivatives(self):
+        first = self.upload(self.png())
+        with mock.patch.object(images, 'save_content', wraps=images.save_content) as save_content:
+            second = self.upload(self.png(), name='copy.png')
+        save_content.assert_not_called()
+        self.assertEqual(second.derivatives, first.derivatives)
+
+    def test_undecodable_and_non_image_resources_get_none(self):
+        with mock.patch.object(images, 'open_image') as open_image:
+            self.assertEqual(self.upload(b'not an image', name='notes.txt').derivatives, {})
+        open_image.assert_not_called()
+
+        broken = self.upload(b'not an image', name='broken.png')
+        self.assertEqual(broken.derivatives, {})
+        self.assertEqual(images.generate_derivatives(broken), {})
+
+
+@override_settings(JOB_PRICE_BUCKETS=(0, 100, 500, 1000, 5000))
+class JobFacetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(email='client@example.com', role='client')
+        for title, size, price, compensation_type in (
+            ('Python API', 'small', 50, 'hourly'),
+            ('Python web shop', 'medium', 600, 'fixed_price'),
+            ('Go service', 'large', 6000, 'hourly'),
+        ):
+            JobPosting.objects.create(
+                user=owner, title=title, size=size, price=price, compensation_type=compensation_type, status='posted',
+            )
+        JobPosting.objects.create(user=owner, title='Python draft', size='small', price=50)
+
+    def setUp(self):
+        cache.clear()
+
+    def facets(self, query=''):
+        response = self.client.get(f'/api/v1/job_postings/facets/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            facets = self.facets()
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(facets['size'], {'small': 1, 'medium': 1, 'large': 1})
+        self.assertEqual(facets['compensation_type'], {'fixed_price': 1, 'hourly': 2})
+        self.assertEqual(facets['price'], {'0-100': 1, '100-500': 0, '500-1000': 1, '1000-5000': 0, '5000+': 1})
+        self.assertEqual(sum(facets['duration'].values()), 3)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.facets('?page=2&ordering=title'), facets)
+
+    def test_counts_follow_search(self):
+        facets = self.facets('?search=python')
+        listed = self.client.get('/api/v1/job_postings/?search=python').json()
+        self.assertEqual(facets['total'], listed['count'])
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual(facets['size'], {'small': 1, 'medium': 1, 'large': 0})
+        self.assertEqual(facets['compensation_type'], {'fixed_price': 1, 'hourly': 1})
+
+    def test_cached_counts_follow_writes(self):
+        self.assertEqual(self.facets()['total'], 3)
+        posting = JobPosting.objects.get(title='Python draft')
+        posting.status = 'posted'
+        posting.save()
+        self.assertEqual(self.facets()['total'], 4)
@@ -0,0 +1,196 @@
+"""
+Resource upload pipeline.
+
+Content is stored once per SHA-256 in ``RESOURCE_STORAGE`` (the default
+storage unless set), at ``content_name(content_hash)``: an upload whose
+content is already stored reuses the stored file, whatever it is called.
+Direct multipart uploads are spooled to a temporary file by
+``HashingFileUploadHandler``, which hashes and size-checks each chunk as it
+arrives. Larger files go through an UploadSession: the client appends
+chunks to a part file in ``RESOURCE_UPLOAD_PARTS_DIR`` (shared by every
+worker) and can resume from ``received_bytes`` after a dropped connection.
+The part is hashed and stored once the last byte arrives. Neither path
+holds a whole file in memory.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.http.multipartparser import MultiPartParserError
+from django.template.defaultfilters import filesizeformat
+from django.utils.module_loading import import_string
+
+from core.models import Resource, UploadSession
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadOffsetMismatch(Exception):
+    """A chunk did not start where the session's received bytes end."""
+
+    def __init__(self, received_bytes):
+        super().__init__(f"Expected a chunk at offset {received_bytes}.")
+        self.received_bytes = received_bytes
+
+
+@lru_cache(maxsize=None)
+def get_resource_storage():
+    storage_path = getattr(settings, 'RESOURCE_STORAGE', None)
+    if storage_path:
+        return import_string(storage_path)()
+    return default_storage
+
+
+def human_size(byte_size):
+    return filesizeformat(byte_size).replace('\xa0', ' ')
+
+
+def content_name(content_hash):
+    return f'resources/{content_hash[:2]}/{content_hash}'
+
+
+def save_content(storage, name, content):
+    """
+    Stores ``content`` at ``name`` unless something is there already, and
+    returns ``name``. Names are derived from the content, so whatever is at
+    ``name`` is the same bytes. A copy that lost a race against another
+    writer of the same content and was saved elsewhere is deleted.
+    """
+    if storage.exists(name):
+        return name
+    saved = storage.save(name, content)
+    if saved != name:
+        storage.delete(saved)
+    return name
+
+
+def create_resource(user, content, name, category, content_hash, byte_size):
+    """
+    Records a Resource for ``content`` (a File), writing it to storage only
+    when no stored copy of the same content exists yet.
+    """
+    storage = get_resource_storage()
+    path = save_content(storage, content_name(content_hash), content)
+    return Resource.objects.create(
+        user=user, name=name, category=category, file=storage.url(path), size=human_size(byte_size),
+        content_hash=content_hash, byte_size=byte_size,
+    )
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Spools multipart uploads to a temporary file (never to memory), hashing
+    them on the way and refusing anything over ``RESOURCE_UPLOAD_MAX_SIZE``.
+    Completed files carry a ``content_hash`` attribute.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > settings.RESOURCE_UPLOAD_MAX_SIZE + CHUNK_SIZE:
+            self.refuse()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.received_bytes = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received_bytes += len(raw_data)
+        if self.received_bytes > settings.RESOURCE_UPLOAD_MAX_SIZE:
+            self.refuse()
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_hash = self.hasher.hexdigest()
+        return file
+
+    def refuse(self):
+        raise MultiPartParserError(
+            f"Files over {human_size(settings.RESOURCE_UPLOAD_MAX_SIZE)} need a resumable upload."
+        )
+
+
+def part_path(session):
+    return os.path.join(settings.RESOURCE_UPLOAD_PARTS_DIR, f'{session.pk}.part')
+
+
+def start_upload(user, name, category, byte_size):
+    session = UploadSession.objects.create(user=user, name=name, category=category, byte_size=byte_size)
+    os.makedirs(settings.RESOURCE_UPLOAD_PARTS_DIR, exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def append_chunk(session, stream, offset, length):
+    """
+    Appends up to ``length`` bytes read from ``stream`` at ``offset``, which
+    must equal the bytes received so far; a client that lost track asks for
+    the session and resumes from ``received_bytes``. Whatever arrived before
+    a dropped connection is kept. Finishes the upload with the last byte.
+    """
+    if session.is_complete or offset != session.received_bytes:
+        raise UploadOffsetMismatch(session.received_bytes)
+    length = min(length, session.byte_size - offset)
+
+    # The chunk is spooled first so the slow read from the client happens
+    # outside the transaction below.
+    with tempfile.TemporaryFile() as chunk_file:
+        written = 0
+        while written < length:
+            chunk = stream.read(min(CHUNK_SIZE, length - written))
+            if not chunk:
+                break
+            chunk_file.write(chunk)
+            written += len(chunk)
+        chunk_file.seek(0)
+
+        with transaction.atomic():
+            # The conditional UPDATE is the lock: only one writer can move the
+            # offset on, and it holds the row until its bytes are in the part
+            # file. A concurrent duplicate waits, then matches nothing and
+            # leaves the file alone.
+            moved = UploadSession.objects.filter(pk=session.pk, received_bytes=offset, byte_size__gt=offset).update(
+                received_bytes=offset + written
+            )
+            if moved:
+                with open(part_path(session), 'r+b') as part:
+                    part.seek(offset)
+                    part.truncate()
+                    shutil.copyfileobj(chunk_file, part, CHUNK_SIZE)
+
+    if not moved:
+        session.refresh_from_db()
+        raise UploadOffsetMismatch(session.received_bytes)
+    session.received_bytes = offset + written
+    if session.received_bytes == session.byte_size:
+        finish_upload(session)
+    return session
+
+
+def finish_upload(session):
+    path = part_path(session)
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for chunk in iter(lambda: part.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+        part.seek(0)
+        session.resource = create_resource(
+            session.user, File(part, name=session.name), session.name, session.category,
+            hasher.hexdigest(), session.byte_size,
+        )
+    session.save(update_fields=['resource', 'modified'])
+    os.remove(path)
+
+
+def abort_upload(session):
+    if os.path.exists(part_path(session)):
+        os.remove(part_path(session))
+    session.delete()
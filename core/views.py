@@ -1,12 +1,29 @@
+import hmac
 from pathlib import Path
 
 from django.conf import settings
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import redirect
 
+from core import metrics as request_metrics
+
 def goto_app(request):
     return redirect('/admin')
 
 
 def download_app(request):
     pass
+
+
+def metrics(request):
+    """
+    Prometheus text exposition of core.metrics, for scrapers sending
+    ``Authorization: Bearer <METRICS_TOKEN>``. Without a configured token the
+    endpoint does not exist; client addresses are not trusted, since behind a
+    proxy every request comes from loopback.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if not token or scheme.lower() != 'bearer' or not hmac.compare_digest(credentials.encode(), token.encode()):
+        raise Http404
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
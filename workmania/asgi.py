@@ -2,6 +2,8 @@
 ASGI config for workmania project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to ``EVENTS_PATH`` are answered by the Server-Sent Events stream in
+core.sse; everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +11,20 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "workmania.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up.
+from core.sse import EventStreamApp  # noqa: E402
+
+event_stream_application = EventStreamApp()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == settings.EVENTS_PATH:
+        return await event_stream_application(scope, receive, send)
+    return await django_application(scope, receive, send)
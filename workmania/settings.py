@@ -92,6 +92,7 @@ SUBSCRIBE_PRICE_ID = {
 }
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -153,6 +154,75 @@ DATABASES = {
     }    
 }
 
+# Shared cache for API responses, version counters and lookups. Set
+# REDIS_CACHE_URL (e.g. redis://127.0.0.1:6379/1) in production so every
+# worker sees the same entries; the local-memory backend is per process.
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 10000,
+            },
+        }
+    }
+
+# Seconds a cached public API response lives before it is re-rendered, even
+# without an invalidating write.
+API_RESPONSE_CACHE_TIMEOUT = 300
+
+# Lower bounds of the job search price facet buckets (core.facets); the last
+# bucket is open ended. Facet counts are cached like API responses.
+JOB_PRICE_BUCKETS = (0, 100, 500, 1000, 5000)
+JOB_FACET_CACHE_TIMEOUT = 300
+
+# Upper bound on how long a user's resolved permissions stay cached; group and
+# permission changes invalidate them immediately (see core.api.permissions).
+PERMISSION_CACHE_TIMEOUT = 60 * 60
+
+# Seconds a resolved API token stays cached, in the shared cache and in each
+# process. Logout, password reset and deactivation revoke it right away (see
+# core.api.authentication).
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = 5
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 1000
+
+# Server-Sent Events (core.sse), served only when running under ASGI
+# (workmania.asgi). Events travel over Redis pub/sub so every worker can
+# deliver them; without a Redis URL they stay inside the publishing process,
+# which is never the ASGI server for notifications sent from Celery, so the
+# ASGI app refuses to start unless EVENTS_BACKEND names the in-process broker.
+EVENTS_PATH = '/api/v1/events/'
+EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND') or None
+EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL') or REDIS_CACHE_URL
+EVENTS_HEARTBEAT_SECONDS = 15
+
+# Resource uploads (core.uploads). Files are stored once per content hash in
+# RESOURCE_STORAGE (a storage class path; the default storage when unset).
+# Multipart uploads above RESOURCE_UPLOAD_MAX_SIZE are refused in favour of
+# resumable uploads, whose partial files live in RESOURCE_UPLOAD_PARTS_DIR;
+# it must be shared by every web worker.
+RESOURCE_STORAGE = os.environ.get('RESOURCE_STORAGE')
+RESOURCE_UPLOAD_MAX_SIZE = 25 * 1024 * 1024
+RESOURCE_RESUMABLE_MAX_SIZE = 2 * 1024 * 1024 * 1024
+RESOURCE_UPLOAD_PARTS_DIR = os.environ.get('RESOURCE_UPLOAD_PARTS_DIR') or os.path.join(BASE_DIR, 'upload_parts')
+
+# Bounding boxes (px) and formats rendered for every uploaded image, in the
+# background (core.images).
+IMAGE_DERIVATIVE_SIZES = (64, 256, 1024)
+IMAGE_DERIVATIVE_FORMATS = ('webp', 'jpeg')
+
 
 JAZZMIN_SETTINGS = {
     # title of the window (Will default to current_admin_site.site_title if absent or None)
@@ -353,3 +423,45 @@ ACCOUNT_EMAIL_VERIFICATION = 'none'
 WORKMANIA_API_URL = os.environ.get('WORKMANIA_API_URL', 'http://localhost:8000')
 
 CELERY_TASK_TIME_LIMIT = 86400
+# Run tasks inline instead of sending them to the broker (local development
+# without a Celery worker).
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
+# A publisher that cannot reach the broker gives up after one connection
+# attempt instead of retrying for broker_connection_timeout; requests queue
+# tasks after commit (core.api.tasks.dispatch). Workers reconnect on their
+# own schedule.
+CELERY_BROKER_TRANSPORT_OPTIONS = {'max_retries': 0}
+
+# Dotted path of the job posting full-text search backend (see core/search.py);
+# when unset the backend is picked from the database vendor.
+JOB_SEARCH_BACKEND = os.environ.get('JOB_SEARCH_BACKEND') or None
+
+# Freelancer "relevant" feed (core/recommendations.py): how many postings are
+# ranked, and how often a worker checks for changes made by other workers.
+RELEVANT_JOBS_LIMIT = 500
+RELEVANT_JOBS_REFRESH_SECONDS = 60
+# How long a published posting change stays replayable by other processes,
+# and how many changes a process replays before rebuilding its matrix instead.
+RELEVANT_JOBS_CHANGE_LOG_TIMEOUT = 60 * 60
+RELEVANT_JOBS_MAX_REPLAY = 1000
+# Rebuilds of a lagging index run off the request path in a thread.
+RELEVANT_JOBS_BACKGROUND_REBUILD = True
+
+# GeoIP (core/api/geoip.py): local CSV range database, cache lifetimes and
+# the optional ipapi.co fallback.
+GEOIP_RANGES_FILE = os.environ.get('GEOIP_RANGES_FILE') or None
+GEOIP_CACHE_TIMEOUT = 60 * 60 * 24
+GEOIP_MISS_CACHE_TIMEOUT = 60 * 60
+# Remote lookups that failed (timeouts, 5xx, rate limiting) are retried after this.
+GEOIP_ERROR_CACHE_TIMEOUT = 60
+GEOIP_REMOTE_FALLBACK = os.environ.get('GEOIP_REMOTE_FALLBACK', 'True') == 'True'
+GEOIP_REMOTE_TIMEOUT = 3
+GEOIP_REMOTE_POOL_SIZE = 10
+GEOIP_REMOTE_CONCURRENCY = 4
+
+# Request metrics (core/middleware.py): share of requests whose latency, SQL
+# and serializer time are recorded, and the bearer token /metrics requires
+# (unset, /metrics answers 404).
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1.0'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
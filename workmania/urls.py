@@ -43,14 +43,36 @@ job_postings_routes.register(
     basename='job_invitations',
     parents_query_lookups=['job_posting__id']
 )
+conversation_routes = router.register(
+    r'conversations',
+    api_views.ConversationViewSet,
+    basename='conversations'
+)
+conversation_routes.register(
+    r'messages',
+    api_views.ConversationMessageViewSet,
+    basename='conversation_messages',
+    parents_query_lookups=['conversation__id']
+)
+router.register(
+    r'notifications',
+    api_views.NotificationViewSet,
+    basename='notifications'
+)
 router.register(
     r'resources',
     api_views.ResourceViewSet,
     basename='resources'
 )
+router.register(
+    r'resource_uploads',
+    api_views.ResourceUploadViewSet,
+    basename='resource_uploads'
+)
 
 urlpatterns = [
     url(r'^$', core_views.goto_app, name='admin'),
+    path('metrics', core_views.metrics, name='metrics'),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     # Optional UI:
     path(